@@ -0,0 +1,90 @@
+"""Compare l'ancienne normalisation colonne par colonne à l'alignement vectorisé.
+
+Génère en mémoire des feuilles « larges » (200+ colonnes) dont chaque
+fichier ne contient qu'une partie des colonnes, puis mesure les deux
+approches. Exemple :
+
+    python benchmarks/bench_alignment.py --files 200 --columns 250 --rows 200
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from merge_engine import concat_aligned, union_columns  # noqa: E402
+
+
+def make_wide_frames(files, columns, rows, presence, seed=0):
+    """Crée ``files`` DataFrames typés contenant chacun ~``presence`` des colonnes"""
+    rng = np.random.default_rng(seed)
+    names = [f"Col_{i:03d}" for i in range(columns)]
+    frames = []
+    for _ in range(files):
+        kept = [name for name in names if rng.random() < presence]
+        data = {}
+        for name in kept:
+            kind = int(name[4:]) % 3
+            if kind == 0:
+                data[name] = rng.integers(0, 1000, rows)
+            elif kind == 1:
+                data[name] = rng.random(rows)
+            else:
+                data[name] = rng.choice(["Paris", "Lyon", "Nice"], rows)
+        frames.append(pd.DataFrame(data))
+    return frames
+
+
+def legacy_normalize(dataframes):
+    """Ancienne implémentation : un DataFrame vide rempli colonne par colonne"""
+    all_columns = union_columns(dataframes)
+    normalized_dfs = []
+    for df in dataframes:
+        normalized_df = pd.DataFrame()
+        for col in all_columns:
+            if col in df.columns:
+                normalized_df[col] = df[col]
+            else:
+                normalized_df[col] = pd.NA
+        normalized_dfs.append(normalized_df)
+    return pd.concat(normalized_dfs, ignore_index=True)
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=100)
+    parser.add_argument("--columns", type=int, default=250)
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--presence", type=float, default=0.8,
+                        help="proportion des colonnes présentes dans chaque fichier")
+    args = parser.parse_args(argv)
+
+    frames = make_wide_frames(args.files, args.columns, args.rows, args.presence)
+    print(f"{args.files} DataFrames × {args.rows} lignes, {args.columns} colonnes possibles")
+
+    with warnings.catch_warnings():
+        # L'ancienne boucle fragmente volontairement les DataFrames
+        warnings.simplefilter("ignore", pd.errors.PerformanceWarning)
+        legacy, legacy_time = timed(legacy_normalize, frames)
+    aligned, aligned_time = timed(concat_aligned, frames, union_columns(frames))
+
+    legacy_objects = int((legacy.dtypes == object).sum())
+    aligned_objects = int((aligned.dtypes == object).sum())
+    print(f"  boucle par colonne   : {legacy_time:8.3f} s  ({legacy_objects} colonnes object)")
+    print(f"  alignement vectorisé : {aligned_time:8.3f} s  ({aligned_objects} colonnes object)")
+    print(f"  accélération : ×{legacy_time / max(aligned_time, 1e-9):.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Mesure la fusion complète sur des corpus synthétiques de taille croissante.
+
+Chaque profil (small, medium, large) génère une fois pour toutes un corpus
+avec ``generate_test_files.generate_corpus``, puis lance ``merge_cli`` dans
+un processus séparé (pour que le pic mémoire mesuré soit celui de la seule
+fusion) et lit le rapport JSON produit. Le débit et le pic mémoire sont
+comparés à une référence enregistrée dans ``benchmarks/baseline.json``.
+Exemple :
+
+    python benchmarks/bench_pipeline.py --profile small --profile medium
+    python benchmarks/bench_pipeline.py --profile small --update-baseline
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from generate_test_files import generate_corpus  # noqa: E402
+
+BASELINE_FILE = Path(__file__).resolve().parent / 'baseline.json'
+
+PROFILES = {
+    'small': dict(files=20, rows=500, columns=15, drift=0.1, empty_ratio=0.05),
+    'medium': dict(files=100, rows=2000, columns=30, drift=0.1, empty_ratio=0.02),
+    'large': dict(files=300, rows=10000, columns=40, drift=0.15, empty_ratio=0.01),
+}
+
+# Modes de fusion mesurés : options passées à merge_cli
+MODES = {
+    'memoire': [],
+    'streaming': ['--streaming'],
+}
+
+# Écart toléré par rapport à la référence avant de signaler une régression
+DEFAULT_TOLERANCE = 0.2
+
+
+def corpus_folder(work_dir, profile, xls_ratio):
+    """Génère le corpus d'un profil s'il n'existe pas déjà avec les mêmes paramètres"""
+    params = dict(PROFILES[profile], xls_ratio=xls_ratio)
+    folder = Path(work_dir) / f"{profile}-xls{xls_ratio:g}"
+    marker = folder / 'corpus.json'
+    if marker.exists():
+        with open(marker, encoding='utf-8') as handle:
+            existing = json.load(handle)
+        if all(existing.get(key) == value for key, value in params.items()):
+            return folder
+    print(f"Génération du corpus {profile} dans {folder}...")
+    generate_corpus(folder, verbose=False, **params)
+    return folder
+
+
+def run_merge(folder, mode, workers, work_dir):
+    """Lance une fusion dans un processus séparé et renvoie son rapport"""
+    output = Path(work_dir) / f"sortie-{mode}.csv"
+    report = Path(work_dir) / f"rapport-{mode}.json"
+    command = [sys.executable, str(ROOT / 'merge_cli.py'), str(folder), str(output),
+               '--quiet', '--workers', str(workers), '--report', str(report)] + MODES[mode]
+    subprocess.run(command, check=True, cwd=ROOT)
+    with open(report, encoding='utf-8') as handle:
+        return json.load(handle)
+
+
+def measure(report):
+    """Extrait du rapport les mesures suivies par le banc d'essai"""
+    totals = report['totals']
+    return {
+        'rows': totals.get('rows'),
+        'wall_seconds': round(totals['wall_seconds'], 3),
+        'rows_per_second': round(totals.get('rows_per_second') or 0),
+        'peak_rss_bytes': totals.get('peak_rss_bytes'),
+        'stages': {name: round(stats['wall_seconds'], 3) for name, stats in report['stages'].items()},
+    }
+
+
+def compare(result, reference, tolerance):
+    """Liste les régressions de débit ou de mémoire par rapport à la référence"""
+    regressions = []
+    if reference.get('rows_per_second') and result['rows_per_second'] < reference['rows_per_second'] * (1 - tolerance):
+        regressions.append(f"débit {result['rows_per_second']} < {reference['rows_per_second']} lignes/s")
+    if reference.get('peak_rss_bytes') and result['peak_rss_bytes'] and \
+            result['peak_rss_bytes'] > reference['peak_rss_bytes'] * (1 + tolerance):
+        regressions.append(f"mémoire {result['peak_rss_bytes'] / 1024 / 1024:.0f} Mo > "
+                           f"{reference['peak_rss_bytes'] / 1024 / 1024:.0f} Mo")
+    return regressions
+
+
+def ratio(value, reference):
+    if not value or not reference:
+        return "      -"
+    return f"{value / reference:6.2f}x"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profile", action="append", choices=list(PROFILES),
+                        help="profil à mesurer, répétable (défaut: small)")
+    parser.add_argument("--mode", action="append", choices=list(MODES),
+                        help="mode de fusion, répétable (défaut: tous)")
+    parser.add_argument("-j", "--workers", type=int, default=1, help="processus de lecture")
+    parser.add_argument("--xls-ratio", type=float, default=0.0,
+                        help="proportion de fichiers .xls dans le corpus (nécessite xlwt)")
+    parser.add_argument("--work-dir", default=os.path.join(tempfile.gettempdir(), 'excel_merger_bench'),
+                        help="dossier des corpus générés (réutilisés d'une exécution à l'autre)")
+    parser.add_argument("--baseline", default=str(BASELINE_FILE), help="fichier de référence JSON")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="enregistre les mesures comme nouvelle référence")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="écart toléré avant de signaler une régression (0.2 = 20 %%)")
+    args = parser.parse_args(argv)
+
+    profiles = args.profile or ['small']
+    modes = args.mode or list(MODES)
+    work_dir = Path(args.work_dir)
+    work_dir.mkdir(parents=True, exist_ok=True)
+
+    baseline_path = Path(args.baseline)
+    baseline = {}
+    if baseline_path.exists():
+        with open(baseline_path, encoding='utf-8') as handle:
+            baseline = json.load(handle)
+
+    results = {}
+    regressions = []
+    print(f"{'profil/mode':<20} {'lignes':>9} {'durée':>8} {'lignes/s':>10} {'pic Mo':>8} "
+          f"{'débit':>8} {'mémoire':>8}")
+    for profile in profiles:
+        folder = corpus_folder(work_dir, profile, args.xls_ratio)
+        for mode in modes:
+            name = f"{profile}/{mode}"
+            result = measure(run_merge(folder, mode, args.workers, work_dir))
+            results[name] = result
+            reference = baseline.get(name, {})
+            peak = result['peak_rss_bytes'] or 0
+            print(f"{name:<20} {result['rows']:>9} {result['wall_seconds']:>7.2f}s "
+                  f"{result['rows_per_second']:>10} {peak / 1024 / 1024:>8.0f} "
+                  f"{ratio(result['rows_per_second'], reference.get('rows_per_second')):>8} "
+                  f"{ratio(peak, reference.get('peak_rss_bytes')):>8}")
+            regressions.extend(f"{name}: {problem}" for problem in compare(result, reference, args.tolerance))
+
+    if args.update_baseline:
+        baseline.update(results)
+        with open(baseline_path, 'w', encoding='utf-8') as handle:
+            json.dump(baseline, handle, indent=2, sort_keys=True)
+        print(f"Référence mise à jour: {baseline_path}")
+        return 0
+
+    if not baseline:
+        print("Aucune référence enregistrée : relancer avec --update-baseline pour en créer une.")
+    for regression in regressions:
+        print(f"RÉGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
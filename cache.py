@@ -0,0 +1,200 @@
+"""Cache disque des fichiers sources déjà lus (format Parquet).
+
+Chaque fichier lu est enregistré en Parquet sous une clé calculée à partir
+de son chemin, de sa taille et de sa date de modification (ou, en option,
+d'une empreinte de son contenu). Lors d'une nouvelle fusion, les fichiers
+inchangés sont rechargés depuis le cache au lieu d'être réanalysés par
+openpyxl/xlrd. Un index JSON conserve la date de dernière utilisation de
+chaque entrée pour limiter la taille du cache (éviction LRU).
+"""
+import hashlib
+import importlib.util
+import json
+import os
+import re
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import pandas as pd
+
+INDEX_FILE = 'index.json'
+# Fichiers d'une entrée : ``<clé SHA-1>.parquet``, ou ``.<pid>.tmp`` pendant son écriture
+CACHE_ENTRY = re.compile(r'([0-9a-f]{40})\.(?:parquet|\d+\.tmp)')
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+# Incrémenter si le format des DataFrames mis en cache change
+CACHE_VERSION = 1
+
+
+@dataclass
+class CacheRecord:
+    """Informations sur l'utilisation du cache pour un fichier"""
+    key: str
+    hit: bool
+    stored_bytes: int = 0
+    error: str = None
+
+
+def file_fingerprint(path, use_hash=False):
+    """Empreinte d'un fichier : taille + date de modification, ou contenu"""
+    stat = os.stat(path)
+    if not use_hash:
+        return f"{stat.st_size}:{stat.st_mtime_ns}"
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(1024 * 1024), b''):
+            digest.update(block)
+    return f"{stat.st_size}:{digest.hexdigest()}"
+
+
+def cache_key(path, variant='', use_hash=False):
+    """Clé de cache d'un fichier pour une variante de lecture donnée"""
+    resolved = str(Path(path).resolve())
+    raw = f"{CACHE_VERSION}|{resolved}|{file_fingerprint(path, use_hash)}|{variant}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def read_through_cache(path, cache_dir, read_func, variant='', use_hash=False):
+    """Charge un fichier depuis le cache ou le lit puis l'enregistre
+
+    Fonction de module pour pouvoir s'exécuter dans un processus de
+    lecture. Renvoie ``(DataFrame, CacheRecord)``.
+    """
+    key = cache_key(path, variant, use_hash)
+    cache_file = Path(cache_dir) / f"{key}.parquet"
+    if cache_file.exists():
+        try:
+            df = pd.read_parquet(cache_file)
+            df.attrs['reader_backend'] = 'cache'
+            return df, CacheRecord(key, hit=True, stored_bytes=cache_file.stat().st_size)
+        except Exception:
+            # Entrée corrompue : relire le fichier source
+            pass
+
+    df = read_func(path)
+    record = CacheRecord(key, hit=False)
+    tmp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        df.to_parquet(tmp_file, index=False)
+        os.replace(tmp_file, cache_file)
+        record.stored_bytes = cache_file.stat().st_size
+    except Exception as e:
+        # Types non pris en charge par Parquet (colonnes mixtes, ...) : pas de cache
+        record.error = str(e)
+        if tmp_file.exists():
+            tmp_file.unlink()
+    return df, record
+
+
+class SourceCache:
+    """Index et politique d'éviction du cache des fichiers sources"""
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES, use_hash=False):
+        if importlib.util.find_spec('pyarrow') is None:
+            raise ImportError("le cache nécessite le paquet 'pyarrow' (pip install pyarrow)")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.use_hash = use_hash
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.entries = self._load_index()
+        self.keys_by_source = {entry['source']: key for key, entry in self.entries.items()}
+
+    def _load_index(self):
+        index_path = self.directory / INDEX_FILE
+        try:
+            with open(index_path, encoding='utf-8') as handle:
+                entries = json.load(handle)
+        except (OSError, ValueError):
+            return {}
+        # Oublier les entrées dont le fichier a disparu
+        return {key: entry for key, entry in entries.items()
+                if (self.directory / f"{key}.parquet").exists()}
+
+    def reader(self, read_func, variant=''):
+        """Fonction de lecture passant par le cache (sérialisable)"""
+        return _CachedReader(str(self.directory), read_func, variant, self.use_hash)
+
+    def record(self, path, record):
+        """Met à jour l'index après la lecture de ``path``"""
+        if record.hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        if not record.stored_bytes:
+            return
+
+        source = str(Path(path).resolve())
+        # Une autre version du même fichier est obsolète
+        previous_key = self.keys_by_source.get(source)
+        if previous_key is not None and previous_key != record.key:
+            self._remove(previous_key)
+        self.keys_by_source[source] = record.key
+        self.entries[record.key] = {'source': source,
+                                    'bytes': record.stored_bytes,
+                                    'last_used': time.time()}
+
+    def total_bytes(self):
+        return sum(entry['bytes'] for entry in self.entries.values())
+
+    def evict(self):
+        """Supprime les entrées les moins récemment utilisées au-delà de la taille maximale
+
+        Les entrées absentes de l'index (fusion interrompue avant son
+        enregistrement) sont supprimées d'abord : elles échapperaient sinon
+        à la limite de taille.
+        """
+        for path in self.directory.iterdir():
+            match = CACHE_ENTRY.fullmatch(path.name)
+            if match and not (path.suffix == '.parquet' and match.group(1) in self.entries):
+                try:
+                    path.unlink()
+                    self.evicted += 1
+                except OSError:
+                    pass
+        total = self.total_bytes()
+        for key, entry in sorted(self.entries.items(), key=lambda item: item[1]['last_used']):
+            if total <= self.max_bytes:
+                break
+            total -= entry['bytes']
+            self._remove(key)
+            self.evicted += 1
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None and self.keys_by_source.get(entry['source']) == key:
+            del self.keys_by_source[entry['source']]
+        cache_file = self.directory / f"{key}.parquet"
+        if cache_file.exists():
+            cache_file.unlink()
+
+    def save(self):
+        """Applique l'éviction puis enregistre l'index"""
+        self.evict()
+        index_path = self.directory / INDEX_FILE
+        tmp_path = index_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as handle:
+            json.dump(self.entries, handle)
+        os.replace(tmp_path, index_path)
+
+    def clear(self):
+        """Vide entièrement le cache"""
+        for key in list(self.entries):
+            self._remove(key)
+        # L'éviction retire aussi les entrées non indexées
+        self.save()
+
+
+class _CachedReader:
+    """Fonction de lecture sérialisable qui passe par le cache"""
+
+    def __init__(self, cache_dir, read_func, variant, use_hash):
+        self.cache_dir = cache_dir
+        self.read_func = read_func
+        self.variant = variant
+        self.use_hash = use_hash
+
+    def __call__(self, path):
+        return read_through_cache(path, self.cache_dir, self.read_func, self.variant, self.use_hash)
@@ -0,0 +1,145 @@
+"""Point de reprise d'une fusion interrompue.
+
+Le manifeste JSON d'un travail enregistre, au fil de la lecture, chaque
+fichier déjà analysé (empreinte, clé de son DataFrame dans le cache
+Parquet, lignes, colonnes, statut) ainsi que l'union des colonnes
+rencontrées. Les DataFrames eux-mêmes sont conservés par le cache des
+sources (``cache.py``), par défaut dans le sous-dossier ``sources`` du
+point de reprise. Après un plantage ou une annulation, relancer la même
+fusion recharge les fichiers déjà analysés depuis le cache au lieu de les
+relire, et reprend la lecture là où elle s'était arrêtée.
+"""
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+
+from cache import CACHE_ENTRY, INDEX_FILE, file_fingerprint
+
+MANIFEST_FILE = 'manifest.json'
+SOURCES_DIR = 'sources'
+CHECKPOINT_VERSION = 1
+# Intervalle minimal entre deux écritures du manifeste (secondes)
+FLUSH_INTERVAL = 2.0
+
+
+class JobCheckpoint:
+    """Manifeste d'un travail de fusion, mis à jour fichier par fichier
+
+    ``signature`` décrit les paramètres qui influencent la lecture : un
+    manifeste enregistré avec une autre signature est ignoré.
+    """
+
+    def __init__(self, directory, signature):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.signature = signature
+        self.files = {}
+        self.columns = set()
+        self.status = 'running'
+        self.previous_status = None
+        self.mismatch = False
+        self._last_flush = 0.0
+        self._load()
+
+    @property
+    def manifest_path(self):
+        return self.directory / MANIFEST_FILE
+
+    @property
+    def sources_dir(self):
+        return self.directory / SOURCES_DIR
+
+    def _load(self):
+        try:
+            with open(self.manifest_path, encoding='utf-8') as handle:
+                data = json.load(handle)
+        except (OSError, ValueError):
+            return
+        if data.get('version') != CHECKPOINT_VERSION or data.get('signature') != self.signature:
+            self.mismatch = True
+            return
+        self.previous_status = data.get('status')
+        if self.previous_status == 'done':
+            return
+        self.files = data.get('files', {})
+        self.columns = set(data.get('columns', []))
+
+    def resumable(self):
+        """Fichiers lus lors de l'exécution précédente et inchangés depuis"""
+        return [path for path in self.files if self.is_current(path)]
+
+    def is_current(self, path):
+        """Le fichier a-t-il été lu et est-il inchangé depuis ?"""
+        entry = self.files.get(str(path))
+        if entry is None or entry['status'] == 'error':
+            return False
+        try:
+            return entry['fingerprint'] == file_fingerprint(path)
+        except OSError:
+            return False
+
+    def record(self, path, status, rows=0, columns=(), cache_key=None, error=None):
+        """Enregistre le résultat de la lecture d'un fichier"""
+        try:
+            fingerprint = file_fingerprint(path)
+        except OSError:
+            fingerprint = None
+        self.files[str(path)] = {
+            'fingerprint': fingerprint,
+            'cache_key': cache_key,
+            'status': status,
+            'rows': rows,
+            'columns': list(map(str, columns)),
+            'error': error,
+        }
+        self.columns.update(map(str, columns))
+        self.flush()
+
+    def flush(self, force=False):
+        """Écrit le manifeste (au plus toutes les FLUSH_INTERVAL secondes sauf si forcé)"""
+        now = time.monotonic()
+        if not force and now - self._last_flush < FLUSH_INTERVAL:
+            return
+        self._last_flush = now
+        data = {
+            'version': CHECKPOINT_VERSION,
+            'signature': self.signature,
+            'status': self.status,
+            'updated_at': datetime.now().isoformat(timespec='seconds'),
+            'columns': sorted(self.columns),
+            'files': self.files,
+        }
+        tmp_path = self.manifest_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as handle:
+            json.dump(data, handle, indent=1, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+
+    def finish(self, status):
+        """Clôt le travail : 'done', 'cancelled' ou 'error'"""
+        self.status = status
+        self.flush(force=True)
+
+    def remove(self):
+        """Supprime le manifeste et les sources conservées
+
+        Seuls les fichiers créés par le point de reprise sont supprimés ; le
+        dossier (fourni par l'utilisateur) n'est retiré que s'il est alors vide.
+        """
+        created = [self.manifest_path, self.manifest_path.with_suffix('.tmp')]
+        if self.sources_dir.is_dir():
+            index_path = self.sources_dir / INDEX_FILE
+            created += [index_path, index_path.with_suffix('.tmp')]
+            created += [path for path in self.sources_dir.iterdir() if CACHE_ENTRY.fullmatch(path.name)]
+        for path in created:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+        for directory in (self.sources_dir, self.directory):
+            try:
+                directory.rmdir()
+            except OSError:
+                # Absent, ou contient d'autres fichiers : conservé
+                pass
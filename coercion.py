@@ -0,0 +1,249 @@
+"""Choix d'un type cible par colonne avant la concaténation.
+
+Sans plan de types, une colonne dont le type varie d'un fichier à l'autre
+(dates en texte dans l'un, vraies dates dans l'autre ; entiers ici,
+flottants là) devient une colonne ``object`` après ``pd.concat``. C'est
+lent à concaténer, coûteux en mémoire et lent à écrire. Le planificateur
+observe chaque source au fil de la lecture puis retient un type par colonne :
+numérique (``Int64`` ou ``float64``), date, booléen, catégorie pour le
+texte à faible cardinalité (``Ville``, ``Statut``...) ou chaîne
+(``string[pyarrow]`` si pyarrow est installé). Chaque source est ensuite
+convertie une seule fois. Les colonnes réellement hétérogènes (nombres et
+texte) restent en ``object`` et sont signalées comme conflits.
+"""
+import importlib.util
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from schema import BOOL, DATE_TEXT, DATETIME, MIXED, NUMERIC, TEXT
+
+# Formats essayés pour reconnaître des dates saisies en texte
+DATE_FORMATS = ('ISO8601', '%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y', '%d/%m/%Y %H:%M:%S')
+
+# Type produit par pd.to_datetime (ns avant pandas 3, us ensuite)
+DATETIME_DTYPE = pd.to_datetime(pd.Series(['2000-01-01'])).dtype
+
+# Un texte devient catégoriel s'il a peu de valeurs distinctes
+CATEGORY_MAX_UNIQUE = 1000
+CATEGORY_MAX_RATIO = 0.5
+
+
+def string_dtype():
+    """Type chaîne retenu pour le texte libre"""
+    if importlib.util.find_spec('pyarrow') is not None:
+        return pd.StringDtype('pyarrow')
+    return pd.StringDtype()
+
+
+def date_format(values):
+    """Format de date reconnaissant toutes les valeurs, ou None"""
+    if not len(values) or not DATE_TEXT.fullmatch(str(values[0]).strip()):
+        return None
+    for fmt in DATE_FORMATS:
+        parsed = pd.to_datetime(values, format=fmt, errors='coerce')
+        if parsed.notna().all():
+            return fmt
+    return None
+
+
+def parse_dates(series, formats=DATE_FORMATS):
+    """Convertit une colonne de texte en dates avec le premier format qui convient"""
+    present = series.notna()
+    for fmt in formats:
+        parsed = pd.to_datetime(series, format=fmt, errors='coerce')
+        if parsed[present].notna().all():
+            return parsed
+    raise ValueError("dates non reconnues")
+
+
+def observe_column(series):
+    """Type d'une colonne d'une source : ``(type, entière, format_de_date)``"""
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        series = series.astype(object)
+        dtype = series.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return BOOL, False, None
+    if pd.api.types.is_numeric_dtype(dtype):
+        return NUMERIC, pd.api.types.is_integer_dtype(dtype), None
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return DATETIME, False, None
+
+    inferred = pd.api.types.infer_dtype(series, skipna=True)
+    if inferred == 'string':
+        fmt = date_format(series.dropna().unique())
+        if fmt is not None:
+            return DATETIME, False, fmt
+        return TEXT, False, None
+    if inferred == 'integer':
+        return NUMERIC, True, None
+    if inferred in ('floating', 'mixed-integer-float', 'decimal'):
+        return NUMERIC, False, None
+    if inferred in ('datetime', 'datetime64', 'date'):
+        return DATETIME, False, None
+    if inferred == 'boolean':
+        return BOOL, False, None
+    return MIXED, False, None
+
+
+@dataclass
+class ColumnStats:
+    """Ce qui a été observé d'une colonne dans toutes les sources"""
+    kinds: dict = field(default_factory=dict)
+    integer: bool = True
+    date_formats: list = field(default_factory=list)
+    text_sources: list = field(default_factory=list)
+    uniques: set = field(default_factory=set)
+    # Plus de CATEGORY_MAX_UNIQUE valeurs distinctes : plus de suivi
+    high_cardinality: bool = False
+    values: int = 0
+
+
+@dataclass
+class DtypePlan:
+    """Type cible de chaque colonne et conflits relevés"""
+    targets: dict
+    # Colonnes de types incompatibles : {colonne: {type: [fichiers]}}
+    conflicts: dict
+    # Colonnes de dates saisies en texte dans certaines sources : {colonne: [fichiers]}
+    parsed_dates: dict = field(default_factory=dict)
+    date_formats: dict = field(default_factory=dict)
+
+    def describe(self):
+        """Résumé lisible des types retenus"""
+        counts = {}
+        for target in self.targets.values():
+            name = 'catégorie' if isinstance(target, pd.CategoricalDtype) else str(target)
+            counts[name] = counts.get(name, 0) + 1
+        return ', '.join(f"{name} ×{count}" for name, count in sorted(counts.items()))
+
+
+class DtypePlanner:
+    """Observe les sources une à une puis établit le plan de types"""
+
+    def __init__(self):
+        self.columns = {}
+
+    def observe(self, df, source):
+        for column in df.columns:
+            series = df[column]
+            if not series.notna().any():
+                continue
+            kind, integer, fmt = observe_column(series)
+            stats = self.columns.setdefault(column, ColumnStats())
+            stats.kinds.setdefault(kind, []).append(source)
+            stats.integer = stats.integer and (kind != NUMERIC or integer)
+            if fmt is not None:
+                stats.text_sources.append(source)
+                if fmt not in stats.date_formats:
+                    stats.date_formats.append(fmt)
+            if kind == TEXT and not stats.high_cardinality:
+                uniques = series.dropna().unique()
+                stats.uniques.update(uniques)
+                stats.values += int(series.notna().sum())
+                if len(stats.uniques) > CATEGORY_MAX_UNIQUE:
+                    stats.high_cardinality = True
+                    stats.uniques = set()
+
+    def plan(self):
+        targets = {}
+        conflicts = {}
+        parsed_dates = {}
+        date_formats = {}
+        for column, stats in self.columns.items():
+            kinds = set(stats.kinds)
+            if len(kinds) > 1:
+                conflicts[column] = stats.kinds
+                continue
+            kind = kinds.pop()
+            if kind == NUMERIC:
+                targets[column] = 'Int64' if stats.integer else 'float64'
+            elif kind == BOOL:
+                targets[column] = 'boolean'
+            elif kind == DATETIME:
+                targets[column] = 'datetime'
+                if stats.text_sources:
+                    parsed_dates[column] = stats.text_sources
+                    date_formats[column] = stats.date_formats
+            elif kind == TEXT:
+                if not stats.high_cardinality and len(stats.uniques) <= stats.values * CATEGORY_MAX_RATIO:
+                    targets[column] = pd.CategoricalDtype(sorted(stats.uniques))
+                else:
+                    targets[column] = string_dtype()
+        return DtypePlan(targets, conflicts, parsed_dates, date_formats)
+
+
+def plan_from_hints(dtype_hints):
+    """Plan de types déduit des indications de la pré-analyse des en-têtes
+
+    Utilisé en mode streaming, où les sources ne sont pas toutes connues
+    avant l'écriture : les nombres deviennent ``Int64`` ou ``float64`` selon
+    chaque fichier (un échantillon ne garantit pas l'absence de décimales),
+    le texte reste une chaîne et les dates saisies en texte sont converties
+    fichier par fichier.
+    """
+    targets = {}
+    for column, hint in dtype_hints.items():
+        if hint == NUMERIC:
+            targets[column] = 'number'
+        elif hint == BOOL:
+            targets[column] = 'boolean'
+        elif hint == DATETIME:
+            targets[column] = 'datetime'
+        elif hint == TEXT:
+            targets[column] = string_dtype()
+    return DtypePlan(targets, conflicts={})
+
+
+def complete_plan(plan, columns):
+    """Plan où chaque colonne sans type cible devient une chaîne
+
+    Nécessaire pour écrire un schéma Arrow unique : une colonne mêlant
+    nombres et texte ne peut pas y être représentée autrement.
+    """
+    targets = dict(plan.targets)
+    for column in columns:
+        targets.setdefault(column, string_dtype())
+    return DtypePlan(targets, plan.conflicts, plan.parsed_dates, plan.date_formats)
+
+
+def arrow_schema(plan, columns):
+    """Schéma Arrow correspondant aux types cibles d'un plan complet"""
+    import pyarrow as pa
+    empty = pd.DataFrame({column: pd.Series(dtype=DATETIME_DTYPE if plan.targets[column] == 'datetime'
+                                            else plan.targets[column])
+                          for column in columns})
+    return pa.Schema.from_pandas(empty, preserve_index=False)
+
+
+def apply_plan(df, plan):
+    """Convertit les colonnes d'une source vers leur type cible
+
+    Renvoie ``(DataFrame, colonnes_non_converties)`` : une colonne qui ne
+    peut pas être convertie garde son type d'origine.
+    """
+    converted = {}
+    failed = []
+    for column in df.columns:
+        target = plan.targets.get(column)
+        if target is None:
+            continue
+        series = df[column]
+        if target == 'number':
+            target = 'Int64' if pd.api.types.is_integer_dtype(series.dtype) else 'float64'
+        try:
+            if target == 'datetime':
+                if pd.api.types.is_datetime64_any_dtype(series.dtype):
+                    continue
+                formats = plan.date_formats.get(column, DATE_FORMATS)
+                converted[column] = parse_dates(series, formats)
+            elif series.dtype != target:
+                converted[column] = series.astype(target)
+        except (TypeError, ValueError):
+            failed.append(column)
+    if converted:
+        df = df.copy(deep=False)
+        for column, series in converted.items():
+            df[column] = series
+    return df, failed
@@ -0,0 +1,193 @@
+"""Suppression des lignes en double au fil de la lecture des sources.
+
+Chaque ligne est réduite à une empreinte de 64 bits calculée de façon
+vectorisée avec ``pd.util.hash_pandas_object``, sur toutes les colonnes ou
+sur une liste de colonnes clés. Seules les empreintes déjà vues sont
+conservées, dans des tableaux numpy triés (8 octets par ligne) fusionnés
+quand leurs tailles sont voisines. Au-delà
+d'un seuil, elles peuvent être déversées sur disque dans des fichiers
+``.npy`` lus en mémoire mappée.
+
+Les colonnes ajoutées par la fusion (``Fichier_Source``, ``Feuille_Source``)
+sont ignorées : sinon une ligne réexportée dans un autre fichier ne serait
+jamais reconnue comme doublon.
+"""
+import hashlib
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from readers import SHEET_COLUMN, SOURCE_COLUMN
+
+DEFAULT_IGNORED_COLUMNS = (SOURCE_COLUMN, SHEET_COLUMN)
+DEFAULT_MAX_MEMORY_BYTES = 256 * 1024 * 1024
+HASH_BYTES = np.dtype(np.uint64).itemsize
+# Un tableau trié est fusionné avec le précédent tant que celui-ci n'est pas
+# plus de LEVEL_RATIO fois plus grand : les tailles décroissent au moins de
+# moitié d'un niveau à l'autre, et chaque empreinte n'est re-triée qu'un
+# nombre logarithmique de fois
+LEVEL_RATIO = 2
+
+
+def _mix(values):
+    """Brasse des entiers 64 bits (finaliseur splitmix64)"""
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xBF58476D1CE4E5B9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def _column_salt(column):
+    """Empreinte stable du nom d'une colonne (identique d'un processus à l'autre)"""
+    digest = hashlib.blake2b(str(column).encode('utf-8'), digest_size=8).digest()
+    return np.uint64(int.from_bytes(digest, 'little'))
+
+
+def row_hashes(df, columns):
+    """Empreinte 64 bits de chaque ligne sur les colonnes demandées
+
+    Les empreintes des cellules sont additionnées : le résultat ne dépend
+    pas de l'ordre des colonnes, et une colonne absente du DataFrame
+    équivaut à une colonne de valeurs manquantes. Les nombres sont comparés
+    en flottants pour qu'une colonne entière et une colonne à trous (donc
+    flottante) donnent la même empreinte.
+    """
+    total = np.zeros(len(df), dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for column in columns:
+            if column not in df.columns:
+                continue
+            series = df[column]
+            if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+                series = series.astype('float64')
+            hashes = pd.util.hash_pandas_object(series, index=False).to_numpy()
+            hashes = _mix(hashes ^ _column_salt(column))
+            hashes[series.isna().to_numpy()] = 0
+            total += hashes
+    return total
+
+
+def _contains(sorted_hashes, hashes):
+    """Masque des ``hashes`` présents dans un tableau trié"""
+    if not len(sorted_hashes):
+        return np.zeros(len(hashes), dtype=bool)
+    positions = np.searchsorted(sorted_hashes, hashes)
+    positions[positions == len(sorted_hashes)] = 0
+    return sorted_hashes[positions] == hashes
+
+
+class SeenHashes:
+    """Ensemble compact d'empreintes, déversé sur disque au-delà d'un seuil"""
+
+    def __init__(self, max_memory_bytes=DEFAULT_MAX_MEMORY_BYTES, spill_dir=None):
+        self.max_memory_hashes = max(max_memory_bytes // HASH_BYTES, 1)
+        self.spill_dir = spill_dir
+        self.levels = []
+        self.runs = []
+        self._run_dir = None
+
+    def __len__(self):
+        return sum(len(level) for level in self.levels) + sum(len(run) for run in self.runs)
+
+    @property
+    def memory_hashes(self):
+        return sum(len(level) for level in self.levels)
+
+    def add(self, hashes):
+        """Ajoute des empreintes et renvoie le masque de celles déjà vues
+
+        Une empreinte répétée dans ``hashes`` compte comme doublon à partir
+        de sa deuxième occurrence.
+        """
+        duplicated = pd.Series(hashes).duplicated().to_numpy().copy()
+        # Recherche par clés triées : accès mémoire croissants dans les grands tableaux
+        order = np.argsort(hashes, kind='stable')
+        keys = hashes[order]
+        for sorted_hashes in self.levels + self.runs:
+            duplicated[order] |= _contains(sorted_hashes, keys)
+
+        new = np.unique(hashes[~duplicated])
+        if len(new):
+            self.levels.append(new)
+            while len(self.levels) > 1 and len(self.levels[-2]) <= LEVEL_RATIO * len(self.levels[-1]):
+                last = self.levels.pop()
+                self.levels[-1] = np.sort(np.concatenate([self.levels[-1], last]), kind='stable')
+            if self.spill_dir is not None and self.memory_hashes > self.max_memory_hashes:
+                self.spill()
+        return duplicated
+
+    def spill(self):
+        """Écrit les empreintes en mémoire dans un fichier trié lu en mémoire mappée"""
+        if not self.levels:
+            return
+        if self._run_dir is None:
+            Path(self.spill_dir).mkdir(parents=True, exist_ok=True)
+            self._run_dir = tempfile.mkdtemp(prefix='dedup-', dir=self.spill_dir)
+        run_path = Path(self._run_dir) / f"run-{len(self.runs):04d}.npy"
+        np.save(run_path, np.sort(np.concatenate(self.levels)))
+        self.runs.append(np.load(run_path, mmap_mode='r'))
+        self.levels = []
+
+    def close(self):
+        """Supprime les fichiers déversés sur disque"""
+        self.runs = []
+        self.levels = []
+        if self._run_dir is not None:
+            shutil.rmtree(self._run_dir, ignore_errors=True)
+            self._run_dir = None
+
+
+class RowDeduplicator:
+    """Retire des sources les lignes déjà rencontrées dans une source précédente
+
+    ``key_columns`` limite la comparaison à certaines colonnes ; sinon toutes
+    les colonnes sauf ``ignored_columns`` sont comparées. Le nombre de
+    doublons retirés est conservé par fichier dans ``dropped_by_file``.
+    """
+
+    def __init__(self, key_columns=None, ignored_columns=DEFAULT_IGNORED_COLUMNS,
+                 max_memory_bytes=DEFAULT_MAX_MEMORY_BYTES, spill_dir=None):
+        self.key_columns = list(key_columns) if key_columns else None
+        self.ignored_columns = set(ignored_columns)
+        self.seen = SeenHashes(max_memory_bytes, spill_dir)
+        self.dropped_by_file = {}
+
+    @property
+    def dropped(self):
+        return sum(self.dropped_by_file.values())
+
+    def columns_for(self, df):
+        if self.key_columns is not None:
+            return self.key_columns
+        return [column for column in df.columns if column not in self.ignored_columns]
+
+    def missing_keys(self, df):
+        """Colonnes clés absentes d'un DataFrame (comparées comme valeurs manquantes)"""
+        if self.key_columns is None:
+            return []
+        return [column for column in self.key_columns if column not in df.columns]
+
+    def filter(self, df, source=None):
+        """Renvoie ``df`` sans ses lignes déjà vues"""
+        duplicated = self.seen.add(row_hashes(df, self.columns_for(df)))
+        dropped = int(duplicated.sum())
+        if source is not None:
+            # Une source lue par lots est filtrée plusieurs fois : les doublons s'ajoutent
+            key = str(source)
+            self.dropped_by_file[key] = self.dropped_by_file.get(key, 0) + dropped
+        if not dropped:
+            return df
+        return df[~duplicated]
+
+    def close(self):
+        self.seen.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
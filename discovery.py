@@ -0,0 +1,165 @@
+"""Recherche des fichiers Excel à fusionner dans un dossier.
+
+La recherche repose sur ``os.scandir`` : elle peut descendre dans les
+sous-dossiers, filtrer les chemins par motifs d'inclusion/exclusion et
+ignorer les fichiers de verrouillage d'Excel (``~$classeur.xlsx``) ainsi
+que les fichiers et dossiers cachés. Les sous-dossiers peuvent être
+parcourus en parallèle par des threads tout en conservant un ordre de
+résultat stable, et les chemins sont produits au fur et à mesure afin que
+la lecture commence avant la fin du parcours.
+"""
+import os
+import queue
+import stat
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatchcase
+from pathlib import Path
+
+DEFAULT_INCLUDE = ("*.xlsx", "*.xls")
+LOCK_FILE_PREFIX = '~$'
+
+
+def matches_any(name, relative_path, patterns):
+    """Le nom ou le chemin relatif (séparateurs '/') correspond-il à un motif ?
+
+    La comparaison ignore la casse, comme l'explorateur Windows.
+    """
+    name = name.lower()
+    relative_path = relative_path.lower()
+    for pattern in patterns:
+        pattern = pattern.lower()
+        target = relative_path if '/' in pattern else name
+        if fnmatchcase(target, pattern):
+            return True
+    return False
+
+
+def path_key(path):
+    """Forme canonique d'un chemin, pour comparer deux désignations d'un même fichier"""
+    return os.path.normcase(os.path.realpath(path))
+
+
+def is_hidden(entry):
+    """Fichier ou dossier caché (nom en '.' ou attribut caché sous Windows)"""
+    if entry.name.startswith('.'):
+        return True
+    if sys.platform == "win32":
+        try:
+            attributes = entry.stat(follow_symlinks=False).st_file_attributes
+        except OSError:
+            return False
+        return bool(attributes & stat.FILE_ATTRIBUTE_HIDDEN)
+    return False
+
+
+class DirectoryScanner:
+    """Liste un seul dossier : fichiers retenus et sous-dossiers à parcourir"""
+
+    def __init__(self, root, recursive=False, include=DEFAULT_INCLUDE, exclude=(), skip_hidden=True,
+                 skip_paths=()):
+        self.root = Path(root)
+        self.recursive = recursive
+        self.include = tuple(include or DEFAULT_INCLUDE)
+        self.exclude = tuple(exclude or ())
+        self.skip_hidden = skip_hidden
+        # Fichiers jamais retenus (sortie de la fusion), sous forme ``path_key``
+        self.skip_paths = frozenset(skip_paths)
+
+    def relative(self, path):
+        return Path(path).relative_to(self.root).as_posix()
+
+    def __call__(self, directory):
+        files = []
+        subdirectories = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if self.skip_hidden and is_hidden(entry):
+                    continue
+                relative_path = self.relative(entry.path)
+                if matches_any(entry.name, relative_path, self.exclude):
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if self.recursive:
+                            subdirectories.append(entry.path)
+                        continue
+                    if not entry.is_file():
+                        continue
+                except OSError:
+                    continue
+                if entry.name.startswith(LOCK_FILE_PREFIX):
+                    continue
+                if not matches_any(entry.name, relative_path, self.include):
+                    continue
+                if self.skip_paths and path_key(entry.path) in self.skip_paths:
+                    continue
+                files.append(Path(entry.path))
+        files.sort()
+        subdirectories.sort()
+        return files, subdirectories
+
+
+def iter_excel_files(root, recursive=False, include=DEFAULT_INCLUDE, exclude=(),
+                     skip_hidden=True, walkers=1, skip_paths=()):
+    """Produit les fichiers Excel trouvés sous ``root``, dans un ordre stable
+
+    Les dossiers sont parcourus en profondeur, fichiers triés par nom. Avec
+    ``walkers > 1``, les sous-dossiers déjà connus sont listés à l'avance par
+    un pool de threads ; l'ordre des résultats reste le même. Les fichiers
+    de ``skip_paths`` (chemins ``path_key``) sont ignorés.
+    """
+    scan = DirectoryScanner(root, recursive, include, exclude, skip_hidden, skip_paths)
+    if walkers <= 1:
+        stack = [scan.root]
+        while stack:
+            files, subdirectories = scan(stack.pop())
+            yield from files
+            stack.extend(reversed(subdirectories))
+        return
+
+    with ThreadPoolExecutor(max_workers=walkers) as pool:
+        stack = [pool.submit(scan, scan.root)]
+        while stack:
+            files, subdirectories = stack.pop().result()
+            yield from files
+            # Lancer dès maintenant le listage de tous les sous-dossiers connus
+            stack.extend(reversed([pool.submit(scan, d) for d in subdirectories]))
+
+
+class BackgroundDiscovery:
+    """Exécute la recherche dans un thread et transmet les chemins au fil de l'eau
+
+    ``found`` donne le nombre de fichiers trouvés jusqu'ici et ``finished``
+    indique que le parcours est terminé. Une erreur de parcours est relevée
+    dans le thread qui consomme les chemins.
+    """
+    _END = object()
+
+    def __init__(self, paths):
+        self.found = 0
+        self.finished = False
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, args=(paths,), daemon=True)
+        self._thread.start()
+
+    def _run(self, paths):
+        try:
+            for path in paths:
+                self.found += 1
+                self._queue.put(path)
+        except Exception as e:
+            self._queue.put(e)
+        finally:
+            self.finished = True
+            self._queue.put(self._END)
+
+    def __iter__(self):
+        while True:
+            item = self._queue.get()
+            if item is self._END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
@@ -0,0 +1,180 @@
+"""Sélection de colonnes et filtrage des lignes dès la lecture.
+
+Quand seules quelques colonnes ou une partie des lignes sont utiles, il est
+inutile de construire puis de concaténer tout le reste. Les colonnes
+retenues sont transmises au lecteur (``usecols`` de ``pd.read_excel``, ou
+sélection des cellules pendant le parcours ``read_only`` d'openpyxl) et
+les conditions sont évaluées de façon vectorisée sur chaque source, ou sur
+chaque lot de lignes avec le lecteur ``openpyxl-rows``, avant toute
+concaténation.
+
+Une condition s'écrit ``Colonne opérateur valeur`` avec ``==``, ``!=``,
+``>``, ``>=``, ``<`` ou ``<=`` : ``Date >= 2026-01-01``,
+``Statut == 'Actif'``, ``Total > 100``. Une ligne est conservée si elle
+remplit toutes les conditions ; une valeur manquante, ou une colonne absente
+du fichier, ne remplit aucune condition.
+"""
+import operator
+import re
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from coercion import DATE_FORMATS
+from readers import SHEET_COLUMN, SOURCE_COLUMN
+from schema import DATE_TEXT
+
+OPERATORS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '>=': operator.ge,
+    '<=': operator.le,
+    '>': operator.gt,
+    '<': operator.lt,
+}
+PREDICATE = re.compile(r'\s*(?P<column>.+?)\s*(?P<op>==|!=|>=|<=|>|<)\s*(?P<value>.*?)\s*')
+
+# Colonnes ajoutées par la fusion, toujours conservées
+ADDED_COLUMNS = (SOURCE_COLUMN, SHEET_COLUMN)
+
+
+def parse_value(text):
+    """Valeur d'une condition : texte entre guillemets, booléen, nombre, date ou texte"""
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in '\'"':
+        return text[1:-1]
+    if text.lower() in ('true', 'vrai'):
+        return True
+    if text.lower() in ('false', 'faux'):
+        return False
+    for convert in (int, float):
+        try:
+            return convert(text)
+        except ValueError:
+            pass
+    if DATE_TEXT.fullmatch(text):
+        for fmt in DATE_FORMATS:
+            try:
+                return pd.to_datetime(text, format=fmt)
+            except ValueError:
+                pass
+    return text
+
+
+def as_datetimes(series):
+    """Convertit une colonne en dates, quel que soit le format du texte"""
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return series
+    result = None
+    for fmt in DATE_FORMATS:
+        # Les formats suivants ne s'essaient que sur les valeurs encore non reconnues
+        pending = series if result is None else series[result.isna() & series.notna()]
+        if result is not None and pending.empty:
+            break
+        parsed = pd.to_datetime(pending, format=fmt, errors='coerce')
+        result = parsed if result is None else result.fillna(parsed)
+    return result
+
+
+@dataclass(frozen=True)
+class RowPredicate:
+    """Condition sur une colonne : ``column op value``"""
+    column: str
+    op: str
+    value: object
+
+    def __str__(self):
+        return f"{self.column} {self.op} {self.value!r}"
+
+    def mask(self, df):
+        """Masque des lignes de ``df`` qui remplissent la condition"""
+        if self.column not in df.columns:
+            return np.zeros(len(df), dtype=bool)
+        series = df[self.column]
+        value = self.value
+        if isinstance(value, pd.Timestamp):
+            series = as_datetimes(series)
+        elif isinstance(value, bool):
+            pass
+        elif isinstance(value, (int, float)):
+            if not pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype):
+                series = pd.to_numeric(series, errors='coerce')
+        else:
+            series = series.astype(pd.StringDtype())
+        try:
+            result = OPERATORS[self.op](series, value)
+        except TypeError:
+            # Comparaison impossible (ordre sur des booléens, ...) : aucune ligne retenue
+            return np.zeros(len(df), dtype=bool)
+        return pd.Series(result).fillna(False).to_numpy(dtype=bool)
+
+
+def parse_predicate(text):
+    """Analyse une condition ``Colonne opérateur valeur``"""
+    match = PREDICATE.fullmatch(text)
+    if match is None or not match.group('value'):
+        raise ValueError(f"Condition invalide '{text}' (attendu: Colonne opérateur valeur, "
+                         f"opérateurs: {', '.join(OPERATORS)})")
+    return RowPredicate(match.group('column'), match.group('op'), parse_value(match.group('value')))
+
+
+@dataclass(frozen=True)
+class ReadFilter:
+    """Colonnes à conserver et conditions sur les lignes, appliquées à la lecture
+
+    Sans ``columns``, toutes les colonnes sont conservées. Les colonnes
+    utilisées par les conditions sont lues même si elles ne sont pas
+    conservées.
+    """
+    columns: tuple = ()
+    predicates: tuple = ()
+
+    @property
+    def predicate_columns(self):
+        return {predicate.column for predicate in self.predicates}
+
+    def needed(self, name):
+        """La colonne doit-elle être lue ? (utilisable comme ``usecols``)"""
+        if not self.columns:
+            return True
+        name = str(name).strip()
+        return name in self.columns or name in self.predicate_columns
+
+    def keeps(self, name):
+        """La colonne figure-t-elle dans le résultat ?"""
+        return not self.columns or name in self.columns or name in ADDED_COLUMNS
+
+    def apply(self, df):
+        """Retire les lignes qui ne remplissent pas les conditions, puis les colonnes non retenues"""
+        if self.predicates and len(df):
+            mask = np.ones(len(df), dtype=bool)
+            for predicate in self.predicates:
+                mask &= predicate.mask(df)
+            if not mask.all():
+                df = df[mask].reset_index(drop=True)
+        if self.columns:
+            dropped = [column for column in df.columns if not self.keeps(column)]
+            if dropped:
+                df = df.drop(columns=dropped)
+        return df
+
+    def describe(self):
+        parts = []
+        if self.columns:
+            parts.append(f"colonnes: {', '.join(self.columns)}")
+        if self.predicates:
+            parts.append(f"conditions: {' et '.join(map(str, self.predicates))}")
+        return ' ; '.join(parts)
+
+
+def make_read_filter(columns=(), where=()):
+    """Construit le filtre de lecture, ou None s'il n'y a rien à filtrer
+
+    ``columns`` : noms de colonnes ; ``where`` : conditions en texte.
+    Lève ``ValueError`` pour une condition invalide.
+    """
+    columns = tuple(column.strip() for column in columns if column.strip())
+    predicates = tuple(parse_predicate(text) for text in where)
+    if not columns and not predicates:
+        return None
+    return ReadFilter(columns, predicates)
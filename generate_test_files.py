@@ -1,8 +1,16 @@
 import pandas as pd
+import argparse
+import importlib.util
+import json
 import os
 import random
 from datetime import datetime, timedelta
 import numpy as np
+from openpyxl import Workbook
+
+# Types de colonnes du corpus synthétique et poids par défaut
+DEFAULT_DTYPE_MIX = "int=2,float=2,text=3,date=1,bool=1"
+VILLES = ["Paris", "Lyon", "Marseille", "Toulouse", "Nice", "Nantes", "Strasbourg", "Montpellier", "Bordeaux", "Lille"]
 
 def generate_test_excel_files():
     """Génère des fichiers Excel de test avec des données variées"""
@@ -115,5 +123,138 @@ def generate_test_excel_files():
     print(f"📁 Chemin complet: {os.path.abspath(test_folder)}")
     print(f"\n💡 Vous pouvez maintenant tester l'application de fusion avec ces fichiers !")
 
+def parse_dtype_mix(spec):
+    """Analyse une répartition de types de colonnes (ex. int=2,float=1,text=3)"""
+    weights = {}
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ('int', 'float', 'text', 'date', 'bool'):
+            raise ValueError(f"Type de colonne inconnu: {name}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def make_column(kind, rows, rng):
+    """Génère les valeurs d'une colonne synthétique du type demandé"""
+    if kind == 'int':
+        return rng.integers(0, 100_000, rows)
+    if kind == 'float':
+        return np.round(rng.random(rows) * 1000, 2)
+    if kind == 'date':
+        start = np.datetime64('2024-01-01')
+        return start + rng.integers(0, 730, rows).astype('timedelta64[D]')
+    if kind == 'bool':
+        return rng.random(rows) < 0.5
+    # Texte à faible cardinalité, comme les colonnes Ville ou Statut
+    return rng.choice(VILLES, rows)
+
+
+def write_xlsx_fast(df, filepath):
+    """Écrit un .xlsx avec un classeur openpyxl write_only (bien plus rapide que to_excel)"""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Sheet1')
+    sheet.append(list(df.columns))
+    for row in df.astype(object).itertuples(index=False, name=None):
+        sheet.append(row)
+    workbook.save(filepath)
+
+
+def write_xls(df, filepath):
+    """Écrit un ancien .xls (nécessite xlwt, limité à 65 535 lignes et 256 colonnes)"""
+    import xlwt
+    workbook = xlwt.Workbook()
+    sheet = workbook.add_sheet('Sheet1')
+    date_style = xlwt.easyxf(num_format_str='YYYY-MM-DD')
+    for j, column in enumerate(df.columns):
+        sheet.write(0, j, column)
+    for i, row in enumerate(df.astype(object).itertuples(index=False, name=None), start=1):
+        for j, value in enumerate(row):
+            if isinstance(value, (pd.Timestamp, datetime)):
+                sheet.write(i, j, value.to_pydatetime() if isinstance(value, pd.Timestamp) else value, date_style)
+            elif isinstance(value, (np.bool_, bool)):
+                sheet.write(i, j, bool(value))
+            else:
+                sheet.write(i, j, value.item() if hasattr(value, 'item') else value)
+    workbook.save(filepath)
+
+
+def generate_corpus(folder, files=100, rows=1000, columns=20, drift=0.1, dtype_mix=DEFAULT_DTYPE_MIX,
+                    empty_ratio=0.0, xls_ratio=0.0, seed=0, verbose=True):
+    """Génère un corpus synthétique paramétrable pour les mesures de performance
+
+    - ``drift`` : proportion des colonnes de base absentes ou remplacées par
+      une colonne propre au fichier (dérive de schéma)
+    - ``dtype_mix`` : poids de chaque type de colonne (int, float, text, date, bool)
+    - ``empty_ratio`` : proportion de fichiers sans aucune ligne
+    - ``xls_ratio`` : proportion de fichiers au format .xls (si xlwt est installé)
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(folder, exist_ok=True)
+
+    weights = parse_dtype_mix(dtype_mix)
+    kinds = list(weights)
+    probabilities = np.array([weights[k] for k in kinds]) / sum(weights.values())
+    base_schema = [(f"Col_{j:03d}", kinds[rng.choice(len(kinds), p=probabilities)]) for j in range(columns)]
+
+    can_write_xls = importlib.util.find_spec('xlwt') is not None
+    if xls_ratio and not can_write_xls:
+        print("⚠️ xlwt n'est pas installé : tous les fichiers seront écrits en .xlsx")
+
+    for i in range(files):
+        schema = []
+        for name, kind in base_schema:
+            if rng.random() < drift:
+                # Colonne absente, ou remplacée par une colonne propre au fichier
+                if rng.random() < 0.5:
+                    schema.append((f"Extra_{i:05d}_{name}", kind))
+                continue
+            schema.append((name, kind))
+
+        nb_rows = 0 if rng.random() < empty_ratio else rows
+        df = pd.DataFrame({name: make_column(kind, nb_rows, rng) for name, kind in schema})
+
+        as_xls = can_write_xls and rng.random() < xls_ratio and nb_rows < 65_535 and len(schema) <= 256
+        filename = f"synthetique_{i:05d}.{'xls' if as_xls else 'xlsx'}"
+        filepath = os.path.join(folder, filename)
+        if as_xls:
+            write_xls(df, filepath)
+        else:
+            write_xlsx_fast(df, filepath)
+        if verbose and (i + 1) % max(files // 10, 1) == 0:
+            print(f"✅ {i + 1}/{files} fichiers créés")
+
+    params = dict(files=files, rows=rows, columns=columns, drift=drift, dtype_mix=dtype_mix,
+                  empty_ratio=empty_ratio, xls_ratio=xls_ratio, seed=seed)
+    with open(os.path.join(folder, 'corpus.json'), 'w', encoding='utf-8') as handle:
+        json.dump(params, handle, indent=2)
+    return params
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Génère des fichiers Excel de test. Sans option, crée les 18 fichiers "
+                    "de démonstration ; avec --files, un corpus synthétique paramétrable.")
+    parser.add_argument("--output", default="corpus_synthetique", help="dossier du corpus synthétique")
+    parser.add_argument("--files", type=int, default=None, help="nombre de fichiers")
+    parser.add_argument("--rows", type=int, default=1000, help="lignes par fichier")
+    parser.add_argument("--columns", type=int, default=20, help="colonnes du schéma de base")
+    parser.add_argument("--drift", type=float, default=0.1, help="proportion de dérive de schéma (0-1)")
+    parser.add_argument("--dtype-mix", default=DEFAULT_DTYPE_MIX, help="poids des types de colonnes")
+    parser.add_argument("--empty-ratio", type=float, default=0.0, help="proportion de fichiers vides")
+    parser.add_argument("--xls-ratio", type=float, default=0.0, help="proportion de fichiers .xls (xlwt)")
+    parser.add_argument("--seed", type=int, default=0, help="graine aléatoire")
+    args = parser.parse_args(argv)
+
+    if args.files is None:
+        generate_test_excel_files()
+        return
+
+    generate_corpus(args.output, files=args.files, rows=args.rows, columns=args.columns,
+                    drift=args.drift, dtype_mix=args.dtype_mix, empty_ratio=args.empty_ratio,
+                    xls_ratio=args.xls_ratio, seed=args.seed)
+    print(f"📁 Corpus créé dans {os.path.abspath(args.output)}")
+
+
 if __name__ == "__main__":
-    generate_test_excel_files()
+    main()
@@ -1,17 +1,50 @@
+import time
+# Instant de référence des mesures de démarrage
+STARTUP_T0 = time.perf_counter()
+
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import pandas as pd
+import argparse
 import os
-from pathlib import Path
 import threading
+import importlib
+import importlib.util
+import queue
 from datetime import datetime
 import sys
 import ctypes
 from ctypes import wintypes
 
+# Le moteur de fusion (pandas, openpyxl, xlrd...) n'est pas importé ici : il
+# est chargé en arrière-plan une fois la fenêtre affichée, ou au premier clic
+# sur « Fusionner » (voir load_engine)
+
+# Intervalle de mise à jour de l'interface pendant une fusion (ms)
+EVENT_TICK_MS = 100
+# Nombre maximal de lignes conservées dans le journal
+LOG_MAX_LINES = 2000
+# Délai entre l'affichage de la fenêtre et le préchargement du moteur (ms)
+WARMUP_DELAY_MS = 300
+# Intervalle de l'animation du fond (ms)
+ANIMATION_INTERVAL_MS = 3000
+
+
+def load_engine():
+    """Importe le moteur de fusion (et pandas) ; sans effet s'il est déjà chargé"""
+    engine = importlib.import_module('merge_engine')
+    # Lecteur optionnel plus rapide, importé par pandas au premier fichier
+    if importlib.util.find_spec('python_calamine') is not None:
+        importlib.import_module('python_calamine')
+    return engine
+
+
 class ExcelMergerApp:
-    def __init__(self, root):
+    def __init__(self, root, animate=True, warmup=True):
         self.root = root
+        self.animate = animate
+        self.warmup = warmup
+        # Mesures du démarrage en ms depuis STARTUP_T0 : étape → durée
+        self.startup_timings = {'imports': (time.perf_counter() - STARTUP_T0) * 1000}
         
         # Optimisations pour la qualité visuelle
         self.setup_high_dpi_support()
@@ -55,15 +88,65 @@ class ExcelMergerApp:
         # Variables pour les animations
         self.animation_running = False
         self.animation_step = 0
+        self.animation_job = None
+        self.animated_frames = []
+        
+        # File d'événements du moteur, vidée par l'interface à intervalle fixe
+        self.event_queue = queue.Queue()
+        self.engine = None
         
         self.setup_modern_ui()
-        self.start_background_animation()
+        self.startup_timings['interface'] = (time.perf_counter() - STARTUP_T0) * 1000
+        self.root.after(EVENT_TICK_MS, self.drain_events)
+        # Animation et préchargement attendent que la fenêtre soit affichée
+        self.root.after_idle(self.on_window_shown)
+    
+    def on_window_shown(self):
+        """Premier passage dans la boucle Tk : la fenêtre est affichée et répond"""
+        self.startup_timings['fenetre'] = (time.perf_counter() - STARTUP_T0) * 1000
+        self.log_message(f"Démarrage: modules {self.startup_timings['imports']:.0f} ms, "
+                         f"interface {self.startup_timings['interface']:.0f} ms, "
+                         f"fenêtre affichée à {self.startup_timings['fenetre']:.0f} ms")
+        if self.animate:
+            self.start_background_animation()
+        if self.warmup:
+            self.root.after(WARMUP_DELAY_MS, self.start_engine_warmup)
+    
+    def start_engine_warmup(self):
+        """Précharge le moteur de fusion dans un thread, pendant que l'utilisateur choisit ses dossiers"""
+        thread = threading.Thread(target=self.warm_up_engine)
+        thread.daemon = True
+        thread.start()
+    
+    def warm_up_engine(self):
+        start = time.perf_counter()
+        try:
+            load_engine()
+        except Exception as e:
+            # L'erreur sera signalée au premier clic sur « Fusionner »
+            self.event_queue.put(('log', f"Préchargement du moteur impossible: {e}", "warning"))
+            return
+        elapsed = (time.perf_counter() - start) * 1000
+        self.startup_timings['moteur'] = elapsed
+        self.event_queue.put(('log', f"Moteur de fusion chargé en arrière-plan ({elapsed:.0f} ms)", "info"))
     
     def start_background_animation(self):
         """Démarre l'animation de background colorée"""
+        if self.animation_running:
+            return
+        # Frames recolorés à chaque cycle, relevés une seule fois
+        self.animated_frames = [widget for widget in self.root.winfo_children()
+                                if isinstance(widget, tk.Frame) and widget.cget('bg') == self.colors['light']]
         self.animation_running = True
         self.animate_background()
     
+    def stop_background_animation(self):
+        """Arrête l'animation (pendant une fusion, ou à la fermeture)"""
+        self.animation_running = False
+        if self.animation_job is not None:
+            self.root.after_cancel(self.animation_job)
+            self.animation_job = None
+    
     def animate_background(self):
         """Animation du background avec des couleurs changeantes"""
         if not self.animation_running:
@@ -88,16 +171,15 @@ class ExcelMergerApp:
         self.animation_step += 1
         
         # Programmer la prochaine animation (changement toutes les 3 secondes)
-        self.root.after(3000, self.animate_background)
+        self.animation_job = self.root.after(ANIMATION_INTERVAL_MS, self.animate_background)
     
     def update_frame_colors(self, bg_color):
         """Met à jour les couleurs des frames pour l'animation"""
         try:
             # Mettre à jour les frames principaux
-            for widget in self.root.winfo_children():
-                if isinstance(widget, tk.Frame) and widget.cget('bg') == self.colors['light']:
-                    widget.configure(bg=bg_color)
-        except:
+            for widget in self.animated_frames:
+                widget.configure(bg=bg_color)
+        except tk.TclError:
             pass  # Ignorer les erreurs de widgets supprimés
     
     def setup_high_dpi_support(self):
@@ -375,6 +457,8 @@ class ExcelMergerApp:
         
         self.add_source_column = tk.BooleanVar(value=True)
         self.ignore_headers = tk.BooleanVar(value=False)
+        self.remove_duplicates = tk.BooleanVar(value=False)
+        self.keep_checkpoint = tk.BooleanVar(value=False)
         
         # Checkbox 1
         cb1_frame = tk.Frame(options_content, bg=self.colors['white'])
@@ -405,6 +489,36 @@ class ExcelMergerApp:
                             activebackground=self.colors['white'],
                             activeforeground=self.colors['accent3'])
         cb2.pack(side=tk.LEFT)
+        
+        # Checkbox 3
+        cb3_frame = tk.Frame(options_content, bg=self.colors['white'])
+        cb3_frame.pack(fill=tk.X, pady=(10, 0))
+        
+        cb3 = tk.Checkbutton(cb3_frame,
+                            text="🧹 Supprimer les lignes en double (entre tous les fichiers)",
+                            variable=self.remove_duplicates,
+                            font=('Segoe UI', 11),
+                            fg=self.colors['accent2'],
+                            bg=self.colors['white'],
+                            selectcolor=self.colors['accent2'],
+                            activebackground=self.colors['white'],
+                            activeforeground=self.colors['accent2'])
+        cb3.pack(side=tk.LEFT)
+        
+        # Checkbox 4
+        cb4_frame = tk.Frame(options_content, bg=self.colors['white'])
+        cb4_frame.pack(fill=tk.X, pady=(10, 0))
+        
+        cb4 = tk.Checkbutton(cb4_frame,
+                            text="💾 Pouvoir reprendre une fusion interrompue (dossier .reprise près du fichier fusionné)",
+                            variable=self.keep_checkpoint,
+                            font=('Segoe UI', 11),
+                            fg=self.colors['accent3'],
+                            bg=self.colors['white'],
+                            selectcolor=self.colors['accent3'],
+                            activebackground=self.colors['white'],
+                            activeforeground=self.colors['accent3'])
+        cb4.pack(side=tk.LEFT)
     
     def create_action_button(self, parent):
         """Crée le bouton d'action principal moderne"""
@@ -415,7 +529,14 @@ class ExcelMergerApp:
                                       text="🚀 Fusionner les fichiers",
                                       command=self.start_merge,
                                       style='Modern.TButton')
-        self.merge_button.pack()
+        self.merge_button.pack(side=tk.LEFT)
+        
+        self.cancel_button = ttk.Button(button_frame,
+                                       text="⏹ Annuler",
+                                       command=self.cancel_merge,
+                                       style='Secondary.TButton',
+                                       state='disabled')
+        self.cancel_button.pack(side=tk.LEFT, padx=(15, 0))
     
     def create_progress_section(self, parent):
         """Crée la section de progression moderne"""
@@ -488,24 +609,20 @@ class ExcelMergerApp:
         file = filedialog.asksaveasfilename(
             title="Enregistrer le fichier fusionné sous",
             defaultextension=".xlsx",
-            filetypes=[("Fichiers Excel", "*.xlsx"), ("Tous les fichiers", "*.*")]
+            filetypes=[("Fichiers Excel", "*.xlsx"),
+                       ("Parquet", "*.parquet"),
+                       ("Feather / Arrow", "*.feather"),
+                       ("CSV", "*.csv"),
+                       ("Tous les fichiers", "*.*")]
         )
         if file:
             self.output_file.set(file)
             self.log_message(f"Fichier de sortie: {file}")
             
-    def log_message(self, message, level="info"):
-        """Ajoute un message au journal avec un style moderne"""
+    def format_log_line(self, message, level="info"):
+        """Formate une ligne du journal avec l'heure et une icône de niveau"""
         timestamp = datetime.now().strftime("%H:%M:%S")
         
-        # Couleurs selon le niveau
-        colors = {
-            "info": self.colors['primary'],
-            "success": self.colors['success'],
-            "warning": self.colors['warning'],
-            "error": self.colors['danger']
-        }
-        
         # Icônes selon le niveau
         icons = {
             "info": "ℹ️",
@@ -514,12 +631,55 @@ class ExcelMergerApp:
             "error": "❌"
         }
         
-        formatted_message = f"[{timestamp}] {icons.get(level, 'ℹ️')} {message}\n"
+        return f"[{timestamp}] {icons.get(level, 'ℹ️')} {message}\n"
         
-        # Insérer le message
-        self.log_text.insert(tk.END, formatted_message)
+    def log_message(self, message, level="info"):
+        """Ajoute un message au journal avec un style moderne"""
+        self.append_log_lines([self.format_log_line(message, level)])
+        
+    def append_log_lines(self, lines):
+        """Insère un lot de lignes puis tronque le journal à LOG_MAX_LINES lignes"""
+        self.log_text.insert(tk.END, ''.join(lines))
+        
+        # Tampon circulaire : supprimer les lignes les plus anciennes
+        line_count = int(self.log_text.index('end-1c').split('.')[0]) - 1
+        if line_count > LOG_MAX_LINES:
+            self.log_text.delete('1.0', f'{line_count - LOG_MAX_LINES + 1}.0')
         self.log_text.see(tk.END)
-        self.root.update_idletasks()
+        
+    def drain_events(self):
+        """Applique par lot les événements du moteur reçus depuis le dernier tick"""
+        lines = []
+        progress = None
+        status = None
+        while True:
+            try:
+                event = self.event_queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(event, tuple):
+                # Message de l'interface elle-même (préchargement du moteur)
+                _, message, level = event
+                lines.append(self.format_log_line(message, level))
+            elif event.kind == 'log':
+                lines.append(self.format_log_line(event.message, event.level))
+            elif event.kind == 'progress':
+                progress = event.progress
+            elif event.kind == 'status':
+                status = event.message
+        
+        if len(lines) > LOG_MAX_LINES:
+            skipped = len(lines) - LOG_MAX_LINES
+            lines = [self.format_log_line(f"... {skipped} lignes non affichées", "info")] + lines[-LOG_MAX_LINES:]
+        if lines:
+            self.append_log_lines(lines)
+        # Seule la dernière progression du lot est affichée
+        if progress is not None:
+            self.progress_var.set(progress)
+        if status is not None:
+            self.status_var.set(status)
+        
+        self.root.after(EVENT_TICK_MS, self.drain_events)
         
     def start_merge(self):
         if not self.input_folder.get():
@@ -532,107 +692,71 @@ class ExcelMergerApp:
             
         # Démarrer la fusion dans un thread séparé pour éviter de bloquer l'interface
         self.merge_button.config(state='disabled')
+        self.cancel_button.config(state='normal')
         self.progress_var.set(0)
+        # L'animation ne doit pas disputer le GIL au thread de fusion
+        self.stop_background_animation()
         
         thread = threading.Thread(target=self.merge_files)
         thread.daemon = True
         thread.start()
         
+    def cancel_merge(self):
+        """Demande l'arrêt de la fusion en cours (effectif avant le fichier suivant)"""
+        if self.engine is not None:
+            self.engine.cancel()
+            self.cancel_button.config(state='disabled')
+            self.status_var.set("⏹ Annulation en cours...")
+    
+    def checkpoint_dir(self):
+        """Point de reprise à côté du fichier de sortie, s'il est demandé"""
+        if not self.keep_checkpoint.get():
+            return None
+        return self.output_file.get() + '.reprise'
+    
     def merge_files(self):
+        if 'merge_engine' not in sys.modules:
+            self.event_queue.put(('log', "Chargement du moteur de fusion...", "info"))
         try:
-            input_path = Path(self.input_folder.get())
-            output_path = Path(self.output_file.get())
-            
-            # Trouver tous les fichiers Excel
-            excel_files = list(input_path.glob("*.xlsx")) + list(input_path.glob("*.xls"))
-            
-            if not excel_files:
-                self.root.after(0, lambda: messagebox.showerror("Erreur", 
-                    "Aucun fichier Excel trouvé dans le dossier sélectionné"))
-                self.root.after(0, lambda: self.merge_button.config(state='normal'))
-                return
-                
-            self.root.after(0, lambda: self.log_message(f"Trouvé {len(excel_files)} fichiers Excel", "info"))
-            self.root.after(0, lambda: self.status_var.set(f"🔄 Fusion de {len(excel_files)} fichiers..."))
-            
-            all_dataframes = []
-            total_files = len(excel_files)
-            
-            for i, file_path in enumerate(excel_files):
-                try:
-                    self.root.after(0, lambda f=file_path: self.log_message(f"Traitement de: {f.name}", "info"))
-                    
-                    # Lire le fichier Excel avec gestion d'erreurs améliorée
-                    try:
-                        df = pd.read_excel(file_path, engine='openpyxl')
-                    except:
-                        # Essayer avec xlrd pour les anciens fichiers .xls
-                        df = pd.read_excel(file_path, engine='xlrd')
-                    
-                    # Vérifier que le DataFrame n'est pas vide
-                    if df.empty:
-                        self.root.after(0, lambda f=file_path: self.log_message(f"Fichier vide ignoré: {f.name}", "warning"))
-                        continue
-                    
-                    # Nettoyer les noms de colonnes (supprimer les espaces en début/fin)
-                    df.columns = df.columns.str.strip()
-                    
-                    # Ajouter une colonne avec le nom du fichier source si demandé
-                    if self.add_source_column.get():
-                        df['Fichier_Source'] = file_path.name
-                    
-                    self.root.after(0, lambda f=file_path, rows=len(df), cols=len(df.columns): 
-                        self.log_message(f"✓ {f.name}: {rows} lignes, {cols} colonnes", "success"))
-                    
-                    all_dataframes.append(df)
-                    
-                    # Mettre à jour la progression
-                    progress = (i + 1) / total_files * 100
-                    self.root.after(0, lambda p=progress: self.progress_var.set(p))
-                    
-                except Exception as e:
-                    self.root.after(0, lambda f=file_path, err=str(e): 
-                        self.log_message(f"Erreur lors du traitement de {f.name}: {err}", "error"))
-                    continue
-            
-            if not all_dataframes:
-                self.root.after(0, lambda: messagebox.showerror("Erreur", 
-                    "Aucun fichier n'a pu être lu correctement"))
-                self.root.after(0, lambda: self.merge_button.config(state='normal'))
-                return
-            
-            # Fusionner tous les DataFrames avec gestion des colonnes
-            self.root.after(0, lambda: self.log_message("Fusion des données...", "info"))
-            
-            # Normaliser les colonnes avant la fusion
-            self.root.after(0, lambda: self.log_message("Normalisation des colonnes...", "info"))
-            normalized_dataframes = self.normalize_dataframes(all_dataframes)
-            
-            # Fusionner les DataFrames normalisés
-            merged_df = pd.concat(normalized_dataframes, ignore_index=True)
-            
-            # Gérer les en-têtes si nécessaire
-            if self.ignore_headers.get():
-                # Garder seulement les en-têtes du premier fichier
-                first_df = normalized_dataframes[0]
-                merged_df.columns = first_df.columns
-            
-            # Sauvegarder le fichier fusionné
-            self.root.after(0, lambda: self.log_message("Sauvegarde du fichier fusionné...", "info"))
-            merged_df.to_excel(output_path, index=False)
-            
-            # Succès
-            self.root.after(0, lambda: self.log_message("Fusion terminée avec succès!", "success"))
-            self.root.after(0, lambda: self.log_message(f"Fichier sauvegardé: {output_path}", "success"))
-            self.root.after(0, lambda: self.log_message(f"Total de lignes: {len(merged_df)}", "success"))
-            self.root.after(0, lambda: self.log_message(f"Total de colonnes: {len(merged_df.columns)}", "success"))
-            
+            engine_module = load_engine()
+        except ImportError as e:
+            self.root.after(0, lambda err=str(e): messagebox.showerror(
+                "❌ Erreur", f"Impossible de charger le moteur de fusion:\n{err}"))
+            self.root.after(0, lambda: self.merge_button.config(state='normal'))
+            self.root.after(0, lambda: self.cancel_button.config(state='disabled'))
+            return
+        MergeCancelled, MergeError = engine_module.MergeCancelled, engine_module.MergeError
+        options = engine_module.MergeOptions(input_folder=self.input_folder.get(),
+                               output_file=self.output_file.get(),
+                               add_source_column=self.add_source_column.get(),
+                               ignore_headers=self.ignore_headers.get(),
+                               dedup=self.remove_duplicates.get(),
+                               checkpoint_dir=self.checkpoint_dir(),
+                               workers=0)
+        self.engine = engine_module.MergeEngine(options, self.on_engine_event)
+        try:
+            result = self.engine.run()
+
             self.root.after(0, lambda: self.status_var.set("🎉 Fusion terminée avec succès!"))
             self.root.after(0, lambda: messagebox.showinfo("🎉 Succès", 
                 f"Fusion terminée avec succès!\n\n"
-                f"📁 Fichier sauvegardé: {output_path}\n"
-                f"📊 Total de lignes: {len(merged_df)}\n"
-                f"📋 Total de colonnes: {len(merged_df.columns)}"))
+                f"📁 Fichier sauvegardé: {result.output_path}\n"
+                f"📊 Total de lignes: {result.rows}\n"
+                f"📋 Total de colonnes: {result.columns}"))
+
+        except MergeCancelled:
+            message = "La fusion a été annulée."
+            # Reprise annoncée seulement si des fichiers lus ont été conservés
+            checkpoint = self.engine.checkpoint
+            resumable = checkpoint.resumable() if checkpoint is not None else []
+            if resumable:
+                message += (f"\n\nRelancez-la avec les mêmes dossiers : les {len(resumable)} "
+                            f"fichier(s) déjà lu(s) ne seront pas relus.")
+            self.root.after(0, lambda: self.status_var.set("⏹ Fusion annulée"))
+            self.root.after(0, lambda: messagebox.showinfo("Fusion annulée", message))
+            
+        except MergeError as e:
+            self.root.after(0, lambda err=str(e): messagebox.showerror("Erreur", err))
             
         except Exception as e:
             self.root.after(0, lambda: self.log_message(f"Erreur: {str(e)}", "error"))
@@ -640,57 +764,33 @@ class ExcelMergerApp:
             self.root.after(0, lambda: messagebox.showerror("❌ Erreur", f"Une erreur s'est produite:\n{str(e)}"))
             
         finally:
+            self.engine = None
             self.root.after(0, lambda: self.merge_button.config(state='normal'))
+            self.root.after(0, lambda: self.cancel_button.config(state='disabled'))
+            if self.animate:
+                self.root.after(0, self.start_background_animation)
     
-    def normalize_dataframes(self, dataframes):
-        """Normalise les DataFrames pour qu'ils aient les mêmes colonnes"""
-        if not dataframes:
-            return dataframes
-        
-        # Collecter toutes les colonnes uniques de tous les DataFrames
-        all_columns = set()
-        for df in dataframes:
-            all_columns.update(df.columns)
-        
-        # Trier les colonnes pour un ordre cohérent
-        all_columns = sorted(list(all_columns))
-        
-        self.root.after(0, lambda: self.log_message(f"Colonnes détectées: {len(all_columns)}", "info"))
-        self.root.after(0, lambda: self.log_message(f"Colonnes: {', '.join(all_columns[:5])}{'...' if len(all_columns) > 5 else ''}", "info"))
-        
-        # Normaliser chaque DataFrame
-        normalized_dfs = []
-        for i, df in enumerate(dataframes):
-            try:
-                # Créer un nouveau DataFrame avec toutes les colonnes
-                normalized_df = pd.DataFrame()
-                
-                for col in all_columns:
-                    if col in df.columns:
-                        # La colonne existe, copier les données
-                        normalized_df[col] = df[col]
-                    else:
-                        # La colonne n'existe pas, remplir avec NaN
-                        normalized_df[col] = pd.NA
-                
-                normalized_dfs.append(normalized_df)
-                self.root.after(0, lambda idx=i: self.log_message(f"DataFrame {idx+1} normalisé: {len(df.columns)} → {len(all_columns)} colonnes", "info"))
-                
-            except Exception as e:
-                self.root.after(0, lambda idx=i, err=str(e): self.log_message(f"Erreur normalisation DataFrame {idx+1}: {err}", "error"))
-                # En cas d'erreur, utiliser le DataFrame original
-                normalized_dfs.append(df)
-        
-        return normalized_dfs
+    def on_engine_event(self, event):
+        """Reçoit les événements du moteur (thread de fusion) ; l'interface les lit par lot"""
+        self.event_queue.put(event)
     
     def on_closing(self):
-        """Arrête l'animation et ferme la fenêtre"""
-        self.animation_running = False
+        """Arrête l'animation et la fusion en cours, puis ferme la fenêtre"""
+        self.stop_background_animation()
+        if self.engine is not None:
+            self.engine.cancel()
         self.root.destroy()
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="main", description="Fusionneur de fichiers Excel (interface graphique)")
+    parser.add_argument("--no-animation", action="store_true",
+                        help="ne pas animer la couleur du fond")
+    parser.add_argument("--no-warmup", action="store_true",
+                        help="ne charger le moteur de fusion qu'au premier clic sur « Fusionner »")
+    args = parser.parse_args(argv)
+    
     root = tk.Tk()
-    app = ExcelMergerApp(root)
+    app = ExcelMergerApp(root, animate=not args.no_animation, warmup=not args.no_warmup)
     
     # Gérer la fermeture de la fenêtre
     root.protocol("WM_DELETE_WINDOW", app.on_closing)
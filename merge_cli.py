@@ -0,0 +1,268 @@
+"""Fusion de fichiers Excel en ligne de commande, sans affichage graphique.
+
+Exemple :
+    python -m merge_cli fichiers_excel_test fusion.xlsx
+"""
+import argparse
+import sys
+from datetime import datetime
+
+from discovery import DEFAULT_INCLUDE
+from merge_engine import MergeEngine, MergeError, MergeOptions
+from readers import READER_BACKENDS
+from rollup import AGGREGATIONS, PERIODS
+from upsert import UPSERT_ORDERS, UPSERT_RULES
+from watch import DEFAULT_POLL_INTERVAL, DEFAULT_REBUILD_SECONDS, DEFAULT_SETTLE_SECONDS, FolderWatcher
+from writers import DEFAULT_CSV_CHUNK_ROWS, OUTPUT_FORMATS, PARQUET_COMPRESSIONS
+
+LEVEL_PREFIXES = {
+    "info": "INFO",
+    "success": " OK ",
+    "warning": "WARN",
+    "error": "ERR ",
+}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="merge_cli",
+        description="Fusionne tous les fichiers Excel d'un dossier en un seul fichier.")
+    parser.add_argument("input_folder", help="dossier contenant les fichiers Excel")
+    parser.add_argument("output_file", help="fichier fusionné à produire")
+    parser.add_argument("--no-source-column", action="store_true",
+                        help="ne pas ajouter la colonne Fichier_Source")
+    parser.add_argument("--ignore-headers", action="store_true",
+                        help="garder seulement les en-têtes du premier fichier")
+    parser.add_argument("-r", "--recursive", action="store_true",
+                        help="chercher aussi dans les sous-dossiers")
+    parser.add_argument("--include", action="append", default=None, metavar="MOTIF",
+                        help="motif des fichiers à inclure (répétable, défaut : *.xlsx et *.xls)")
+    parser.add_argument("--exclude", action="append", default=[], metavar="MOTIF",
+                        help="motif de fichiers ou dossiers à exclure (répétable)")
+    parser.add_argument("--include-hidden", action="store_true",
+                        help="ne pas ignorer les fichiers et dossiers cachés")
+    parser.add_argument("--discovery-walkers", type=int, default=1,
+                        help="threads listant les sous-dossiers en parallèle (défaut : 1)")
+    parser.add_argument("-j", "--workers", type=int, default=1,
+                        help="processus de lecture en parallèle (0 = automatique, défaut : 1)")
+    parser.add_argument("--max-in-flight", type=int, default=None,
+                        help="fichiers en cours de lecture au maximum (défaut : 2 par processus)")
+    parser.add_argument("--chunk-rows", type=int, default=None, metavar="LIGNES",
+                        help="lire chaque classeur par lots de LIGNES lignes (par exemple 50000) : mémoire "
+                             "bornée pour les très grandes feuilles, avec --streaming ou --spill")
+    parser.add_argument("--sheets", default=None,
+                        help="feuilles à lire : '*' pour toutes, ou expression régulière sur leur nom "
+                             "(défaut : première feuille) ; ajoute la colonne Feuille_Source")
+    parser.add_argument("--columns", default=None, metavar="COL1,COL2",
+                        help="ne lire que ces colonnes (séparées par des virgules)")
+    parser.add_argument("--where", action="append", default=[], metavar="CONDITION",
+                        help="ne garder que les lignes qui remplissent la condition, par exemple "
+                             "\"Date >= 2026-01-01\" ou \"Statut == 'Actif'\" (répétable)")
+    parser.add_argument("--reader", dest="reader_backend", choices=READER_BACKENDS, default='auto',
+                        help="lecteur à privilégier (défaut : auto, selon la signature du fichier)")
+    parser.add_argument("-f", "--format", dest="output_format", choices=OUTPUT_FORMATS, default=None,
+                        help="format de sortie (par défaut : selon l'extension du fichier de sortie)")
+    parser.add_argument("--parquet-compression", choices=PARQUET_COMPRESSIONS, default='snappy',
+                        help="compression Parquet (défaut : snappy)")
+    parser.add_argument("--csv-chunk-rows", type=int, default=DEFAULT_CSV_CHUNK_ROWS,
+                        help="lignes écrites par bloc en CSV")
+    parser.add_argument("--xlsx-partition-by", default=None, metavar="COLONNE",
+                        help="une feuille .xlsx par valeur de cette colonne (par exemple Fichier_Source)")
+    parser.add_argument("--xlsx-partition-rows", type=int, default=None, metavar="LIGNES",
+                        help="une feuille .xlsx par bloc de LIGNES lignes")
+    parser.add_argument("--xlsx-workers", type=int, default=1,
+                        help="processus sérialisant les feuilles .xlsx en parallèle (0 = automatique ; "
+                             "défaut : 1, écriture habituelle sans partition demandée)")
+    parser.add_argument("--xlsx-split-files", action="store_true",
+                        help="écrire un classeur par partition (sortie_<partition>.xlsx) au lieu d'un seul")
+    parser.add_argument("--streaming", action="store_true",
+                        help="écrire chaque fichier dès sa lecture (mémoire constante, .xlsx ou .csv)")
+    parser.add_argument("--spill", action="store_true",
+                        help="déverser chaque fichier lu sur disque (Arrow IPC) pour les fusions plus grandes que la mémoire")
+    parser.add_argument("--spill-dir", default=None,
+                        help="dossier des fichiers déversés (défaut : dossier temporaire ; implique --spill)")
+    parser.add_argument("--cache-dir", default=None,
+                        help="dossier du cache Parquet des fichiers déjà lus (nécessite pyarrow)")
+    parser.add_argument("--cache-max-mb", type=int, default=1024,
+                        help="taille maximale du cache en Mo (défaut : 1024)")
+    parser.add_argument("--cache-hash", action="store_true",
+                        help="identifier les fichiers par leur contenu plutôt que taille + date")
+    parser.add_argument("--no-coerce-types", action="store_true",
+                        help="ne pas convertir les colonnes vers un type commun avant la fusion")
+    parser.add_argument("--dedup", action="store_true",
+                        help="retirer les lignes en double (Fichier_Source et Feuille_Source ignorées)")
+    parser.add_argument("--dedup-key", action="append", default=[], metavar="COLONNE",
+                        help="comparer les doublons sur cette colonne seulement, répétable (implique --dedup)")
+    parser.add_argument("--dedup-max-mb", type=int, default=256,
+                        help="mémoire des empreintes de lignes avant déversement sur disque (défaut : 256)")
+    parser.add_argument("--dedup-spill-dir", default=None,
+                        help="dossier où déverser les empreintes au-delà de --dedup-max-mb")
+    parser.add_argument("--rollup-by", action="append", default=[], metavar="COLONNE[:PÉRIODE]",
+                        help="synthèse calculée pendant la fusion, regroupée par cette colonne (répétable) ; "
+                             f"une date peut être regroupée par {', '.join(PERIODS)} (Date:mois)")
+    parser.add_argument("--rollup-value", action="append", default=[], metavar="COLONNE=AGRÉGATS",
+                        help=f"mesure de la synthèse et ses agrégats ({', '.join(AGGREGATIONS)} ; "
+                             "défaut : sum), par exemple Total=sum,mean (répétable)")
+    parser.add_argument("--rollup-file", default=None,
+                        help="fichier de la synthèse (défaut : feuille Synthèse d'une sortie .xlsx, "
+                             "sinon sortie_synthese.<ext>)")
+    parser.add_argument("--upsert-key", action="append", default=[], metavar="COLONNE",
+                        help="fusion par clé : une ligne par valeur de la clé, les fichiers les plus récents "
+                             "mettant à jour les lignes existantes (répétable pour une clé composée)")
+    parser.add_argument("--upsert-order", choices=UPSERT_ORDERS, default='name',
+                        help="ordre d'application des fichiers en fusion par clé : nom ou date de "
+                             "modification (défaut : name)")
+    parser.add_argument("--upsert-rule", action="append", default=[], metavar="COLONNE=RÈGLE",
+                        help=f"règle de mise à jour d'une colonne ({', '.join(UPSERT_RULES)} ; "
+                             "défaut : last, la dernière valeur non vide)")
+    parser.add_argument("--upsert-state-dir", default=None,
+                        help="conserver la table maître entre deux exécutions : seuls les nouveaux fichiers "
+                             "sont appliqués au lancement suivant")
+    parser.add_argument("--checkpoint-dir", default=None,
+                        help="dossier du point de reprise : relancer la même commande après une "
+                             "interruption reprend sans relire les fichiers déjà analysés (nécessite pyarrow)")
+    parser.add_argument("--watch", action="store_true",
+                        help="surveiller le dossier et mettre à jour la sortie à chaque dépôt : une partition "
+                             "par fichier si la sortie est un dossier, sinon reconstruction périodique")
+    parser.add_argument("--watch-interval", type=float, default=DEFAULT_POLL_INTERVAL, metavar="SECONDES",
+                        help=f"intervalle de relevé du dossier sans watchdog (défaut : {DEFAULT_POLL_INTERVAL:g})")
+    parser.add_argument("--settle-seconds", type=float, default=DEFAULT_SETTLE_SECONDS, metavar="SECONDES",
+                        help="durée pendant laquelle un fichier doit rester inchangé avant d'être lu "
+                             f"(défaut : {DEFAULT_SETTLE_SECONDS:g})")
+    parser.add_argument("--rebuild-every", type=float, default=DEFAULT_REBUILD_SECONDS, metavar="SECONDES",
+                        help="délai minimal entre deux reconstructions d'un fichier de sortie "
+                             f"(défaut : {DEFAULT_REBUILD_SECONDS:g})")
+    parser.add_argument("--report", dest="report_file", default=None, metavar="FICHIER.json",
+                        help="enregistrer un rapport JSON (durées, CPU, mémoire par étape et par fichier)")
+    parser.add_argument("--profile", dest="profile_file", default=None, metavar="FICHIER.prof",
+                        help="enregistrer un profil cProfile de l'exécution")
+    parser.add_argument("--plan", action="store_true",
+                        help="estimer la fusion (lignes, schéma, mémoire et durée de chaque stratégie) "
+                             "sans lire les fichiers en entier, puis quitter")
+    parser.add_argument("--no-auto-strategy", action="store_true",
+                        help="toujours fusionner en mémoire, sauf --streaming ou --spill")
+    parser.add_argument("--memory-budget-mb", type=int, default=None,
+                        help="mémoire utilisable pour choisir la stratégie (défaut : 70 %% de la mémoire disponible)")
+    parser.add_argument("--scan", action="store_true",
+                        help="analyser seulement les en-têtes et afficher le schéma, sans fusionner")
+    parser.add_argument("-q", "--quiet", action="store_true",
+                        help="n'afficher que les avertissements et les erreurs")
+    return parser
+
+
+def make_printer(quiet):
+    """Construit le callback qui affiche les événements du moteur"""
+    def on_event(event):
+        if event.kind != 'log':
+            return
+        if quiet and event.level not in ("warning", "error"):
+            return
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        stream = sys.stderr if event.level == "error" else sys.stdout
+        print(f"[{timestamp}] {LEVEL_PREFIXES.get(event.level, 'INFO')} {event.message}", file=stream)
+    return on_event
+
+
+def options_from_args(args):
+    """Traduit les arguments de la ligne de commande en ``MergeOptions``"""
+    return MergeOptions(input_folder=args.input_folder,
+                        output_file=args.output_file,
+                        add_source_column=not args.no_source_column,
+                        ignore_headers=args.ignore_headers,
+                        recursive=args.recursive,
+                        include=tuple(args.include or DEFAULT_INCLUDE),
+                        exclude=tuple(args.exclude),
+                        skip_hidden=not args.include_hidden,
+                        discovery_walkers=args.discovery_walkers,
+                        workers=args.workers,
+                        max_in_flight=args.max_in_flight,
+                        sheets=args.sheets,
+                        chunk_rows=args.chunk_rows,
+                        columns=tuple(args.columns.split(',')) if args.columns else (),
+                        where=tuple(args.where),
+                        reader_backend=args.reader_backend,
+                        output_format=args.output_format,
+                        parquet_compression=args.parquet_compression,
+                        csv_chunk_rows=args.csv_chunk_rows,
+                        xlsx_partition_by=args.xlsx_partition_by,
+                        xlsx_partition_rows=args.xlsx_partition_rows,
+                        xlsx_workers=args.xlsx_workers,
+                        xlsx_split_files=args.xlsx_split_files,
+                        auto_strategy=not args.no_auto_strategy,
+                        memory_budget_mb=args.memory_budget_mb,
+                        streaming=args.streaming,
+                        spill=args.spill,
+                        spill_dir=args.spill_dir,
+                        checkpoint_dir=args.checkpoint_dir,
+                        report_file=args.report_file,
+                        profile_file=args.profile_file,
+                        cache_dir=args.cache_dir,
+                        cache_max_mb=args.cache_max_mb,
+                        cache_hash=args.cache_hash,
+                        coerce_types=not args.no_coerce_types,
+                        dedup=args.dedup,
+                        dedup_keys=tuple(args.dedup_key),
+                        dedup_max_mb=args.dedup_max_mb,
+                        dedup_spill_dir=args.dedup_spill_dir,
+                        upsert_keys=tuple(args.upsert_key),
+                        upsert_order=args.upsert_order,
+                        upsert_rules=tuple(args.upsert_rule),
+                        upsert_state_dir=args.upsert_state_dir,
+                        rollup_by=tuple(args.rollup_by),
+                        rollup_values=tuple(args.rollup_value),
+                        rollup_file=args.rollup_file)
+
+
+def print_schema(schema_scan):
+    """Affiche le résultat de la pré-analyse des en-têtes"""
+    print(f"{len(schema_scan.files)} fichiers, ~{schema_scan.estimated_rows} lignes, "
+          f"{len(schema_scan.columns)} colonnes")
+    for column in schema_scan.columns:
+        present = sum(1 for columns in schema_scan.column_maps.values() if column in columns)
+        origin = f"{present} fichier(s)" if present else "colonne ajoutée"
+        print(f"  {column:<30} {schema_scan.dtype_hints[column]:<9} {origin}")
+    for file_schema in schema_scan.failed_files:
+        print(f"  illisible: {file_schema.path.name}: {file_schema.error}")
+
+
+def watch(args):
+    """Mode surveillance : tourne jusqu'à Ctrl+C"""
+    try:
+        watcher = FolderWatcher(options_from_args(args), make_printer(args.quiet),
+                                interval=args.watch_interval, settle=args.settle_seconds,
+                                rebuild_every=args.rebuild_every)
+        watcher.run()
+    except KeyboardInterrupt:
+        print("Surveillance arrêtée", file=sys.stderr)
+    except MergeError as e:
+        print(f"Erreur: {e}", file=sys.stderr)
+        return 2
+    return 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.watch:
+        return watch(args)
+    engine = MergeEngine(options_from_args(args), make_printer(args.quiet))
+    try:
+        if args.plan:
+            print("\n".join(engine.dry_run().describe()))
+        elif args.scan:
+            print_schema(engine.preview())
+        else:
+            engine.run()
+    except KeyboardInterrupt:
+        print("Fusion interrompue", file=sys.stderr)
+        return 130
+    except MergeError as e:
+        print(f"Erreur: {e}", file=sys.stderr)
+        return 2
+    except Exception as e:
+        print(f"Une erreur s'est produite: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1224 @@
+"""Moteur de fusion de fichiers Excel, indépendant de toute interface graphique.
+
+Le moteur ne dépend pas de tkinter : il signale sa progression via un
+callback qui reçoit des objets ``MergeEvent``. L'interface graphique
+(``main.py``) et la ligne de commande (``merge_cli.py``) ne sont que des
+clients de ce module.
+"""
+import cProfile
+import importlib.util
+import itertools
+import re
+import threading
+import time
+import pandas as pd
+from functools import partial
+from pathlib import Path
+from dataclasses import asdict, dataclass
+
+from cache import SourceCache
+from checkpoint import JobCheckpoint
+from coercion import DtypePlanner, apply_plan, arrow_schema, complete_plan, plan_from_hints
+from dedup import RowDeduplicator
+from discovery import DEFAULT_INCLUDE, BackgroundDiscovery, iter_excel_files, path_key
+from filters import make_read_filter
+from parallel_xlsx import write_partitioned_excel
+from planner import (MEMORY, SPILL, STREAMING, STRATEGY_LABELS, SizeWatch, fits_by_size, memory_budget,
+                     plan_merge, size_limit, unavailable_strategies)
+from readers import (ALL_SHEETS, iter_excel_chunks, iter_read, read_excel_file, resolve_workers,
+                     resolve_workers_for)
+from rollup import ROLLUP_SHEET, Rollup
+from run_report import RunReport
+from schema import describe_conflict, scan_schema
+from spill import SpillStore
+from upsert import UPSERT_ORDERS, UpsertState, UpsertTable, order_files, parse_rules
+from writers import (DEFAULT_CSV_CHUNK_ROWS, FEATHER, PARQUET, STREAMING_FORMATS, XLSX,
+                     detect_format, open_stream_writer, write_dataframe)
+
+
+class MergeError(Exception):
+    """Erreur bloquante qui empêche la fusion d'aboutir"""
+
+
+class MergeCancelled(MergeError):
+    """Fusion interrompue à la demande de l'utilisateur"""
+
+
+@dataclass
+class MergeOptions:
+    """Paramètres d'une fusion"""
+    input_folder: str
+    output_file: str
+    add_source_column: bool = True
+    ignore_headers: bool = False
+    # Recherche des fichiers : sous-dossiers, motifs d'inclusion/exclusion
+    recursive: bool = False
+    include: tuple = DEFAULT_INCLUDE
+    exclude: tuple = ()
+    skip_hidden: bool = True
+    # Threads listant les sous-dossiers en parallèle
+    discovery_walkers: int = 1
+    # Processus de lecture : 1 = séquentiel, 0 = automatique
+    workers: int = 1
+    # Fichiers soumis au pool sans avoir été consommés (défaut : 2 par processus)
+    max_in_flight: int = None
+    # Écrire chaque source dès sa lecture (.xlsx write-only ou .csv)
+    streaming: bool = False
+    # Déverser chaque source sur disque (Arrow IPC) avant l'écriture finale
+    spill: bool = False
+    spill_dir: str = None
+    # Feuilles à lire : None = la première, '*' = toutes, sinon expression régulière
+    sheets: str = None
+    # Lire chaque classeur par lots de N lignes (None = d'un bloc) : mémoire
+    # bornée pour les très grandes feuilles, fichiers lus un par un
+    chunk_rows: int = None
+    # Colonnes à conserver (vide = toutes) et conditions sur les lignes (« Statut == 'Actif' »)
+    columns: tuple = ()
+    where: tuple = ()
+    # Lecteur : 'auto' (selon la signature du fichier) ou un nom de readers.BACKENDS
+    reader_backend: str = 'auto'
+    # Format de sortie (xlsx, csv, parquet, feather) ; None = selon l'extension
+    output_format: str = None
+    parquet_compression: str = 'snappy'
+    csv_chunk_rows: int = DEFAULT_CSV_CHUNK_ROWS
+    # Point de reprise : manifeste + sources déjà lues, pour reprendre après une interruption
+    checkpoint_dir: str = None
+    # Rapport JSON de l'exécution et profil cProfile (désactivés si None)
+    report_file: str = None
+    profile_file: str = None
+    # Cache Parquet des fichiers déjà lus (désactivé si None)
+    cache_dir: str = None
+    cache_max_mb: int = 1024
+    # Identifier les fichiers par empreinte de contenu plutôt que taille + date
+    cache_hash: bool = False
+    # Convertir chaque colonne vers un type commun avant la concaténation
+    coerce_types: bool = True
+    # Suppression des lignes en double (colonnes clés : toutes par défaut)
+    dedup: bool = False
+    dedup_keys: tuple = ()
+    # Empreintes gardées en mémoire avant déversement sur disque (si dossier renseigné)
+    dedup_max_mb: int = 256
+    dedup_spill_dir: str = None
+    # Fusion par clé métier au lieu de l'empilement : colonnes clés, ordre
+    # d'application ('name' ou 'mtime'), règles « Colonne=règle » et dossier
+    # d'état pour n'appliquer que les nouveaux fichiers au lancement suivant
+    upsert_keys: tuple = ()
+    upsert_order: str = 'name'
+    upsert_rules: tuple = ()
+    upsert_state_dir: str = None
+    # Sortie .xlsx partitionnée : une feuille par valeur d'une colonne ou par
+    # bloc de lignes, sérialisées par des processus (1 = sans partition
+    # demandée, écriture pandas habituelle ; 0 = automatique), et un classeur
+    # par partition si demandé
+    xlsx_partition_by: str = None
+    xlsx_partition_rows: int = None
+    xlsx_workers: int = 1
+    xlsx_split_files: bool = False
+    # Sans stratégie imposée (streaming, déversement), choisir d'après le plan
+    # estimé des grandes fusions ; mémoire utilisable en Mo (None = selon la
+    # mémoire disponible)
+    auto_strategy: bool = True
+    memory_budget_mb: int = None
+    # Synthèse calculée pendant la lecture : colonnes de regroupement
+    # (« Date:mois » pour regrouper les dates par période) et mesures
+    # (« Total=sum,mean ») ; écrite dans la feuille « Synthèse » d'une sortie
+    # .xlsx, sinon dans <sortie>_synthese.<ext>, ou dans ``rollup_file``
+    rollup_by: tuple = ()
+    rollup_values: tuple = ()
+    rollup_file: str = None
+
+
+@dataclass
+class MergeEvent:
+    """Événement émis par le moteur pendant la fusion
+
+    ``kind`` vaut ``'log'`` (message + niveau), ``'progress'`` (pourcentage
+    dans ``progress``) ou ``'status'`` (texte de statut court).
+    """
+    kind: str
+    message: str = ''
+    level: str = 'info'
+    progress: float = 0.0
+
+
+@dataclass
+class MergeResult:
+    """Résumé d'une fusion terminée"""
+    output_path: Path
+    rows: int
+    columns: int
+    files_found: int
+    files_merged: int
+    files_failed: int
+    duplicates_removed: int = 0
+    report: RunReport = None
+
+
+class MergeEngine:
+    def __init__(self, options, on_event=None):
+        self.options = options
+        self.on_event = on_event
+        self.checkpoint = None
+        self.row_filter = None
+        self.rollup = None
+        self._cancel_requested = threading.Event()
+
+    def cancel(self):
+        """Demande l'arrêt de la fusion (appelable depuis un autre thread)
+
+        La fusion s'arrête avant le prochain fichier ; le point de reprise
+        éventuel est conservé.
+        """
+        self._cancel_requested.set()
+
+    def check_cancelled(self):
+        if self._cancel_requested.is_set():
+            raise MergeCancelled("Fusion annulée")
+
+    def emit(self, kind, message='', level='info', progress=0.0):
+        """Transmet un événement au callback s'il y en a un"""
+        if self.on_event is not None:
+            self.on_event(MergeEvent(kind, message, level, progress))
+
+    def log(self, message, level="info"):
+        self.emit('log', message, level)
+
+    def discover(self):
+        """Lance la recherche des fichiers Excel en arrière-plan"""
+        input_path = Path(self.options.input_folder)
+        if not input_path.is_dir():
+            raise MergeError(f"Dossier introuvable: {input_path}")
+        paths = iter_excel_files(input_path,
+                                 recursive=self.options.recursive,
+                                 include=self.options.include or DEFAULT_INCLUDE,
+                                 exclude=self.options.exclude,
+                                 skip_hidden=self.options.skip_hidden,
+                                 walkers=self.options.discovery_walkers,
+                                 skip_paths=written_files(self.options))
+        self.discovery = BackgroundDiscovery(paths)
+        return self.discovery
+
+    def find_excel_files(self):
+        """Liste tous les fichiers Excel du dossier d'entrée"""
+        return list(self.discover())
+
+    def run(self):
+        """Exécute la fusion complète et renvoie un ``MergeResult``
+
+        Les mesures de l'exécution sont collectées dans ``self.report`` et
+        enregistrées en JSON si ``report_file`` est renseigné, y compris en
+        cas d'échec.
+        """
+        self.report = RunReport(options=asdict(self.options))
+        profiler = None
+        if self.options.profile_file:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        try:
+            result = self._run()
+        except (MergeCancelled, KeyboardInterrupt):
+            self.report.finish('cancelled', error="Fusion annulée", files_failed=getattr(self, 'files_failed', 0))
+            self.close_checkpoint('cancelled')
+            raise
+        except Exception as e:
+            self.report.finish('error', error=str(e), files_failed=getattr(self, 'files_failed', 0))
+            self.close_checkpoint('error')
+            raise
+        else:
+            self.close_checkpoint('done')
+            self.report.finish('success', rows=result.rows, columns=result.columns,
+                               files_found=result.files_found, files_merged=result.files_merged,
+                               files_failed=result.files_failed,
+                               duplicates_removed=result.duplicates_removed)
+            for line in self.report.summary_lines():
+                self.log(line, "info")
+            result.report = self.report
+            return result
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(self.options.profile_file)
+                self.log(f"Profil cProfile enregistré: {self.options.profile_file}", "info")
+            if self.options.report_file:
+                self.report.save(self.options.report_file)
+                self.log(f"Rapport d'exécution enregistré: {self.options.report_file}", "info")
+
+    def _run(self):
+        output_path = Path(self.options.output_file)
+        self.output_format = self.check_output_format(output_path)
+        self.check_sheet_rule()
+        self.row_filter = self.build_row_filter()
+        self.rollup = self.open_rollup()
+
+        # Trouver les fichiers Excel ; la fusion en mémoire commence à lire
+        # pendant que la recherche se poursuit, y compris quand la stratégie
+        # reste à choisir (voir ``merge_auto``)
+        auto = self.options.auto_strategy and self.forced_strategy is None
+        if self.options.streaming or self.options.upsert_keys:
+            with self.report.stage('discovery'):
+                excel_files = self.find_excel_files()
+            if not excel_files:
+                raise MergeError("Aucun fichier Excel trouvé dans le dossier sélectionné")
+            self.log(f"Trouvé {len(excel_files)} fichiers Excel", "info")
+            self.emit('status', f"🔄 Fusion de {len(excel_files)} fichiers...")
+        else:
+            discovered = iter(self.discover())
+            first = next(discovered, None)
+            if first is None:
+                raise MergeError("Aucun fichier Excel trouvé dans le dossier sélectionné")
+            excel_files = itertools.chain([first], discovered)
+            self.emit('status', "🔄 Fusion des fichiers...")
+
+        strategy = self.forced_strategy or MEMORY
+
+        self.files_failed = 0
+        # Fichiers illisibles, dans l'ordre de lecture
+        self.unreadable = []
+        self.checkpoint = self.open_checkpoint()
+        self.dedup = self.open_dedup()
+        try:
+            if auto:
+                rows, columns, files_merged = self.merge_auto(excel_files, output_path)
+            elif self.options.upsert_keys:
+                rows, columns, files_merged = self.merge_upsert(excel_files, output_path)
+            elif strategy == STREAMING:
+                rows, columns, files_merged = self.merge_streaming(excel_files, output_path)
+            elif strategy == SPILL:
+                rows, columns, files_merged = self.merge_spilled(excel_files, output_path)
+            else:
+                rows, columns, files_merged = self.merge_in_memory(excel_files, output_path)
+        finally:
+            if self.dedup is not None:
+                self.dedup.close()
+
+        duplicates_removed = 0
+        if self.dedup is not None:
+            duplicates_removed = self.dedup.dropped
+            self.log(f"Doublons retirés: {duplicates_removed}", "info")
+        if self.rollup is not None and self.rollup_path(output_path) is not None:
+            self.write_rollup(output_path)
+
+        self.log("Fusion terminée avec succès!", "success")
+        self.log(f"Fichier sauvegardé: {output_path}", "success")
+        self.log(f"Total de lignes: {rows}", "success")
+        self.log(f"Total de colonnes: {columns}", "success")
+
+        return MergeResult(output_path=output_path,
+                           rows=rows,
+                           columns=columns,
+                           files_found=self.discovery.found,
+                           files_merged=files_merged,
+                           files_failed=self.files_failed,
+                           duplicates_removed=duplicates_removed)
+
+    def check_output_format(self, output_path):
+        """Valide le format de sortie avant de lire le moindre fichier"""
+        try:
+            output_format = detect_format(output_path, self.options.output_format)
+        except ValueError as e:
+            raise MergeError(str(e))
+        if output_format in (PARQUET, FEATHER) and importlib.util.find_spec('pyarrow') is None:
+            raise MergeError(f"Le format {output_format} nécessite le paquet 'pyarrow' (pip install pyarrow)")
+        if self.spill_enabled:
+            if self.options.streaming:
+                raise MergeError("Les modes streaming et déversement sur disque ne peuvent pas être combinés")
+            if importlib.util.find_spec('pyarrow') is None:
+                raise MergeError("Le déversement sur disque nécessite le paquet 'pyarrow' (pip install pyarrow)")
+        if self.options.upsert_keys:
+            if self.options.streaming or self.spill_enabled:
+                raise MergeError("La fusion par clé ne peut pas être combinée aux modes streaming "
+                                 "ou déversement sur disque")
+            if self.options.upsert_order not in UPSERT_ORDERS:
+                raise MergeError(f"Ordre d'application inconnu '{self.options.upsert_order}' "
+                                 f"(possibles: {', '.join(UPSERT_ORDERS)})")
+        if self.xlsx_partitioned:
+            if output_format != XLSX:
+                raise MergeError("Le partitionnement des feuilles ne s'applique qu'à une sortie .xlsx")
+            if self.options.streaming or self.spill_enabled:
+                raise MergeError("Le partitionnement des feuilles .xlsx ne peut pas être combiné aux modes "
+                                 "streaming ou déversement sur disque")
+            if self.options.xlsx_partition_rows is not None and self.options.xlsx_partition_rows <= 0:
+                raise MergeError("Le nombre de lignes par feuille doit être positif")
+        if self.options.streaming and output_format not in STREAMING_FORMATS:
+            raise MergeError(f"Le format {output_format} n'est pas disponible en mode streaming "
+                             f"(formats possibles: {', '.join(STREAMING_FORMATS)})")
+        return output_format
+
+    @property
+    def xlsx_partitioned(self):
+        options = self.options
+        return bool(options.xlsx_partition_by or options.xlsx_partition_rows
+                    or options.xlsx_split_files or options.xlsx_workers != 1)
+
+    @property
+    def spill_enabled(self):
+        return bool(self.options.spill or self.options.spill_dir)
+
+    @property
+    def forced_strategy(self):
+        """Stratégie imposée par les options, ou None si elle peut être choisie"""
+        if self.options.streaming:
+            return STREAMING
+        if self.spill_enabled:
+            return SPILL
+        if self.options.upsert_keys or self.xlsx_partitioned:
+            return MEMORY
+        return None
+
+    def unavailable_strategies(self):
+        unavailable = unavailable_strategies(self.output_format)
+        if self.options.upsert_keys:
+            unavailable.update({STREAMING: "fusion par clé", SPILL: "fusion par clé"})
+        elif self.xlsx_partitioned:
+            unavailable.update({STREAMING: "feuilles .xlsx partitionnées", SPILL: "feuilles .xlsx partitionnées"})
+        return unavailable
+
+    def plan(self, excel_files, budget=None):
+        """Estime la fusion d'après un échantillon de chaque fichier (``planner.MergePlan``)"""
+        self.log("Estimation de la fusion (échantillon de chaque fichier)...", "info")
+        workers = resolve_workers(self.options.workers, len(excel_files))
+        return plan_merge(excel_files, self.output_format,
+                          add_source_column=self.options.add_source_column,
+                          backend=self.options.reader_backend,
+                          sheets=self.options.sheets,
+                          row_filter=self.row_filter,
+                          workers=workers,
+                          budget=budget,
+                          unavailable=self.unavailable_strategies())
+
+    def choose_strategy(self, excel_files, budget=None):
+        """Choisit la stratégie de fusion ; seules les grandes fusions sont estimées"""
+        if budget is None:
+            budget = memory_budget(self.options.memory_budget_mb)
+        if fits_by_size(excel_files, self.output_format, budget):
+            return MEMORY
+        with self.report.stage('plan'):
+            plan = self.plan(excel_files, budget)
+        for line in plan.describe():
+            self.log(line, "info")
+        if plan.chosen != MEMORY:
+            self.log(f"Stratégie retenue d'après l'estimation: {STRATEGY_LABELS[plan.chosen]}", "warning")
+        return plan.chosen
+
+    def dry_run(self):
+        """Estime la fusion sans lire les fichiers en entier ni rien écrire"""
+        self.report = RunReport(options=asdict(self.options))
+        self.output_format = self.check_output_format(Path(self.options.output_file))
+        self.check_sheet_rule()
+        self.row_filter = self.build_row_filter()
+        excel_files = self.find_excel_files()
+        if not excel_files:
+            raise MergeError("Aucun fichier Excel trouvé dans le dossier sélectionné")
+        self.log(f"Trouvé {len(excel_files)} fichiers Excel", "info")
+        plan = self.plan(excel_files, memory_budget(self.options.memory_budget_mb))
+        if self.forced_strategy is not None:
+            plan.chosen = self.forced_strategy
+        return plan
+
+    def check_sheet_rule(self):
+        """Valide l'expression régulière de sélection des feuilles"""
+        sheets = self.options.sheets
+        if sheets is None or sheets == ALL_SHEETS:
+            return
+        try:
+            re.compile(sheets)
+        except re.error as e:
+            raise MergeError(f"Règle de sélection des feuilles invalide '{sheets}': {e}")
+
+    def build_row_filter(self):
+        """Construit le filtre de lecture (colonnes et conditions) s'il est demandé"""
+        try:
+            row_filter = make_read_filter(self.options.columns, self.options.where)
+        except ValueError as e:
+            raise MergeError(str(e))
+        if row_filter is not None:
+            self.log(f"Filtre de lecture: {row_filter.describe()}", "info")
+        return row_filter
+
+    def open_rollup(self):
+        """Prépare la synthèse si elle est demandée"""
+        if not (self.options.rollup_by or self.options.rollup_values):
+            return None
+        try:
+            rollup = Rollup(self.options.rollup_by, self.options.rollup_values)
+        except ValueError as e:
+            raise MergeError(str(e))
+        if self.row_filter is not None:
+            dropped = [column for column in rollup.columns if not self.row_filter.keeps(column)]
+            if dropped:
+                raise MergeError(f"Colonnes de la synthèse absentes de la sélection de colonnes: "
+                                 f"{', '.join(dropped)}")
+        self.log(f"Synthèse calculée pendant la fusion: {rollup.describe()}", "info")
+        return rollup
+
+    def feed_rollup(self, df):
+        """Ajoute une source à la synthèse ; la fusion par clé la calcule sur la table finale"""
+        if self.rollup is not None and not self.options.upsert_keys:
+            self.rollup.add(df)
+
+    def rollup_path(self, output_path):
+        """Fichier de la synthèse, ou None si elle est une feuille du classeur de sortie"""
+        return rollup_file_path(self.options, output_path, self.output_format)
+
+    def rollup_result(self):
+        summary = self.rollup.result()
+        self.log(f"Synthèse: {len(summary)} groupe(s) pour {self.rollup.rows} lignes", "info")
+        return summary
+
+    def rollup_sheets(self, output_path):
+        """Feuilles à ajouter au classeur de sortie : la synthèse, si elle y est écrite"""
+        if self.rollup is None or self.output_format != XLSX or self.rollup_path(output_path) is not None:
+            return []
+        return [(ROLLUP_SHEET, self.rollup_result())]
+
+    def write_rollup(self, output_path):
+        """Écrit la synthèse dans son propre fichier"""
+        path = self.rollup_path(output_path)
+        summary = self.rollup_result()
+        output_format = None if self.options.rollup_file else self.output_format
+        try:
+            write_dataframe(summary, path, output_format,
+                            parquet_compression=self.options.parquet_compression,
+                            on_warning=lambda message: self.log(message, "warning"))
+        except ValueError as e:
+            raise MergeError(str(e))
+        self.log(f"Synthèse enregistrée: {path}", "success")
+
+    def no_sources_error(self):
+        """Erreur levée quand aucune source n'a produit de lignes"""
+        if self.row_filter is not None and self.row_filter.predicates:
+            return MergeError("Aucune ligne ne remplit les conditions du filtre de lecture")
+        return MergeError("Aucun fichier n'a pu être lu correctement")
+
+    def iter_sources(self, excel_files):
+        """Lit les fichiers et produit les DataFrames non vides, dans l'ordre
+
+        ``excel_files`` peut être une liste ou un itérateur alimenté par la
+        recherche en cours ; la progression n'est alors publiée qu'une fois
+        le nombre total de fichiers connu.
+        """
+        if self.options.chunk_rows:
+            yield from self.iter_source_chunks(excel_files)
+            return
+
+        total_files = len(excel_files) if isinstance(excel_files, list) else None
+        workers, excel_files = resolve_workers_for(self.options.workers, excel_files)
+        if workers > 1:
+            self.log(f"Lecture parallèle sur {workers} processus", "info")
+
+        read_func = partial(read_excel_file, add_source_column=self.options.add_source_column,
+                            backend=self.options.reader_backend, sheets=self.options.sheets,
+                            row_filter=self.row_filter)
+        backend_counts = {}
+        rows_scanned = rows_kept = 0
+        cache = self.open_cache()
+        if cache is not None:
+            variant = f"source={self.options.add_source_column}|sheets={self.options.sheets}"
+            if self.row_filter is not None:
+                variant += f"|filter={self.row_filter.describe()}"
+            read_func = cache.reader(read_func, variant=variant)
+
+        try:
+            for outcome in iter_read(excel_files, read_func, workers, self.options.max_in_flight):
+                self.check_cancelled()
+                file_path = outcome.path
+                if total_files is None and self.discovery.finished:
+                    total_files = self.discovery.found
+                    self.log(f"Trouvé {total_files} fichiers Excel", "info")
+                    self.emit('status', f"🔄 Fusion de {total_files} fichiers...")
+                self.log(f"Traitement de: {file_path.name}", "info")
+
+                if outcome.error is not None:
+                    if self.checkpoint is not None:
+                        self.checkpoint.record(file_path, 'error', error=outcome.error)
+                    self.files_failed += 1
+                    self.unreadable.append(file_path)
+                    self.report.add_file(file_path, outcome.seconds, error=outcome.error, status='error')
+                    self.log(f"Erreur lors du traitement de {file_path.name}: {outcome.error}", "error")
+                    continue
+
+                df = outcome.value
+                cache_key = None
+                if cache is not None:
+                    df, record = df
+                    cache.record(file_path, record)
+                    cache_key = record.key if record.stored_bytes else None
+                if self.checkpoint is not None:
+                    self.checkpoint.record(file_path, 'read', len(df), df.columns, cache_key)
+                backend = df.attrs.get('reader_backend', '?')
+                scanned = df.attrs.get('rows_scanned', len(df))
+                if self.row_filter is not None:
+                    rows_scanned += scanned
+                    rows_kept += len(df)
+
+                # Vérifier que le DataFrame n'est pas vide
+                if df.empty:
+                    if scanned:
+                        self.report.add_file(file_path, outcome.seconds, backend=backend,
+                                             rows_scanned=scanned, status='filtered')
+                        self.log(f"Aucune ligne retenue par le filtre dans {file_path.name} ({scanned} lues)", "info")
+                        continue
+                    self.report.add_file(file_path, outcome.seconds, backend=backend, status='empty')
+                    self.log(f"Fichier vide ignoré: {file_path.name}", "warning")
+                    continue
+
+                duplicates = 0
+                if self.dedup is not None:
+                    missing = self.dedup.missing_keys(df)
+                    if missing:
+                        self.log(f"Colonnes clés absentes de {file_path.name}: {', '.join(missing)}", "warning")
+                    df = self.dedup.filter(df, file_path)
+                    duplicates = self.dedup.dropped_by_file[str(file_path)]
+                    if df.empty:
+                        self.report.add_file(file_path, outcome.seconds, backend=backend, rows_scanned=scanned,
+                                             duplicates=duplicates, status='duplicate')
+                        self.log(f"Toutes les lignes de {file_path.name} sont des doublons ({duplicates})", "warning")
+                        continue
+
+                self.report.add_file(file_path, outcome.seconds, len(df), len(df.columns), backend,
+                                     rows_scanned=scanned, duplicates=duplicates)
+                backend_counts[backend] = backend_counts.get(backend, 0) + 1
+                kept = f"{len(df)} lignes" if scanned == len(df) else f"{len(df)} lignes sur {scanned} lues"
+                self.log(f"✓ {file_path.name}: {kept}, {len(df.columns)} colonnes "
+                         f"({backend}, {outcome.seconds:.2f} s)", "success")
+                if duplicates:
+                    self.log(f"{duplicates} doublon(s) retiré(s) de {file_path.name}", "info")
+                self.feed_rollup(df)
+                yield file_path, df
+
+                # Mettre à jour la progression
+                if total_files:
+                    self.emit('progress', progress=(outcome.index + 1) / total_files * 100)
+        finally:
+            # Index enregistré même après une annulation ou une erreur : les
+            # entrées écrites entre-temps restent comptées par l'éviction
+            if cache is not None:
+                self.save_cache(cache)
+
+        if total_files is None:
+            self.log(f"Trouvé {self.discovery.found} fichiers Excel", "info")
+
+        if self.row_filter is not None:
+            self.log(f"Filtre de lecture: {rows_kept} lignes retenues sur {rows_scanned} lues", "info")
+
+        if backend_counts:
+            summary = ', '.join(f"{name} ×{count}" for name, count in sorted(backend_counts.items()))
+            self.log(f"Lecteurs utilisés: {summary}", "info")
+
+        if cache is not None:
+            self.log(f"Cache: {cache.hits} fichier(s) réutilisé(s), {cache.misses} lu(s), "
+                     f"{cache.evicted} entrée(s) évincée(s)", "info")
+
+    def iter_source_chunks(self, excel_files):
+        """Lit les fichiers par lots de ``chunk_rows`` lignes et produit les lots non vides
+
+        Une source peut donc apparaître en plusieurs lots successifs. Les
+        fichiers sont lus un par un dans ce processus, sans cache, et la
+        progression est publiée au fil des lots d'un même fichier.
+        """
+        chunk_rows = self.options.chunk_rows
+        total_files = len(excel_files) if isinstance(excel_files, list) else None
+        self.log(f"Lecture par lots de {chunk_rows} lignes", "info")
+        if self.options.workers != 1:
+            self.log("Lecture par lots : les fichiers sont lus un par un (--workers ignoré)", "warning")
+        if self.options.cache_dir:
+            self.log("Lecture par lots : le cache des sources n'est pas utilisé", "warning")
+        backend_counts = {}
+        rows_scanned = rows_kept = 0
+
+        for index, file_path in enumerate(excel_files):
+            self.check_cancelled()
+            file_path = Path(file_path)
+            if total_files is None and self.discovery.finished:
+                total_files = self.discovery.found
+                self.log(f"Trouvé {total_files} fichiers Excel", "info")
+                self.emit('status', f"🔄 Fusion de {total_files} fichiers...")
+            self.log(f"Traitement de: {file_path.name}", "info")
+
+            start = time.perf_counter()
+            rows = scanned = duplicates = 0
+            columns = set()
+            backend = '?'
+            warned_keys = False
+            try:
+                for chunk in iter_excel_chunks(file_path, add_source_column=self.options.add_source_column,
+                                               sheets=self.options.sheets, row_filter=self.row_filter,
+                                               chunk_rows=chunk_rows):
+                    self.check_cancelled()
+                    backend = chunk.attrs.get('reader_backend', backend)
+                    scanned += chunk.attrs.get('rows_scanned', len(chunk))
+                    done, total = chunk.attrs.get('rows_done'), chunk.attrs.get('rows_total')
+                    if chunk.attrs.get('new_columns'):
+                        self.log(f"{file_path.name}: colonnes renseignées seulement après la ligne "
+                                 f"{done - chunk.attrs.get('rows_scanned', len(chunk))}: "
+                                 f"{', '.join(chunk.attrs['new_columns'])}", "warning")
+                    if self.dedup is not None and not chunk.empty:
+                        missing = self.dedup.missing_keys(chunk)
+                        if missing and not warned_keys:
+                            warned_keys = True
+                            self.log(f"Colonnes clés absentes de {file_path.name}: {', '.join(missing)}", "warning")
+                        before = len(chunk)
+                        chunk = self.dedup.filter(chunk, file_path)
+                        duplicates += before - len(chunk)
+                    if total:
+                        self.log(f"{file_path.name}: {done} lignes lues sur ~{total}", "info")
+                        if total_files:
+                            self.emit('progress', progress=(index + min(done / total, 1.0)) / total_files * 100)
+                    elif done:
+                        self.log(f"{file_path.name}: {done} lignes lues", "info")
+                    if chunk.empty:
+                        continue
+                    rows += len(chunk)
+                    columns.update(chunk.columns)
+                    self.feed_rollup(chunk)
+                    yield file_path, chunk
+            except MergeCancelled:
+                raise
+            except Exception as e:
+                error = str(e) if not rows else f"{e} ({rows} lignes déjà fusionnées)"
+                if self.checkpoint is not None:
+                    self.checkpoint.record(file_path, 'error', error=error)
+                self.files_failed += 1
+                self.unreadable.append(file_path)
+                self.report.add_file(file_path, time.perf_counter() - start, error=error, status='error')
+                self.log(f"Erreur lors du traitement de {file_path.name}: {error}", "error")
+                continue
+
+            seconds = time.perf_counter() - start
+            if self.checkpoint is not None:
+                self.checkpoint.record(file_path, 'read', rows, sorted(columns))
+            if self.row_filter is not None:
+                rows_scanned += scanned
+                rows_kept += rows + duplicates
+            if not rows:
+                if duplicates:
+                    status = 'duplicate'
+                    self.log(f"Toutes les lignes de {file_path.name} sont des doublons ({duplicates})", "warning")
+                elif scanned:
+                    status = 'filtered'
+                    self.log(f"Aucune ligne retenue par le filtre dans {file_path.name} ({scanned} lues)", "info")
+                else:
+                    status = 'empty'
+                    self.log(f"Fichier vide ignoré: {file_path.name}", "warning")
+                self.report.add_file(file_path, seconds, backend=backend, rows_scanned=scanned,
+                                     duplicates=duplicates, status=status)
+                continue
+
+            self.report.add_file(file_path, seconds, rows, len(columns), backend,
+                                 rows_scanned=scanned, duplicates=duplicates)
+            backend_counts[backend] = backend_counts.get(backend, 0) + 1
+            kept = f"{rows} lignes" if scanned == rows + duplicates else f"{rows} lignes sur {scanned} lues"
+            self.log(f"✓ {file_path.name}: {kept}, {len(columns)} colonnes ({backend}, {seconds:.2f} s)", "success")
+            if duplicates:
+                self.log(f"{duplicates} doublon(s) retiré(s) de {file_path.name}", "info")
+            if total_files:
+                self.emit('progress', progress=(index + 1) / total_files * 100)
+
+        if total_files is None:
+            self.log(f"Trouvé {self.discovery.found} fichiers Excel", "info")
+        if self.row_filter is not None:
+            self.log(f"Filtre de lecture: {rows_kept} lignes retenues sur {rows_scanned} lues", "info")
+        if backend_counts:
+            summary = ', '.join(f"{name} ×{count}" for name, count in sorted(backend_counts.items()))
+            self.log(f"Lecteurs utilisés: {summary}", "info")
+
+    def save_cache(self, cache):
+        """Enregistre l'index du cache ; un échec n'interrompt pas la fusion"""
+        try:
+            cache.save()
+        except OSError as e:
+            self.log(f"Index du cache non enregistré: {e}", "warning")
+
+    def open_cache(self):
+        """Ouvre le cache des sources s'il est configuré et disponible
+
+        Avec un point de reprise et sans cache explicite, les sources lues
+        sont conservées dans le dossier du point de reprise.
+        """
+        cache_dir = self.options.cache_dir
+        if not cache_dir and self.checkpoint is not None:
+            cache_dir = self.checkpoint.sources_dir
+        if not cache_dir:
+            return None
+        try:
+            return SourceCache(cache_dir,
+                               max_bytes=self.options.cache_max_mb * 1024 * 1024,
+                               use_hash=self.options.cache_hash)
+        except (ImportError, OSError) as e:
+            self.log(f"Cache désactivé: {e}", "warning")
+            return None
+
+    def open_checkpoint(self):
+        """Ouvre le point de reprise et annonce ce qui peut être repris"""
+        if not self.options.checkpoint_dir:
+            return None
+        if self.options.chunk_rows:
+            # Les lots ne passent pas par le cache : rien ne pourrait être rechargé à la reprise
+            self.log("Point de reprise désactivé: la lecture par lots ne conserve pas les sources lues", "warning")
+            return None
+        if importlib.util.find_spec('pyarrow') is None:
+            self.log("Point de reprise désactivé: il nécessite le paquet 'pyarrow' (pip install pyarrow)", "warning")
+            return None
+        signature = {
+            'input_folder': str(Path(self.options.input_folder).resolve()),
+            'recursive': self.options.recursive,
+            'include': list(self.options.include or DEFAULT_INCLUDE),
+            'exclude': list(self.options.exclude),
+            'sheets': self.options.sheets,
+            'add_source_column': self.options.add_source_column,
+            'reader_backend': self.options.reader_backend,
+            'columns': list(self.options.columns),
+            'where': list(self.options.where),
+        }
+        try:
+            checkpoint = JobCheckpoint(self.options.checkpoint_dir, signature)
+        except OSError as e:
+            self.log(f"Point de reprise désactivé: {e}", "warning")
+            return None
+        if checkpoint.mismatch:
+            self.log("Point de reprise ignoré: il a été créé avec d'autres paramètres", "warning")
+        resumable = checkpoint.resumable()
+        if resumable:
+            self.log(f"Reprise de la fusion interrompue ({checkpoint.previous_status}): {len(resumable)} "
+                     f"fichier(s) déjà lu(s) seront rechargés depuis le point de reprise", "info")
+        return checkpoint
+
+    def close_checkpoint(self, status):
+        """Clôt le point de reprise : supprimé après un succès, conservé sinon"""
+        if self.checkpoint is None:
+            return
+        if status == 'done':
+            self.checkpoint.remove()
+            return
+        self.checkpoint.finish(status)
+        self.log(f"Point de reprise enregistré dans {self.checkpoint.directory} : "
+                 f"relancez la même fusion pour reprendre", "info")
+
+    def open_dedup(self):
+        """Prépare la suppression des doublons si elle est demandée"""
+        if not (self.options.dedup or self.options.dedup_keys):
+            return None
+        keys = list(self.options.dedup_keys or ())
+        if keys:
+            self.log(f"Suppression des doublons sur les colonnes: {', '.join(keys)}", "info")
+        else:
+            self.log("Suppression des doublons sur toutes les colonnes", "info")
+        return RowDeduplicator(key_columns=keys or None,
+                               max_memory_bytes=self.options.dedup_max_mb * 1024 * 1024,
+                               spill_dir=self.options.dedup_spill_dir)
+
+    def merge_auto(self, excel_files, output_path):
+        """Fusion dont la stratégie est choisie en cours de route
+
+        La lecture commence en mémoire pendant la recherche, en cumulant la
+        taille des fichiers trouvés. Tant que ce cumul tient en mémoire, la
+        fusion se termine en mémoire sans estimation. Sinon la recherche est
+        menée à son terme, la stratégie est choisie d'après le plan, et les
+        sources déjà lues lui sont transmises sans être relues.
+        """
+        budget = memory_budget(self.options.memory_budget_mb)
+        watch = SizeWatch(excel_files, size_limit(self.output_format, budget))
+        sources = self.iter_sources(watch)
+        read = []
+        with self.report.stage('read'):
+            for item in sources:
+                read.append(item)
+                if watch.exceeded:
+                    break
+            else:
+                # Tout est lu : la fusion en mémoire est la seule qui n'ajoute rien
+                return self.merge_in_memory(None, output_path, sources=read)
+
+        excel_files = watch.drain()
+        self.log(f"Trouvé {len(excel_files)} fichiers Excel, "
+                 f"{watch.total_bytes / 1024 / 1024:.0f} Mo : estimation de la fusion", "info")
+        strategy = self.choose_strategy(excel_files, budget)
+        sources = itertools.chain(read, sources)
+        if strategy == STREAMING:
+            return self.merge_streaming(excel_files, output_path, sources=sources)
+        if strategy == SPILL:
+            return self.merge_spilled(excel_files, output_path, sources=sources)
+        return self.merge_in_memory(excel_files, output_path, sources=sources)
+
+    def merge_in_memory(self, excel_files, output_path, sources=None):
+        """Charge toutes les sources, les concatène puis écrit le résultat
+
+        ``sources`` : couples ``(fichier, DataFrame)`` déjà lus ou en cours
+        de lecture, à la place de la lecture de ``excel_files``.
+        """
+        planner = DtypePlanner() if self.options.coerce_types else None
+        pending = self.iter_sources(excel_files) if sources is None else sources
+        sources = []
+        with self.report.stage('read'):
+            for file_path, df in pending:
+                if planner is not None:
+                    planner.observe(df, file_path.name)
+                sources.append((file_path, df))
+
+        if not sources:
+            raise self.no_sources_error()
+        # Une source lue par lots apparaît plusieurs fois
+        files_merged = len({file_path for file_path, _ in sources})
+
+        self.check_cancelled()
+
+        # Convertir chaque source une seule fois vers les types retenus
+        if planner is not None:
+            with self.report.stage('coerce'):
+                plan = planner.plan()
+                self.log_dtype_plan(plan)
+                sources = [(file_path, self.coerce(plan, file_path, df)) for file_path, df in sources]
+        all_dataframes = [df for _, df in sources]
+        del sources
+
+        # Fusionner tous les DataFrames avec gestion des colonnes
+        self.log("Fusion des données...", "info")
+
+        all_columns = union_columns(all_dataframes)
+        self.log(f"Colonnes détectées: {len(all_columns)}", "info")
+        self.log(f"Colonnes: {', '.join(all_columns[:5])}{'...' if len(all_columns) > 5 else ''}", "info")
+
+        # Aligner les colonnes et fusionner en une seule opération
+        with self.report.stage('concat'):
+            merged_df = concat_aligned(all_dataframes, all_columns)
+            del all_dataframes
+
+        # Gérer les en-têtes si nécessaire
+        if self.options.ignore_headers:
+            # Garder seulement les en-têtes du premier fichier
+            merged_df.columns = all_columns
+
+        # Sauvegarder le fichier fusionné
+        self.check_cancelled()
+        self.log("Sauvegarde du fichier fusionné...", "info")
+        with self.report.stage('write'):
+            self.write_merged(merged_df, output_path)
+
+        return len(merged_df), len(merged_df.columns), files_merged
+
+    def write_merged(self, merged_df, output_path):
+        """Écrit le DataFrame fusionné, en feuilles .xlsx parallèles si demandé"""
+        on_warning = lambda message: self.log(message, "warning")
+        extra_sheets = self.rollup_sheets(output_path)
+        if not self.xlsx_partitioned:
+            write_dataframe(merged_df, output_path, self.output_format,
+                            parquet_compression=self.options.parquet_compression,
+                            csv_chunk_rows=self.options.csv_chunk_rows,
+                            on_warning=on_warning, extra_sheets=extra_sheets)
+            return
+        options = self.options
+        try:
+            written = write_partitioned_excel(merged_df, output_path,
+                                              partition_by=options.xlsx_partition_by,
+                                              partition_rows=options.xlsx_partition_rows,
+                                              workers=options.xlsx_workers,
+                                              split_workbooks=options.xlsx_split_files,
+                                              on_warning=on_warning, extra_sheets=extra_sheets)
+        except ValueError as e:
+            raise MergeError(str(e))
+        if options.xlsx_split_files:
+            self.log(f"{len(written)} classeurs écrits: {', '.join(path.name for path in written)}", "info")
+
+    def merge_upsert(self, excel_files, output_path):
+        """Replie les sources sur les colonnes clés : une ligne par clé, le dernier fichier l'emportant"""
+        keys = list(self.options.upsert_keys)
+        try:
+            rules = parse_rules(self.options.upsert_rules)
+        except ValueError as e:
+            raise MergeError(str(e))
+        excel_files = order_files(excel_files, self.options.upsert_order)
+        table = UpsertTable(keys, rules)
+        self.log(f"Fusion par clé sur: {', '.join(keys)} (ordre: "
+                 f"{'date de modification' if self.options.upsert_order == 'mtime' else 'nom'})", "info")
+
+        state = self.open_upsert_state(keys, rules)
+        pending = excel_files
+        if state is not None:
+            pending, reason = state.load(table, excel_files)
+            if reason is not None:
+                self.log(f"Table maître reconstruite: {reason}", "info")
+            elif len(pending) < len(excel_files):
+                self.log(f"Table maître rechargée: {len(table)} lignes ; {len(pending)} nouveau(x) "
+                         f"fichier(s) à appliquer sur {len(excel_files)}", "info")
+
+        # L'état ne retient que la tête de l'ordre d'application : le premier fichier illisible et
+        # les suivants restent à appliquer, la table enregistrée est celle d'avant leur application
+        fingerprints = state.fingerprints(pending) if state is not None else []
+        recorded, frozen, failures = len(fingerprints), None, 0
+        position = {file_path: i for i, file_path in enumerate(pending)}
+        with self.report.stage('read+upsert'):
+            merged, rejected, started = set(), set(), set()
+            for file_path, df in self.iter_sources(pending):
+                if state is not None and file_path not in started:
+                    recorded = min([recorded] + [position[path] for path in self.unreadable[failures:]])
+                    failures = len(self.unreadable)
+                    if frozen is None and position[file_path] >= recorded:
+                        frozen = self.frozen_upsert_table(table, pending, recorded, started)
+                started.add(file_path)
+                try:
+                    updated, inserted = table.apply(df)
+                except KeyError as e:
+                    if file_path not in rejected:
+                        rejected.add(file_path)
+                        self.files_failed += 1
+                        self.log(f"{file_path.name} ignoré: {e.args[0]}", "warning")
+                    continue
+                merged.add(file_path)
+                self.log(f"{file_path.name}: {updated} ligne(s) mise(s) à jour, {inserted} ajoutée(s)", "info")
+
+        files_merged = len(excel_files) - len(pending) + len(merged)
+        if not len(table):
+            raise self.no_sources_error()
+        if table.keyless:
+            self.log(f"Lignes sans clé ajoutées telles quelles: {sum(len(df) for df in table.keyless)}", "warning")
+        self.log(f"Table maître: {len(table)} lignes ({table.updated} mises à jour, "
+                 f"{table.inserted} ajoutées lors de cette exécution)", "info")
+
+        self.check_cancelled()
+        merged_df = table.to_frame()
+        if self.options.coerce_types:
+            with self.report.stage('coerce'):
+                planner = DtypePlanner()
+                planner.observe(merged_df, output_path.name)
+                plan = planner.plan()
+                self.log_dtype_plan(plan)
+                merged_df = self.coerce(plan, output_path, merged_df)
+        if self.rollup is not None:
+            self.rollup.add(merged_df)
+
+        self.log("Sauvegarde du fichier fusionné...", "info")
+        with self.report.stage('write'):
+            self.write_merged(merged_df, output_path)
+
+        if state is not None:
+            recorded = min([recorded] + [position[path] for path in self.unreadable[failures:]])
+            if frozen is None:
+                frozen = self.frozen_upsert_table(table, pending, recorded, started)
+            if frozen is not False:
+                for file_path, fingerprint in zip(pending[:recorded], fingerprints):
+                    state.record(file_path, fingerprint)
+                state.save(frozen)
+                if recorded < len(pending):
+                    self.log(f"{pending[recorded].name} et les fichiers suivants ({len(pending) - recorded}) "
+                             f"restent à appliquer au prochain lancement", "warning")
+        return len(merged_df), len(merged_df.columns), files_merged
+
+    def frozen_upsert_table(self, table, pending, recorded, started):
+        """Table maître à enregistrer avec les ``recorded`` premiers fichiers, ou False
+
+        Un fichier illisible dont des lots ont déjà été appliqués laisse la
+        table dans un état intermédiaire : l'état précédent est alors conservé.
+        """
+        if recorded < len(pending) and pending[recorded] in started:
+            self.log(f"État de la table maître non mis à jour: {pending[recorded].name} "
+                     f"n'a été appliqué qu'en partie", "warning")
+            return False
+        return table.to_frame()
+
+    def open_upsert_state(self, keys, rules):
+        """État de la table maître entre deux exécutions, s'il est demandé"""
+        if not self.options.upsert_state_dir:
+            return None
+        signature = {
+            'input_folder': str(Path(self.options.input_folder).resolve()),
+            'keys': keys,
+            'rules': rules,
+            'order': self.options.upsert_order,
+            'sheets': self.options.sheets,
+            'add_source_column': self.options.add_source_column,
+            'columns': list(self.options.columns),
+            'where': list(self.options.where),
+        }
+        return UpsertState(self.options.upsert_state_dir, signature)
+
+    def log_dtype_plan(self, plan):
+        """Journalise les types retenus, les dates converties et les conflits"""
+        if plan.targets:
+            self.log(f"Types retenus: {plan.describe()}", "info")
+        for column, sources in plan.parsed_dates.items():
+            self.log(f"Dates saisies en texte converties pour la colonne '{column}' "
+                     f"({len(sources)} fichier(s))", "info")
+        for column, kinds in plan.conflicts.items():
+            self.log(f"{describe_conflict(column, kinds)} : colonne conservée sans conversion", "warning")
+
+    def coerce(self, plan, file_path, df):
+        """Convertit une source selon le plan de types"""
+        df, failed = apply_plan(df, plan)
+        if failed:
+            self.log(f"Conversion impossible dans {file_path.name} pour: {', '.join(map(str, failed))}", "warning")
+        return df
+
+    def scan(self, excel_files):
+        """Pré-analyse les en-têtes de tous les fichiers et signale les conflits"""
+        self.log("Analyse des en-têtes...", "info")
+        workers = resolve_workers(self.options.workers, len(excel_files))
+        schema_scan = scan_schema(excel_files, self.options.add_source_column, workers=workers,
+                                  sheets=self.options.sheets)
+
+        self.log(f"Colonnes détectées: {len(schema_scan.columns)}", "info")
+        self.log(f"Lignes annoncées: {schema_scan.estimated_rows}", "info")
+        for column, kinds in schema_scan.conflicts.items():
+            self.log(describe_conflict(column, kinds), "warning")
+        return schema_scan
+
+    def preview(self):
+        """Analyse le dossier d'entrée sans rien fusionner"""
+        self.report = RunReport(options=asdict(self.options))
+        excel_files = self.find_excel_files()
+        if not excel_files:
+            raise MergeError("Aucun fichier Excel trouvé dans le dossier sélectionné")
+        self.log(f"Trouvé {len(excel_files)} fichiers Excel", "info")
+        return self.scan(excel_files)
+
+    def merge_spilled(self, excel_files, output_path, sources=None):
+        """Déverse chaque source sur disque puis écrit le résultat source par source
+
+        Le plan de types est établi sur toutes les sources avant l'écriture ;
+        seules une source et l'écrivain de sortie sont en mémoire à la fois.
+        """
+        if sources is None:
+            sources = self.iter_sources(excel_files)
+        arrow_output = self.output_format in (PARQUET, FEATHER)
+        if arrow_output and not self.options.coerce_types:
+            self.log("Conversion des types activée : nécessaire pour un schéma Parquet/Feather unique", "warning")
+        planner = DtypePlanner() if self.options.coerce_types or arrow_output else None
+
+        with SpillStore(self.options.spill_dir) as store:
+            all_columns = set()
+            with self.report.stage('read+spill'):
+                for file_path, df in sources:
+                    if planner is not None:
+                        planner.observe(df, file_path.name)
+                    all_columns.update(df.columns)
+                    store.add(file_path, df)
+                    del df
+
+            if not len(store):
+                raise self.no_sources_error()
+            files_merged = store.sources
+            all_columns = sorted(all_columns)
+            self.log(f"Sources déversées: {files_merged} fichiers, {store.rows} lignes, "
+                     f"{store.bytes / 1024 / 1024:.1f} Mo dans {store.directory}", "info")
+            self.log(f"Colonnes détectées: {len(all_columns)}", "info")
+
+            plan = None
+            schema = None
+            if planner is not None:
+                plan = planner.plan()
+                self.log_dtype_plan(plan)
+                if arrow_output:
+                    if plan.conflicts:
+                        self.log(f"Colonnes écrites en texte pour un schéma {self.output_format} unique: "
+                                 f"{', '.join(map(str, plan.conflicts))}", "warning")
+                    plan = complete_plan(plan, all_columns)
+                    schema = arrow_schema(plan, all_columns)
+
+            self.log("Sauvegarde du fichier fusionné...", "info")
+            with self.report.stage('write'), open_stream_writer(
+                    output_path, all_columns, self.output_format,
+                    on_warning=lambda message: self.log(message, "warning"),
+                    schema=schema, parquet_compression=self.options.parquet_compression) as writer:
+                for file_path, df in store:
+                    self.check_cancelled()
+                    # Réindexer d'abord pour que les colonnes absentes prennent aussi le type cible
+                    df = df.reindex(columns=all_columns)
+                    if plan is not None:
+                        df = self.coerce(plan, file_path, df)
+                    writer.append(df)
+                    del df
+                for name, summary in self.rollup_sheets(output_path):
+                    writer.add_sheet(name, summary)
+                rows = writer.rows
+
+        return rows, len(all_columns), files_merged
+
+    def merge_streaming(self, excel_files, output_path, sources=None):
+        """Écrit chaque source dès sa lecture, sans construire le DataFrame fusionné"""
+        if sources is None:
+            sources = self.iter_sources(excel_files)
+        with self.report.stage('scan'):
+            schema_scan = self.scan(excel_files)
+        all_columns = schema_scan.columns
+        if self.row_filter is not None:
+            all_columns = [column for column in all_columns if self.row_filter.keeps(column)]
+        plan = plan_from_hints(schema_scan.dtype_hints) if self.options.coerce_types else None
+
+        known_columns = set(all_columns)
+        merged = set()
+        with self.report.stage('read+write'), open_stream_writer(output_path, all_columns, self.output_format,
+                                on_warning=lambda message: self.log(message, "warning")) as writer:
+            for file_path, df in sources:
+                extra = [col for col in df.columns if col not in known_columns]
+                if extra and file_path not in merged:
+                    self.log(f"Colonnes absentes de l'en-tête ignorées dans {file_path.name}: {', '.join(extra)}", "warning")
+
+                if plan is not None:
+                    df = self.coerce(plan, file_path, df)
+                writer.append(df.reindex(columns=all_columns))
+                merged.add(file_path)
+                # Libérer la source avant de lire la suivante
+                del df
+
+            if not merged:
+                raise self.no_sources_error()
+
+            for name, summary in self.rollup_sheets(output_path):
+                writer.add_sheet(name, summary)
+            rows = writer.rows
+
+        return rows, len(all_columns), len(merged)
+
+
+def rollup_file_path(options, output_path, output_format):
+    """Fichier de la synthèse, ou None si elle est une feuille du classeur de sortie"""
+    if options.rollup_file:
+        return Path(options.rollup_file)
+    if output_format == XLSX:
+        return None
+    return output_path.with_name(f"{output_path.stem}_synthese{output_path.suffix}")
+
+
+def written_files(options):
+    """Fichiers écrits par la fusion (sortie, synthèse), sous forme ``path_key``
+
+    Ils ne sont jamais relus comme sources, même quand la sortie se trouve
+    dans le dossier d'entrée.
+    """
+    output_path = Path(options.output_file)
+    paths = [output_path]
+    if options.rollup_by or options.rollup_values:
+        try:
+            output_format = detect_format(output_path, options.output_format)
+        except ValueError:
+            output_format = None
+        rollup_path = rollup_file_path(options, output_path, output_format)
+        if rollup_path is not None:
+            paths.append(rollup_path)
+    return {path_key(path) for path in paths}
+
+
+def union_columns(dataframes):
+    """Union triée des colonnes de plusieurs DataFrames"""
+    all_columns = set()
+    for df in dataframes:
+        all_columns.update(df.columns)
+    return sorted(all_columns)
+
+
+def concat_aligned(dataframes, columns=None):
+    """Aligne et concatène des DataFrames aux colonnes différentes en une passe
+
+    ``pd.concat`` réalise lui-même l'union des colonnes : les colonnes
+    absentes d'une source sont remplies de valeurs manquantes sans créer de
+    copie intermédiaire, et les colonnes présentes gardent leur type.
+    """
+    merged = pd.concat(dataframes, ignore_index=True, sort=True)
+    if columns is not None and list(merged.columns) != list(columns):
+        merged = merged.reindex(columns=columns)
+    return merged
+
+
+def merge_folder(input_folder, output_file, on_event=None, **options):
+    """Raccourci : fusionne un dossier sans passer par ``MergeEngine``"""
+    engine = MergeEngine(MergeOptions(input_folder, output_file, **options), on_event)
+    return engine.run()
@@ -0,0 +1,337 @@
+"""Écriture .xlsx parallèle : une feuille (ou un classeur) par partition.
+
+Avec ``DataFrame.to_excel``, openpyxl crée un objet par cellule puis
+sérialise tout le classeur dans un seul thread : pour un gros fichier
+fusionné, c'est l'étape la plus longue. Ici, les données sont découpées en
+partitions (blocs de lignes, ou une partition par valeur d'une colonne
+comme ``Fichier_Source``) et le XML de chaque feuille est produit par un
+processus de travail, en flux et par blocs de lignes, sans objet cellule.
+
+Les chaînes sont écrites en ligne (``inlineStr``) : chaque feuille est
+autonome et aucune table de chaînes partagées n'est à fusionner. Le
+processus principal assemble ensuite les feuilles dans un seul paquet .xlsx
+(classeur, styles, types de contenu), ou chaque processus écrit un classeur
+complet par partition.
+"""
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+
+from writers import EXCEL_MAX_DATA_ROWS, sheet_name
+
+# Lignes sérialisées à la fois par un processus
+XML_CHUNK_ROWS = 20_000
+# Compression du paquet : niveau rapide, le XML se compresse très bien
+ZIP_COMPRESS_LEVEL = 1
+SHEET_NAME_MAX = 31
+INVALID_SHEET_CHARS = re.compile(r'[\[\]:*?/\\]')
+# Caractères interdits dans un nom de fichier (Windows) et caractères de contrôle
+INVALID_FILE_CHARS = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
+# Caractères interdits en XML 1.0
+ILLEGAL_XML_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+EXCEL_EPOCH = pd.Timestamp('1899-12-30')
+
+# Styles : 0 = standard, 1 = date et heure, 2 = date
+STYLE_DATETIME = 1
+STYLE_DATE = 2
+
+MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PKG_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+SHEET_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml'
+
+STYLES_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    f'<styleSheet xmlns="{MAIN_NS}">'
+    '<numFmts count="2"><numFmt numFmtId="164" formatCode="yyyy-mm-dd hh:mm:ss"/>'
+    '<numFmt numFmtId="165" formatCode="yyyy-mm-dd"/></numFmts>'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/><family val="2"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="3"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="165" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+
+def column_letter(index):
+    """Lettre de colonne Excel (0 → A, 26 → AA)"""
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def _text(value):
+    text = ILLEGAL_XML_CHARS.sub('', str(value))
+    space = ' xml:space="preserve"' if text[:1].isspace() or text[-1:].isspace() else ''
+    return f'<is><t{space}>{escape(text)}</t></is>'
+
+
+def _serial(value):
+    """Numéro de série Excel d'une date"""
+    if isinstance(value, datetime):
+        value = pd.Timestamp(value).tz_localize(None) if value.tzinfo else pd.Timestamp(value)
+    else:
+        value = pd.Timestamp(value)
+    return repr((value - EXCEL_EPOCH) / pd.Timedelta(days=1))
+
+
+def _object_cell(ref, value):
+    """Cellule d'une colonne de type quelconque (type décidé valeur par valeur)"""
+    if value is None or value is pd.NA or value is pd.NaT:
+        return ''
+    if isinstance(value, (bool, np.bool_)):
+        return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        if not np.isfinite(value):
+            return ''
+        return f'<c r="{ref}"><v>{value!r}</v></c>' if isinstance(value, float) else f'<c r="{ref}"><v>{value}</v></c>'
+    if isinstance(value, datetime):
+        return f'<c r="{ref}" s="{STYLE_DATETIME}"><v>{_serial(value)}</v></c>'
+    if isinstance(value, date):
+        return f'<c r="{ref}" s="{STYLE_DATE}"><v>{_serial(value)}</v></c>'
+    return f'<c r="{ref}" t="inlineStr">{_text(value)}</c>'
+
+
+def column_cells(series, letter, rows):
+    """XML des cellules d'une colonne (chaîne vide pour une valeur manquante)"""
+    refs = [f"{letter}{row}" for row in rows]
+    dtype = series.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        present = series.notna().to_numpy()
+        values = series.to_numpy(dtype=object)
+        return [f'<c r="{ref}" t="b"><v>{int(value)}</v></c>' if ok else ''
+                for ref, value, ok in zip(refs, values, present)]
+    if pd.api.types.is_numeric_dtype(dtype):
+        numbers = series.to_numpy(dtype='float64', na_value=np.nan)
+        present = np.isfinite(numbers)
+        if pd.api.types.is_integer_dtype(dtype):
+            texts = series.astype(str).to_numpy()
+        else:
+            texts = [repr(number) for number in numbers.tolist()]
+        return [f'<c r="{ref}"><v>{text}</v></c>' if ok else ''
+                for ref, text, ok in zip(refs, texts, present)]
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        if getattr(dtype, 'tz', None) is not None:
+            series = series.dt.tz_localize(None)
+        serials = ((series - EXCEL_EPOCH) / pd.Timedelta(days=1)).to_numpy(dtype='float64', na_value=np.nan)
+        return [f'<c r="{ref}" s="{STYLE_DATETIME}"><v>{serial!r}</v></c>' if serial == serial else ''
+                for ref, serial in zip(refs, serials.tolist())]
+    return [_object_cell(ref, value) for ref, value in zip(refs, series.to_numpy(dtype=object))]
+
+
+def write_sheet_xml(df, path, chunk_rows=XML_CHUNK_ROWS):
+    """Écrit le XML d'une feuille (en-tête + lignes de ``df``) ; renvoie le nombre de lignes
+
+    Fonction de module pour pouvoir s'exécuter dans un processus de travail.
+    """
+    letters = [column_letter(i) for i in range(len(df.columns))]
+    last = f"{letters[-1]}{len(df) + 1}" if letters else 'A1'
+    with open(path, 'w', encoding='utf-8') as handle:
+        handle.write('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                     f'<worksheet xmlns="{MAIN_NS}" xmlns:r="{REL_NS}">'
+                     f'<dimension ref="A1:{last}"/><sheetData>')
+        header = ''.join(f'<c r="{letter}1" t="inlineStr">{_text(name)}</c>'
+                         for letter, name in zip(letters, df.columns))
+        handle.write(f'<row r="1">{header}</row>')
+        for start in range(0, len(df), chunk_rows):
+            chunk = df.iloc[start:start + chunk_rows]
+            rows = range(start + 2, start + 2 + len(chunk))
+            columns = [column_cells(chunk.iloc[:, i], letter, rows) for i, letter in enumerate(letters)]
+            handle.write(''.join(f'<row r="{row}">{"".join(cells)}</row>'
+                                 for row, cells in zip(rows, zip(*columns))))
+        handle.write('</sheetData></worksheet>')
+    return len(df)
+
+
+def write_package(path, sheet_files, sheet_names):
+    """Assemble des feuilles déjà sérialisées en un paquet .xlsx
+
+    ``sheet_files`` peut être un itérateur : chaque feuille est ajoutée au
+    paquet dès qu'elle est prête, puis son fichier temporaire supprimé.
+    """
+    count = len(sheet_names)
+    overrides = ''.join(f'<Override PartName="/xl/worksheets/sheet{i + 1}.xml" ContentType="{SHEET_TYPE}"/>'
+                        for i in range(count))
+    content_types = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        f'{overrides}</Types>')
+    root_rels = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<Relationships xmlns="{PKG_REL_NS}">'
+        f'<Relationship Id="rId1" Type="{REL_NS}/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>')
+    sheets = ''.join(f'<sheet name="{escape(name, {chr(34): "&quot;"})}" sheetId="{i + 1}" r:id="rId{i + 1}"/>'
+                     for i, name in enumerate(sheet_names))
+    workbook = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<workbook xmlns="{MAIN_NS}" xmlns:r="{REL_NS}"><sheets>{sheets}</sheets></workbook>')
+    sheet_rels = ''.join(f'<Relationship Id="rId{i + 1}" Type="{REL_NS}/worksheet" '
+                         f'Target="worksheets/sheet{i + 1}.xml"/>' for i in range(count))
+    workbook_rels = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<Relationships xmlns="{PKG_REL_NS}">{sheet_rels}'
+        f'<Relationship Id="rId{count + 1}" Type="{REL_NS}/styles" Target="styles.xml"/>'
+        '</Relationships>')
+
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED, compresslevel=ZIP_COMPRESS_LEVEL) as package:
+        package.writestr('[Content_Types].xml', content_types)
+        package.writestr('_rels/.rels', root_rels)
+        package.writestr('xl/workbook.xml', workbook)
+        package.writestr('xl/_rels/workbook.xml.rels', workbook_rels)
+        package.writestr('xl/styles.xml', STYLES_XML)
+        for i, sheet_file in enumerate(sheet_files):
+            package.write(sheet_file, f'xl/worksheets/sheet{i + 1}.xml')
+            os.unlink(sheet_file)
+
+
+def write_workbook(df, path, name):
+    """Écrit un classeur complet d'une seule feuille (exécuté dans un processus de travail)"""
+    sheet_file = f"{path}.sheet.tmp"
+    rows = write_sheet_xml(df, sheet_file)
+    write_package(path, [sheet_file], [name])
+    return rows
+
+
+def safe_sheet_name(value, used):
+    """Nom de feuille valide et unique à partir d'une valeur quelconque"""
+    name = '(vide)' if value is None or (not isinstance(value, str) and pd.isna(value)) else str(value)
+    name = INVALID_SHEET_CHARS.sub('_', name).strip("'") or '_'
+    name = name[:SHEET_NAME_MAX]
+    candidate, suffix = name, 2
+    while candidate.lower() in used:
+        tail = f" ({suffix})"
+        candidate = name[:SHEET_NAME_MAX - len(tail)] + tail
+        suffix += 1
+    used.add(candidate.lower())
+    return candidate
+
+
+def safe_file_part(name, suffix, used):
+    """Partie de nom de fichier valide et unique à partir d'un nom de feuille
+
+    Les caractères interdits par Windows sont remplacés, l'extension
+    ``suffix`` déjà présente est retirée (« fichier.xlsx » comme valeur de
+    partition), ainsi que les points et espaces finaux.
+    """
+    name = INVALID_FILE_CHARS.sub('_', name)
+    name = name.removesuffix(suffix).rstrip('. ') or '_'
+    candidate, index = name, 2
+    while candidate.lower() in used:
+        candidate = f"{name} ({index})"
+        index += 1
+    used.add(candidate.lower())
+    return candidate
+
+
+def partition(df, partition_by=None, partition_rows=None):
+    """Découpe ``df`` en partitions ``(nom, DataFrame)``
+
+    Par valeur de la colonne ``partition_by`` (dans l'ordre d'apparition),
+    sinon par blocs de ``partition_rows`` lignes. Aucune partition ne
+    dépasse la limite de lignes d'une feuille Excel.
+    """
+    max_rows = min(partition_rows or EXCEL_MAX_DATA_ROWS, EXCEL_MAX_DATA_ROWS)
+    if partition_by is None:
+        return [(sheet_name(i), df.iloc[start:start + max_rows])
+                for i, start in enumerate(range(0, max(len(df), 1), max_rows))]
+
+    if partition_by not in df.columns:
+        raise ValueError(f"Colonne de partition absente: {partition_by}")
+    parts = []
+    used = set()
+    for value, group in df.groupby(partition_by, sort=False, dropna=False, observed=True):
+        for start in range(0, len(group), max_rows):
+            parts.append((safe_sheet_name(value, used), group.iloc[start:start + max_rows]))
+    return parts
+
+
+def _map_ordered(function, tasks, workers, max_in_flight=None):
+    """Applique ``function`` aux tâches sur un pool de processus ; résultats dans l'ordre
+
+    Au plus ``max_in_flight`` tâches (par défaut deux par processus) sont
+    soumises sans avoir été consommées, ce qui borne la mémoire occupée par
+    les partitions en attente.
+    """
+    if workers <= 1:
+        for task in tasks:
+            yield function(*task)
+        return
+    max_in_flight = max(max_in_flight or workers * 2, 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        try:
+            for task in tasks:
+                pending.append(pool.submit(function, *task))
+                if len(pending) >= max_in_flight:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def write_partitioned_excel(df, path, partition_by=None, partition_rows=None, workers=0,
+                            split_workbooks=False, on_warning=None, extra_sheets=()):
+    """Écrit ``df`` en .xlsx, une feuille par partition, sérialisées en parallèle
+
+    Avec ``split_workbooks``, chaque partition devient un classeur
+    ``<nom>_<partition>.xlsx`` à côté de ``path``. Les feuilles
+    ``extra_sheets`` (``(nom, DataFrame)``) sont ajoutées après les
+    partitions. Renvoie la liste des fichiers écrits.
+    """
+    path = Path(path)
+    parts = partition(df, partition_by, partition_rows)
+    data_parts = len(parts)
+    used = {name.lower() for name, _ in parts}
+    parts += [(safe_sheet_name(name, used), extra) for name, extra in extra_sheets]
+    workers = workers if workers and workers > 0 else min(os.cpu_count() or 1, len(parts))
+    workers = min(workers, len(parts))
+
+    if split_workbooks:
+        suffix = path.suffix or '.xlsx'
+        used_files = set()
+        targets = [path.with_name(f"{path.stem}_{safe_file_part(name, suffix, used_files)}{suffix}")
+                   for name, _ in parts]
+        tasks = ((part, target, name) for (name, part), target in zip(parts, targets))
+        for _ in _map_ordered(write_workbook, tasks, workers):
+            pass
+        return targets
+
+    if data_parts > 1 and partition_by is None and partition_rows is None and on_warning is not None:
+        on_warning(f"{len(df)} lignes dépassent la limite d'une feuille Excel "
+                   f"({EXCEL_MAX_DATA_ROWS}) : répartition sur {data_parts} feuilles")
+    work_dir = tempfile.mkdtemp(prefix='xlsx-', dir=path.parent)
+    try:
+        sheet_files = [os.path.join(work_dir, f"sheet{i + 1}.xml") for i in range(len(parts))]
+        tasks = ((part, sheet_file) for (_, part), sheet_file in zip(parts, sheet_files))
+        done = (sheet_file for _, sheet_file in zip(_map_ordered(write_sheet_xml, tasks, workers), sheet_files))
+        write_package(path, done, [name for name, _ in parts])
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return [path]
@@ -0,0 +1,629 @@
+"""Plan d'exécution estimé avant la fusion (« dry-run »), sans lire les données.
+
+Pour chaque classeur, seules les parties utiles du paquet .xlsx sont
+consultées : la taille du XML de chaque feuille et la référence
+``<dimension>`` qu'il déclare. Puis une copie tronquée du classeur (les
+premières centaines de Ko du XML de chaque feuille, coupées à une fin de
+ligne) est analysée par le lecteur habituel. Cette analyse échantillonnée
+donne les colonnes réelles, la mémoire d'une ligne une fois chargée, la
+part des lignes retenues par les filtres et le coût d'analyse par octet de
+XML. Les fichiers .xls sont estimés à partir de leur en-tête et d'un
+échantillon (``schema.scan_file``).
+
+Le plan extrapole le nombre total de lignes, le schéma fusionné, le pic de
+mémoire de chaque stratégie (en mémoire, streaming, déversement sur disque)
+et la durée attendue selon le nombre de processus de lecture. Le moteur
+s'en sert pour choisir la stratégie quand aucune n'est imposée.
+
+Les coefficients ci-dessous ont été mesurés sur des classeurs synthétiques
+(20 000 lignes × 28 colonnes par fichier) : ce sont des ordres de grandeur.
+"""
+import importlib.util
+import os
+import re
+import shutil
+import tempfile
+import time
+import zipfile
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
+
+import pandas as pd
+
+from readers import SOURCE_COLUMN, XLSX, iter_read, read_excel_file, select_sheets, sniff_format
+from schema import BOOL, DATETIME, EMPTY, NUMERIC, TEXT, scan_file
+from writers import CSV, FEATHER, PARQUET, STREAMING_FORMATS
+
+MEMORY = 'memory'
+STREAMING = 'streaming'
+SPILL = 'spill'
+STRATEGIES = (MEMORY, STREAMING, SPILL)
+STRATEGY_LABELS = {
+    MEMORY: 'en mémoire',
+    STREAMING: 'streaming',
+    SPILL: 'déversement sur disque',
+}
+
+# XML lu par feuille pour l'analyse échantillonnée
+SAMPLE_XML_BYTES = 256 * 1024
+# Part de la mémoire disponible que la fusion peut occuper
+MEMORY_BUDGET_FRACTION = 0.7
+# Mémoire occupée pendant l'analyse d'un fichier (objets Python de chaque
+# cellule), en multiple de son DataFrame
+READ_OVERHEAD = 10.0
+# Fusion en mémoire : sources, copies converties et DataFrame concaténé
+IN_MEMORY_FACTOR = 4.0
+# Écriture .xlsx par ``to_excel`` : un objet openpyxl par cellule
+XLSX_CELL_BYTES = 500
+# Coût d'écriture d'une cellule relatif à son coût d'analyse
+WRITE_COST = {XLSX: 1.0, CSV: 0.03, PARQUET: 0.02, FEATHER: 0.01}
+XLSX_TO_EXCEL_COST = 1.9
+# Surcoût du déversement (Arrow IPC) relatif à l'analyse
+SPILL_COST = 0.1
+# Feuille sans dimension déclarée : la pré-analyse du mode streaming compte
+# ses lignes, presque au prix d'une lecture
+NO_DIMENSION_SCAN_COST = 0.8
+# La fusion en mémoire reste retenue si elle n'est pas plus lente que de
+# 25 % (et d'au moins 10 s) que la stratégie la plus rapide
+SWITCH_RATIO = 1.25
+SWITCH_SECONDS = 10.0
+# Estimation grossière sans analyse : pic mémoire par octet de fichier
+SIZE_MEMORY_RATIO = {XLSX: 100, None: 12}
+
+SHEET_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+DIMENSION = re.compile(rb'<(?:\w+:)?dimension\s+ref="(?:[A-Z]+\d+:)?[A-Z]+(\d+)"')
+ROW_END = re.compile(rb'</(\w+:)?row>')
+ROW_START = re.compile(rb'<(?:\w+:)?row[\s>]')
+SHEET_ENTRY = re.compile(rb'<(?:\w+:)?sheet\s[^>]*?name="([^"]*)"[^>]*?(?:r:)?id="([^"]*)"')
+RELATIONSHIP = re.compile(rb'<Relationship\s[^>]*?Id="([^"]*)"[^>]*?Target="([^"]*)"')
+RELATIONSHIP_REVERSED = re.compile(rb'<Relationship\s[^>]*?Target="([^"]*)"[^>]*?Id="([^"]*)"')
+# Cellule texte partagé (indice dans la table des chaînes) et élément de cette table
+SHARED_CELL = re.compile(rb'(<(?:\w+:)?c\b[^>]*?\bt="s"[^>]*>\s*<(?:\w+:)?v>)(\d+)(<)')
+SHARED_ITEM = re.compile(rb'<(?:\w+:)?si\b(?:\s*/>|.*?</(?:\w+:)?si>)', re.S)
+SHARED_ROOT = re.compile(rb'<((?:\w+:)?sst)\b[^>]*>')
+SHARED_READ_BYTES = 1024 * 1024
+
+
+def available_memory():
+    """Mémoire disponible en octets, ou None si elle est inconnue"""
+    if importlib.util.find_spec('psutil') is not None:
+        import psutil
+        return psutil.virtual_memory().available
+    try:
+        with open('/proc/meminfo') as handle:
+            for line in handle:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def memory_budget(budget_mb=None):
+    """Mémoire que la fusion peut occuper : imposée, ou part de la mémoire disponible"""
+    if budget_mb:
+        return budget_mb * 1024 * 1024
+    available = available_memory()
+    return None if available is None else int(available * MEMORY_BUDGET_FRACTION)
+
+
+def size_limit(output_format, budget):
+    """Taille cumulée des fichiers au-delà de laquelle la fusion en mémoire doit être estimée"""
+    if budget is None:
+        return None
+    return budget / 2 / SIZE_MEMORY_RATIO.get(output_format, SIZE_MEMORY_RATIO[None])
+
+
+def fits_by_size(paths, output_format, budget):
+    """Estimation grossière sur la seule taille des fichiers : la fusion en mémoire tient-elle ?
+
+    Permet de ne pas analyser d'échantillon pour les petites fusions.
+    """
+    limit = size_limit(output_format, budget)
+    return limit is None or sum(os.stat(path).st_size for path in paths) < limit
+
+
+class SizeWatch:
+    """Transmet les chemins trouvés au fil de la recherche en cumulant leur taille
+
+    ``exceeded`` passe à vrai dès que le cumul atteint ``limit`` : la
+    fusion en mémoire, commencée sans attendre la fin de la recherche, doit
+    alors être estimée. ``drain()`` termine la recherche et renvoie la liste
+    complète ; l'itération se poursuit ensuite sur les chemins restants.
+    """
+
+    def __init__(self, paths, limit):
+        self._paths = iter(paths)
+        self.limit = limit
+        self.listed = []
+        self.total_bytes = 0
+        self.exceeded = False
+        self._position = 0
+
+    def _pull(self):
+        path = next(self._paths)
+        self.listed.append(path)
+        try:
+            self.total_bytes += os.stat(path).st_size
+        except OSError:
+            pass
+        if self.limit is not None and self.total_bytes >= self.limit:
+            self.exceeded = True
+        return path
+
+    def __iter__(self):
+        while True:
+            if self._position < len(self.listed):
+                path = self.listed[self._position]
+            else:
+                try:
+                    path = self._pull()
+                except StopIteration:
+                    return
+            self._position += 1
+            yield path
+
+    def drain(self):
+        while True:
+            try:
+                self._pull()
+            except StopIteration:
+                return list(self.listed)
+
+
+def dtype_kind(series):
+    """Indication de type (comme ``schema``) d'une colonne de l'échantillon"""
+    if not series.notna().any():
+        return EMPTY
+    if pd.api.types.is_bool_dtype(series.dtype):
+        return BOOL
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        return NUMERIC
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return DATETIME
+    return TEXT
+
+
+def _sheet_members(archive):
+    """Feuilles d'un paquet .xlsx : ``[(nom, membre du zip)]`` dans l'ordre du classeur"""
+    from xml.sax.saxutils import unescape
+
+    workbook = archive.read('xl/workbook.xml')
+    rels = archive.read('xl/_rels/workbook.xml.rels')
+    targets = {rel_id: target for rel_id, target in RELATIONSHIP.findall(rels)}
+    targets.update({rel_id: target for target, rel_id in RELATIONSHIP_REVERSED.findall(rels)})
+    sheets = []
+    for name, rel_id in SHEET_ENTRY.findall(workbook):
+        target = targets.get(rel_id, b'').decode('utf-8')
+        member = target.lstrip('/') if target.startswith('/') else f"xl/{target}"
+        sheets.append((unescape(name.decode('utf-8'), {'&quot;': '"', '&apos;': "'"}), member))
+    return sheets
+
+
+def _truncate_sheet(archive, member, limit):
+    """Début du XML d'une feuille, coupé après une ligne complète et refermé
+
+    Renvoie ``(xml, octets lus, lignes lues, lignes déclarées ou None)``.
+    """
+    with archive.open(member) as handle:
+        data = handle.read(limit)
+        # Au moins l'en-tête et une ligne de données
+        while len(ROW_END.findall(data)) < 2:
+            chunk = handle.read(limit)
+            if not chunk:
+                break
+            data += chunk
+    size = archive.getinfo(member).file_size
+    dimension = DIMENSION.search(data[:4096])
+    declared = int(dimension.group(1)) if dimension else None
+    if len(data) >= size:
+        return data, size, len(ROW_START.findall(data)), declared
+    ends = list(ROW_END.finditer(data))
+    if not ends:
+        return data, len(data), 0, declared
+    last = ends[-1]
+    prefix = last.group(1).decode('ascii') if last.group(1) else ''
+    xml = data[:last.end()] + f"</{prefix}sheetData></{prefix}worksheet>".encode('ascii')
+    return xml, last.end(), len(ROW_START.findall(data[:last.end()])), declared
+
+
+def _shared_strings_member(archive):
+    for name in archive.namelist():
+        if name.lower().endswith('sharedstrings.xml'):
+            return name
+    return None
+
+
+def _shared_strings(archive, member, wanted):
+    """Élément de tête de la table des chaînes et ``{indice: élément <si>}`` des indices voulus
+
+    La table n'est lue que jusqu'au plus grand indice voulu.
+    """
+    items = {}
+    last = max(wanted, default=-1)
+    index = 0
+    root = None
+    buffer = b''
+    with archive.open(member) as handle:
+        while index <= last:
+            chunk = handle.read(SHARED_READ_BYTES)
+            buffer += chunk
+            if root is None:
+                root = SHARED_ROOT.search(buffer)
+                if root is None:
+                    if not chunk:
+                        break
+                    continue
+                buffer = buffer[root.end():]
+            position = 0
+            for match in SHARED_ITEM.finditer(buffer):
+                if index in wanted:
+                    items[index] = match.group(0)
+                index += 1
+                position = match.end()
+                if index > last:
+                    break
+            buffer = buffer[position:]
+            if not chunk:
+                break
+    return root, items
+
+
+def _write_shared_strings(archive, member, replaced, sheets):
+    """Table des chaînes réduite à celles des lignes gardées, indices des feuilles renumérotés
+
+    Sur les classeurs à très grande table, l'échantillon ne relit ainsi que
+    le début de la table. Renvoie la taille de la table réduite.
+    """
+    wanted = set()
+    for sheet in sheets:
+        wanted.update(int(match.group(2)) for match in SHARED_CELL.finditer(replaced[sheet]))
+    root, items = _shared_strings(archive, member, wanted)
+    if root is None:
+        replaced[member] = archive.read(member)
+        return len(replaced[member])
+    numbers = {old: new for new, old in enumerate(sorted(items))}
+
+    def renumber(match):
+        new = numbers.get(int(match.group(2)))
+        # Indice absent de la table : cellule vidée, comme à la lecture
+        value = b'' if new is None else str(new).encode('ascii')
+        return match.group(1) + value + match.group(3)
+
+    for sheet in sheets:
+        replaced[sheet] = SHARED_CELL.sub(renumber, replaced[sheet])
+    tag = root.group(1)
+    replaced[member] = (b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n' + root.group(0)
+                        + b''.join(items[old] for old in sorted(items)) + b'</' + tag + b'>')
+    return len(replaced[member])
+
+
+def _write_sample(archive, path, members, chosen, limit):
+    """Copie du classeur dont les feuilles choisies sont tronquées, les autres vidées
+
+    La table des chaînes partagées est réduite aux chaînes des lignes
+    gardées. Renvoie, pour chaque feuille choisie, ``(nom, taille du XML,
+    octets gardés, lignes gardées, lignes déclarées ou None)``, puis
+    ``(taille de la table des chaînes, octets gardés)``.
+    """
+    replaced = {}
+    sampled = []
+    for name, member in members:
+        if name not in chosen:
+            replaced[member] = f'<worksheet xmlns="{SHEET_NS}"><sheetData/></worksheet>'.encode('ascii')
+            continue
+        xml, read_bytes, read_rows, declared = _truncate_sheet(archive, member, limit)
+        replaced[member] = xml
+        sampled.append((name, archive.getinfo(member).file_size, read_bytes, read_rows, declared))
+    shared = (0, 0)
+    shared_member = _shared_strings_member(archive)
+    if shared_member is not None:
+        sheets = [member for name, member in members if name in chosen]
+        kept = _write_shared_strings(archive, shared_member, replaced, sheets)
+        shared = (archive.getinfo(shared_member).file_size, kept)
+    with zipfile.ZipFile(path, 'w') as sample:
+        for name in archive.namelist():
+            sample.writestr(name, replaced[name] if name in replaced else archive.read(name))
+    return sampled, shared
+
+
+@dataclass
+class SheetProbe:
+    """Taille et lignes d'une feuille d'après son XML"""
+    name: str
+    xml_bytes: int
+    rows: int
+    declared: bool
+
+
+@dataclass
+class FileProbe:
+    """Estimation d'un fichier d'après un échantillon"""
+    path: Path
+    size: int = 0
+    xml_bytes: int = 0
+    rows: int = 0
+    columns: list = field(default_factory=list)
+    dtypes: dict = field(default_factory=dict)
+    row_bytes: float = 0.0
+    # Part des lignes conservées par les filtres de lecture
+    kept_ratio: float = 1.0
+    read_seconds: float = 0.0
+    sheets: list = field(default_factory=list)
+    error: str = None
+
+    @property
+    def kept_rows(self):
+        return int(self.rows * self.kept_ratio)
+
+    @property
+    def undeclared_xml_bytes(self):
+        return sum(sheet.xml_bytes for sheet in self.sheets if not sheet.declared)
+
+
+def probe_file(file_path, add_source_column=True, backend='auto', sheets=None, row_filter=None,
+               sample_bytes=SAMPLE_XML_BYTES):
+    """Estime un fichier sans le lire en entier (exécuté dans un processus de lecture)"""
+    file_path = Path(file_path)
+    probe = FileProbe(file_path, size=os.stat(file_path).st_size)
+    if sniff_format(file_path) != XLSX:
+        start = time.perf_counter()
+        file_schema = scan_file(file_path, sheets=sheets)
+        probe.read_seconds = time.perf_counter() - start
+        probe.rows = file_schema.data_rows
+        probe.columns = list(file_schema.columns)
+        probe.dtypes = dict(file_schema.dtype_hints)
+        probe.row_bytes = file_schema.row_bytes
+        return probe
+
+    work_dir = tempfile.mkdtemp(prefix='plan-')
+    try:
+        sample_path = Path(work_dir) / file_path.name
+        head_path = Path(work_dir) / f"head-{file_path.name}"
+        with zipfile.ZipFile(file_path) as archive:
+            members = _sheet_members(archive)
+            chosen = set(select_sheets([name for name, _ in members], sheets))
+            sampled, (shared_bytes, sampled_shared) = _write_sample(archive, sample_path, members, chosen,
+                                                                    sample_bytes)
+            # En-tête et première ligne seulement : coût fixe d'ouverture du classeur
+            _write_sample(archive, head_path, members, chosen, 1)
+
+        read = partial(read_excel_file, add_source_column=add_source_column, backend=backend,
+                       sheets=sheets, row_filter=row_filter)
+        start = time.perf_counter()
+        read(head_path)
+        fixed = time.perf_counter() - start
+        start = time.perf_counter()
+        df = read(sample_path)
+        elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    sampled_xml = 0
+    sampled_rows = 0
+    for name, size, read_bytes, read_rows, declared in sampled:
+        if declared is not None:
+            rows = max(declared - 1, 0)
+        elif read_bytes >= size:
+            rows = max(read_rows - 1, 0)
+        else:
+            rows = int(max(read_rows - 1, 0) * size / max(read_bytes, 1))
+        probe.sheets.append(SheetProbe(name, size, rows, declared is not None))
+        probe.xml_bytes += size
+        probe.rows += rows
+        sampled_xml += read_bytes
+        sampled_rows += max(read_rows - 1, 0)
+
+    probe.columns = list(df.columns)
+    probe.dtypes = {column: dtype_kind(df[column]) for column in df.columns}
+    if sampled_rows:
+        probe.kept_ratio = min(len(df) / sampled_rows, 1.0)
+    if len(df):
+        probe.row_bytes = df.memory_usage(deep=True, index=False).sum() / len(df)
+    # Coût fixe, puis analyse proportionnelle au XML des feuilles et de la table des
+    # chaînes (l'échantillon d'une feuille sans dimension est lui aussi parcouru à
+    # l'ouverture : ce surcoût est déjà mesuré)
+    probe.read_seconds = fixed + (max(elapsed - fixed, 0.0) * (probe.xml_bytes + shared_bytes)
+                                  / max(sampled_xml + sampled_shared, 1))
+    return probe
+
+
+@dataclass
+class StrategyEstimate:
+    """Coût estimé d'une stratégie de fusion"""
+    name: str
+    peak_bytes: int
+    seconds: float
+    available: bool = True
+    reason: str = None
+    disk_bytes: int = 0
+
+
+@dataclass
+class MergePlan:
+    """Estimation d'une fusion : volumes, schéma et coût de chaque stratégie"""
+    files: list
+    output_format: str
+    workers: int
+    budget_bytes: int
+    columns: list
+    # Colonnes dont le type diffère d'un fichier à l'autre : {colonne: {type: nombre de fichiers}}
+    conflicts: dict
+    estimates: dict
+    chosen: str
+    plan_seconds: float = 0.0
+
+    @property
+    def total_bytes(self):
+        return sum(probe.size for probe in self.files)
+
+    @property
+    def estimated_rows(self):
+        return sum(probe.kept_rows for probe in self.readable)
+
+    @property
+    def readable(self):
+        return [probe for probe in self.files if probe.error is None]
+
+    @property
+    def failed(self):
+        return [probe for probe in self.files if probe.error is not None]
+
+    def describe(self):
+        """Lignes lisibles du plan"""
+        mb = 1024 * 1024
+        lines = [f"{len(self.files)} fichiers, {self.total_bytes / mb:.1f} Mo, "
+                 f"~{self.estimated_rows} lignes, {len(self.columns)} colonnes "
+                 f"(estimation en {self.plan_seconds:.1f} s)"]
+        budget = "inconnue" if self.budget_bytes is None else f"{self.budget_bytes / mb:.0f} Mo"
+        lines.append(f"Mémoire utilisable: {budget} ; processus de lecture: {self.workers}")
+        for name in STRATEGIES:
+            estimate = self.estimates[name]
+            label = STRATEGY_LABELS[name]
+            if not estimate.available:
+                lines.append(f"  {label:<24} indisponible ({estimate.reason})")
+                continue
+            disk = f", disque ~{estimate.disk_bytes / mb:.0f} Mo" if estimate.disk_bytes else ""
+            marker = " ← retenue" if name == self.chosen else ""
+            lines.append(f"  {label:<24} pic ~{estimate.peak_bytes / mb:.0f} Mo, "
+                         f"durée ~{format_duration(estimate.seconds)}{disk}{marker}")
+        for column, dtypes in self.conflicts.items():
+            details = ", ".join(f"{dtype} ({count})" for dtype, count in sorted(dtypes.items()))
+            lines.append(f"  Types différents pour '{column}': {details}")
+        for probe in self.failed:
+            lines.append(f"  illisible: {probe.path.name}: {probe.error}")
+        return lines
+
+
+def format_duration(seconds):
+    if seconds < 60:
+        return f"{seconds:.0f} s"
+    if seconds < 3600:
+        return f"{seconds / 60:.1f} min"
+    return f"{seconds / 3600:.1f} h"
+
+
+def union_schema(probes):
+    """Colonnes fusionnées (triées comme la fusion) et conflits de type"""
+    dtypes = {}
+    for probe in probes:
+        for column, dtype in probe.dtypes.items():
+            if dtype == EMPTY:
+                continue
+            dtypes.setdefault(column, {}).setdefault(dtype, 0)
+            dtypes[column][dtype] += 1
+        for column in probe.columns:
+            dtypes.setdefault(column, {})
+    conflicts = {column: kinds for column, kinds in dtypes.items() if len(kinds) > 1}
+    return sorted(dtypes), conflicts
+
+
+def estimate_strategies(probes, columns, output_format, workers, unavailable=None):
+    """Pic de mémoire et durée de chaque stratégie"""
+    unavailable = unavailable or {}
+    workers = max(min(workers, len(probes), os.cpu_count() or 1), 1)
+    width = len(columns)
+
+    def data_bytes(probe):
+        # Colonnes absentes du fichier : une cellule manquante par ligne après alignement
+        return probe.kept_rows * (probe.row_bytes + 8 * max(width - len(probe.columns), 0))
+
+    data = sum(data_bytes(probe) for probe in probes)
+    largest = max((data_bytes(probe) for probe in probes), default=0)
+    # Analyse en cours : le DataFrame complet d'un fichier, avant filtrage
+    parsing = sorted((probe.rows * probe.row_bytes * READ_OVERHEAD for probe in probes), reverse=True)
+    read_peak = sum(parsing[:workers])
+    in_flight = largest * min(workers * 2, len(probes)) if workers > 1 else largest
+
+    total_read = sum(probe.read_seconds for probe in probes)
+    read_seconds = max(total_read / workers, max((probe.read_seconds for probe in probes), default=0.0))
+    cells = sum(probe.kept_rows for probe in probes) * width
+    parsed_cells = sum(probe.rows * max(len(probe.columns), 1) for probe in probes)
+    cell_seconds = total_read / parsed_cells if parsed_cells else 0.0
+
+    write_cost = WRITE_COST.get(output_format, WRITE_COST[CSV])
+    memory_write = XLSX_TO_EXCEL_COST if output_format == XLSX else write_cost
+    memory_peak = read_peak + data * IN_MEMORY_FACTOR
+    if output_format == XLSX:
+        memory_peak += cells * XLSX_CELL_BYTES
+    scan_seconds = sum(probe.read_seconds * NO_DIMENSION_SCAN_COST * probe.undeclared_xml_bytes
+                       / max(probe.xml_bytes, 1) for probe in probes) / workers
+
+    estimates = {
+        MEMORY: StrategyEstimate(MEMORY, int(memory_peak),
+                                 read_seconds + cells * cell_seconds * memory_write),
+        STREAMING: StrategyEstimate(STREAMING, int(read_peak + in_flight + largest * 2),
+                                    scan_seconds + read_seconds + cells * cell_seconds * write_cost),
+        SPILL: StrategyEstimate(SPILL, int(read_peak + in_flight + largest * 3),
+                                read_seconds * (1 + SPILL_COST) + cells * cell_seconds * write_cost,
+                                disk_bytes=int(data)),
+    }
+    for name, reason in unavailable.items():
+        estimates[name].available = False
+        estimates[name].reason = reason
+    return estimates
+
+
+def choose_strategy(estimates, budget):
+    """Stratégie retenue : la fusion en mémoire si elle tient et n'est pas nettement plus lente
+
+    Sinon, la plus rapide des stratégies qui tiennent dans la mémoire, ou à
+    défaut la moins gourmande. Sans budget connu, la fusion en mémoire.
+    """
+    candidates = [estimate for estimate in estimates.values() if estimate.available]
+    if budget is None or not candidates:
+        return MEMORY
+    fitting = [estimate for estimate in candidates if estimate.peak_bytes <= budget]
+    if not fitting:
+        return min(candidates, key=lambda estimate: estimate.peak_bytes).name
+    fastest = min(fitting, key=lambda estimate: estimate.seconds)
+    memory = estimates[MEMORY]
+    if memory in fitting and memory.seconds <= max(fastest.seconds * SWITCH_RATIO,
+                                                   fastest.seconds + SWITCH_SECONDS):
+        return MEMORY
+    return fastest.name
+
+
+def unavailable_strategies(output_format, pyarrow_available=None):
+    """Stratégies impossibles pour ce format de sortie : ``{stratégie: motif}``"""
+    if pyarrow_available is None:
+        pyarrow_available = importlib.util.find_spec('pyarrow') is not None
+    unavailable = {}
+    if output_format not in STREAMING_FORMATS:
+        unavailable[STREAMING] = f"format {output_format}"
+    if not pyarrow_available:
+        unavailable[SPILL] = "pyarrow absent"
+    return unavailable
+
+
+def plan_merge(paths, output_format, add_source_column=True, backend='auto', sheets=None,
+               row_filter=None, workers=1, budget=None, unavailable=None, on_file=None):
+    """Estime la fusion de ``paths`` et choisit une stratégie
+
+    ``on_file`` est appelé avec chaque ``FileProbe`` obtenu.
+    """
+    start = time.perf_counter()
+    probe_func = partial(probe_file, add_source_column=add_source_column, backend=backend,
+                         sheets=sheets, row_filter=row_filter)
+    probes = []
+    for outcome in iter_read(paths, probe_func, workers):
+        probe = outcome.value
+        if outcome.error is not None:
+            probe = FileProbe(Path(outcome.path), error=outcome.error)
+        probes.append(probe)
+        if on_file is not None:
+            on_file(probe)
+
+    readable = [probe for probe in probes if probe.error is None and probe.rows]
+    columns, conflicts = union_schema(readable)
+    if add_source_column and readable and SOURCE_COLUMN not in columns:
+        columns = sorted(columns + [SOURCE_COLUMN])
+    estimates = estimate_strategies(readable, columns, output_format, workers, unavailable)
+    return MergePlan(files=probes, output_format=output_format, workers=workers, budget_bytes=budget,
+                     columns=columns, conflicts=conflicts, estimates=estimates,
+                     chosen=choose_strategy(estimates, budget),
+                     plan_seconds=time.perf_counter() - start)
@@ -0,0 +1,559 @@
+"""Lecture des fichiers Excel sources, séquentielle ou en parallèle.
+
+Le lecteur (« backend ») est choisi d'après la signature du fichier : zip
+pour .xlsx, OLE2 pour .xls. Les lecteurs plus rapides (calamine) sont
+utilisés automatiquement lorsqu'ils sont installés.
+
+Les fonctions de lecture sont définies au niveau du module pour pouvoir être
+envoyées à des processus de travail (``ProcessPoolExecutor``).
+"""
+import importlib.util
+import itertools
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+
+import pandas as pd
+import xlrd
+from openpyxl import load_workbook
+
+SOURCE_COLUMN = 'Fichier_Source'
+SHEET_COLUMN = 'Feuille_Source'
+# Règle de sélection de toutes les feuilles d'un classeur
+ALL_SHEETS = '*'
+
+XLSX = 'xlsx'
+XLS = 'xls'
+ZIP_SIGNATURE = b'PK\x03\x04'
+OLE2_SIGNATURE = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+
+# En dessous de ce nombre de fichiers, démarrer un pool de processus coûte
+# plus cher que la lecture elle-même
+AUTO_PARALLEL_MIN_FILES = 8
+
+# Taille des lots de lignes filtrés par le lecteur openpyxl-rows
+FILTER_BATCH_ROWS = 50_000
+# Taille des lots de la lecture par lots (``iter_excel_chunks``)
+DEFAULT_CHUNK_ROWS = 50_000
+
+
+@dataclass
+class ReadOutcome:
+    """Résultat de la lecture d'un fichier (valeur lue ou message d'erreur)"""
+    index: int
+    path: Path
+    value: object = None
+    error: str = None
+    # Durée de la lecture en secondes (mesurée dans le processus de lecture)
+    seconds: float = 0.0
+
+
+def sniff_format(file_path):
+    """Identifie le format d'un classeur d'après sa signature binaire
+
+    Renvoie ``'xlsx'`` (archive zip), ``'xls'`` (conteneur OLE2) ou ``None``.
+    """
+    with open(file_path, 'rb') as handle:
+        signature = handle.read(8)
+    if signature.startswith(ZIP_SIGNATURE):
+        return XLSX
+    if signature.startswith(OLE2_SIGNATURE):
+        return XLS
+    return None
+
+
+def select_sheets(sheet_names, sheets=None):
+    """Feuilles à lire selon la règle de sélection
+
+    ``None`` : première feuille seulement ; ``'*'`` : toutes les feuilles ;
+    sinon expression régulière comparée au nom complet de chaque feuille
+    (sans tenir compte de la casse).
+    """
+    if sheets is None:
+        return list(sheet_names[:1])
+    if sheets == ALL_SHEETS:
+        return list(sheet_names)
+    pattern = re.compile(sheets, re.IGNORECASE)
+    selected = [name for name in sheet_names if pattern.fullmatch(name)]
+    if not selected:
+        raise ValueError(f"Aucune feuille ne correspond à '{sheets}' "
+                         f"(feuilles: {', '.join(sheet_names)})")
+    return selected
+
+
+def read_pandas_sheets(file_path, engine, sheets=None, row_filter=None):
+    """Lit les feuilles choisies en n'ouvrant le classeur qu'une seule fois
+
+    Avec un filtre de lecture, seules les colonnes utiles sont converties (``usecols``).
+    """
+    usecols = row_filter.needed if row_filter is not None and row_filter.columns else None
+    with pd.ExcelFile(file_path, engine=engine) as workbook:
+        names = select_sheets(workbook.sheet_names, sheets)
+        return [(name, workbook.parse(name, usecols=usecols)) for name in names]
+
+
+def read_openpyxl_rows(file_path, sheets=None, row_filter=None):
+    """Lecteur pur openpyxl : parcours ``read_only`` des valeurs, ligne par ligne"""
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        frames = []
+        for name in select_sheets(workbook.sheetnames, sheets):
+            rows = workbook[name].iter_rows(values_only=True)
+            if row_filter is not None and row_filter.columns:
+                frames.append((name, filtered_rows_to_dataframe(rows, row_filter)))
+            else:
+                frames.append((name, rows_to_dataframe(rows)))
+        return frames
+    finally:
+        workbook.close()
+
+
+def used_width(header, data):
+    """Nombre de colonnes utiles : jusqu'au dernier en-tête ou à la dernière valeur renseignés"""
+    width = max([len(header)] + [len(row) for row in data])
+    used = [i for i in range(width)
+            if (i < len(header) and header[i] not in (None, ''))
+            or any(i < len(row) and row[i] is not None for row in data)]
+    return used[-1] + 1 if used else 0
+
+
+def rows_to_dataframe(rows):
+    """Construit un DataFrame à partir d'un itérateur de lignes (en-tête en premier)"""
+    header = list(next(rows, ()))
+    data = [row for row in rows]
+
+    # Retirer les lignes vides en fin de feuille, comme pd.read_excel
+    while data and all(value is None for value in data[-1]):
+        data.pop()
+
+    width = used_width(header, data)
+    header = (header + [None] * width)[:width]
+    data = [tuple(row[:width]) + (None,) * (width - len(row)) for row in data]
+    df = pd.DataFrame.from_records(data, columns=range(width))
+    df.columns = clean_header(header) if width else []
+    return df
+
+
+def filtered_rows_to_dataframe(rows, row_filter, batch_rows=FILTER_BATCH_ROWS):
+    """Construit un DataFrame filtré à partir d'un itérateur de lignes (en-tête en premier)
+
+    Seules les cellules des colonnes utiles sont conservées, et les
+    conditions sont appliquées par lots de ``batch_rows`` lignes : les
+    lignes écartées ne sont jamais réunies en un seul DataFrame. Le nombre
+    de lignes parcourues est conservé dans ``df.attrs['rows_scanned']``.
+    """
+    header = clean_header(list(next(rows, ())))
+    indices = [i for i, name in enumerate(header) if row_filter.needed(name)]
+    names = [header[i] for i in indices]
+    empty_row = (None,) * len(indices)
+
+    frames = []
+    batch = []
+    scanned = 0
+    # Lignes vides en attente : ignorées si elles terminent la feuille, comme pd.read_excel
+    pending_empty = 0
+    for row in rows:
+        if row.count(None) == len(row):
+            pending_empty += 1
+            continue
+        if pending_empty:
+            batch.extend([empty_row] * pending_empty)
+            scanned += pending_empty
+            pending_empty = 0
+        batch.append(tuple(row[i] if i < len(row) else None for i in indices))
+        scanned += 1
+        if len(batch) >= batch_rows:
+            frames.append(row_filter.apply(pd.DataFrame.from_records(batch, columns=names)))
+            batch = []
+    if batch or not frames:
+        frames.append(row_filter.apply(pd.DataFrame.from_records(batch, columns=names)))
+
+    df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+    df.attrs['rows_scanned'] = scanned
+    df.attrs['filtered'] = True
+    return df
+
+
+def calamine_available():
+    """Le moteur calamine de pandas (python-calamine, pandas >= 2.2) est-il installé ?"""
+    if importlib.util.find_spec('python_calamine') is None:
+        return False
+    major, minor = (int(part) for part in pd.__version__.split('.')[:2])
+    return (major, minor) >= (2, 2)
+
+
+# Lecteurs disponibles : nom → (formats pris en charge, fonction de lecture)
+# Chaque fonction reçoit (chemin, sélection de feuilles, filtre de lecture) et renvoie [(feuille, DataFrame)]
+BACKENDS = {
+    'calamine': ((XLSX, XLS), partial(read_pandas_sheets, engine='calamine')),
+    'openpyxl': ((XLSX,), partial(read_pandas_sheets, engine='openpyxl')),
+    'openpyxl-rows': ((XLSX,), read_openpyxl_rows),
+    'xlrd': ((XLS,), partial(read_pandas_sheets, engine='xlrd')),
+}
+READER_BACKENDS = ('auto',) + tuple(BACKENDS)
+
+# Lecteurs de référence : leur erreur est définitive, sans autre essai
+REFERENCE_BACKENDS = {XLSX: 'openpyxl', XLS: 'xlrd'}
+
+
+def backend_chain(file_format, preferred='auto'):
+    """Lecteurs à essayer pour un format, du plus rapide au lecteur de référence"""
+    chain = []
+    if preferred != 'auto' and file_format in BACKENDS[preferred][0]:
+        chain.append(preferred)
+    elif preferred == 'auto' and calamine_available():
+        chain.append('calamine')
+    reference = REFERENCE_BACKENDS[file_format]
+    if reference not in chain:
+        chain.append(reference)
+    return chain
+
+
+def read_sheets(file_path, backend='auto', sheets=None, row_filter=None):
+    """Lit les feuilles choisies d'un classeur : ``(lecteur, [(feuille, DataFrame)])``
+
+    Le lecteur est choisi selon la signature du fichier. Si un lecteur
+    optionnel échoue, le lecteur de référence du format est essayé une
+    seule fois.
+    """
+    file_format = sniff_format(file_path)
+    if file_format is None:
+        raise ValueError("Format de fichier non reconnu (ni .xlsx ni .xls)")
+
+    chain = backend_chain(file_format, backend)
+    for i, name in enumerate(chain):
+        try:
+            return name, BACKENDS[name][1](file_path, sheets=sheets, row_filter=row_filter)
+        except Exception:
+            if i == len(chain) - 1:
+                raise
+
+
+def read_excel_file(file_path, add_source_column=True, backend='auto', sheets=None, row_filter=None):
+    """Lit un fichier Excel et prépare ses colonnes
+
+    Avec une sélection de feuilles (``sheets``), les feuilles retenues sont
+    empilées et une colonne ``Feuille_Source`` indique leur nom. Le nom du
+    lecteur utilisé est conservé dans ``df.attrs['reader_backend']``.
+
+    ``row_filter`` (``filters.ReadFilter``) limite les colonnes lues et les
+    lignes conservées ; le nombre de lignes parcourues est alors conservé
+    dans ``df.attrs['rows_scanned']``.
+    """
+    file_path = Path(file_path)
+    backend_name, frames = read_sheets(file_path, backend, sheets, row_filter)
+
+    prepared = []
+    scanned = 0
+    for sheet, df in frames:
+        scanned += df.attrs.get('rows_scanned', len(df))
+        if df.empty:
+            continue
+        # Nettoyer les noms de colonnes (supprimer les espaces en début/fin)
+        df.columns = df.columns.str.strip()
+        if sheets is not None:
+            df[SHEET_COLUMN] = sheet
+        if row_filter is not None and not df.attrs.get('filtered'):
+            df = row_filter.apply(df)
+        prepared.append(df)
+
+    if not prepared:
+        df = frames[0][1] if frames else pd.DataFrame()
+    elif len(prepared) == 1:
+        df = prepared[0]
+    else:
+        df = pd.concat(prepared, ignore_index=True, sort=False)
+
+    df.attrs['reader_backend'] = backend_name
+    if row_filter is not None:
+        df.attrs['rows_scanned'] = scanned
+    if df.empty:
+        return df
+
+    # Ajouter une colonne avec le nom du fichier source si demandé
+    if add_source_column:
+        df[SOURCE_COLUMN] = file_path.name
+
+    return df
+
+
+def iter_sheet_chunks(rows, chunk_rows=DEFAULT_CHUNK_ROWS, row_filter=None):
+    """Découpe les lignes d'une feuille (en-tête en premier) en DataFrames de ``chunk_rows`` lignes
+
+    Les colonnes sont fixées sur le premier lot. Un lot suivant renseigné
+    au-delà de cette largeur les élargit : les nouvelles colonnes portent
+    les noms qu'aurait donnés la lecture d'un bloc, et sont signalées dans
+    ``attrs['new_columns']`` du lot. Avec un filtre de lecture, seules les
+    cellules des colonnes utiles sont conservées. Les lignes vides en fin
+    de feuille sont ignorées, comme avec ``pd.read_excel``.
+    """
+    header = list(next(rows, ()))
+    columns = None
+    width = 0
+
+    def build(batch):
+        nonlocal columns, width
+        added = []
+        wider = columns is None or any(len(row) > width and any(value is not None for value in row[width:])
+                                       for row in batch)
+        if wider:
+            used = used_width(header, batch)
+            if columns is None or used > width:
+                names = clean_header((header + [None] * used)[:used]) if used else []
+                added = [(i, name) for i, name in enumerate(names[width:], width)
+                         if row_filter is None or not row_filter.columns or row_filter.needed(name)]
+                if columns is None:
+                    columns, added = added, []
+                else:
+                    columns = columns + added
+                width = max(width, used)
+        data = [tuple(row[i] if i < len(row) else None for i, _ in columns) for row in batch]
+        df = pd.DataFrame.from_records(data, columns=[name for _, name in columns])
+        df.attrs['new_columns'] = [name for _, name in added]
+        return df
+
+    batch = []
+    pending_empty = 0
+    produced = False
+    for row in rows:
+        if row.count(None) == len(row):
+            pending_empty += 1
+            continue
+        if pending_empty:
+            batch.extend([()] * pending_empty)
+            pending_empty = 0
+        batch.append(row)
+        if len(batch) >= chunk_rows:
+            yield build(batch)
+            produced = True
+            batch = []
+    if batch or not produced:
+        yield build(batch)
+
+
+def iter_excel_chunks(file_path, add_source_column=True, sheets=None, row_filter=None,
+                      chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Lit un classeur par lots de ``chunk_rows`` lignes (parcours ``read_only`` d'openpyxl)
+
+    Les lots sont préparés comme par ``read_excel_file`` (noms de colonnes,
+    feuille, filtre, fichier source), sans que la feuille entière n'existe
+    jamais en mémoire. ``attrs`` de chaque lot : lignes parcourues
+    (``rows_scanned``), lignes parcourues depuis le début du fichier
+    (``rows_done``), lignes annoncées par le classeur (``rows_total``,
+    None si inconnu) et colonnes apparues après le premier lot d'une
+    feuille (``new_columns``). Un .xls est lu d'un bloc.
+    """
+    file_path = Path(file_path)
+    if sniff_format(file_path) != XLSX:
+        df = read_excel_file(file_path, add_source_column, sheets=sheets, row_filter=row_filter)
+        scanned = df.attrs.get('rows_scanned', len(df))
+        df.attrs.update(rows_scanned=scanned, rows_done=scanned, rows_total=scanned)
+        yield df
+        return
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        names = select_sheets(workbook.sheetnames, sheets)
+        declared = [workbook[name].max_row for name in names]
+        total = None if None in declared else sum(max(rows - 1, 0) for rows in declared)
+        done = 0
+        for name in names:
+            for df in iter_sheet_chunks(workbook[name].iter_rows(values_only=True), chunk_rows, row_filter):
+                scanned = len(df)
+                new_columns = [column.strip() for column in df.attrs.get('new_columns', [])]
+                done += scanned
+                if len(df.columns):
+                    df.columns = df.columns.str.strip()
+                if sheets is not None:
+                    df[SHEET_COLUMN] = name
+                if row_filter is not None:
+                    df = row_filter.apply(df)
+                if add_source_column and not df.empty:
+                    df[SOURCE_COLUMN] = file_path.name
+                df.attrs.update(reader_backend='openpyxl-rows', rows_scanned=scanned,
+                                rows_done=done, rows_total=total, new_columns=new_columns)
+                yield df
+    finally:
+        workbook.close()
+
+
+def clean_header(values):
+    """Reproduit les noms de colonnes que produirait ``pd.read_excel``
+
+    Les en-têtes vides deviennent ``Unnamed: i`` et les doublons sont
+    suffixés (``Nom``, ``Nom.1``), puis les espaces superflus sont retirés.
+    """
+    columns = []
+    seen = {}
+    for i, value in enumerate(values):
+        name = f"Unnamed: {i}" if value is None or value == '' else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        columns.append(name.strip())
+    return columns
+
+
+def read_heads(file_path, sample_rows=0, sheets=None):
+    """Lit la ligne d'en-tête et quelques lignes des feuilles choisies
+
+    Renvoie une liste ``(feuille, colonnes, nombre_de_lignes_de_données,
+    échantillon)``. Le nombre de lignes provient des dimensions déclarées
+    par le classeur : il peut être approximatif mais ne nécessite pas de
+    lire les données.
+    """
+    file_path = Path(file_path)
+    file_format = sniff_format(file_path)
+    heads = []
+    if file_format == XLSX:
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            for name in select_sheets(workbook.sheetnames, sheets):
+                sheet = workbook[name]
+                rows = sheet.iter_rows(min_row=1, max_row=1 + sample_rows, values_only=True)
+                first_row = next(rows, ())
+                sample = [row for row in rows]
+                if sheet.max_row is None:
+                    # Feuille sans dimension déclarée (classeurs write_only) : compter les lignes
+                    counted = sheet.iter_rows(min_row=2 + sample_rows, values_only=True)
+                    data_rows = len(sample) + sum(1 for _ in counted)
+                else:
+                    data_rows = max(sheet.max_row - 1, 0)
+                heads.append((name, first_row, data_rows, sample))
+        finally:
+            workbook.close()
+    elif file_format == XLS:
+        workbook = xlrd.open_workbook(file_path, on_demand=True)
+        try:
+            for name in select_sheets(workbook.sheet_names(), sheets):
+                sheet = workbook.sheet_by_name(name)
+                first_row = sheet.row_values(0) if sheet.nrows else ()
+                sample = [_xls_row_values(sheet, r, workbook.datemode)
+                          for r in range(1, min(sheet.nrows, 1 + sample_rows))]
+                data_rows = max(sheet.nrows - 1, 0)
+                heads.append((name, first_row, data_rows, sample))
+        finally:
+            workbook.release_resources()
+    else:
+        raise ValueError("Format de fichier non reconnu (ni .xlsx ni .xls)")
+
+    result = []
+    for name, first_row, data_rows, sample in heads:
+        # Retirer les cellules vides en fin de ligne
+        first_row = list(first_row)
+        while first_row and first_row[-1] in (None, ''):
+            first_row.pop()
+        result.append((name, clean_header(first_row), data_rows, sample))
+    return result
+
+
+def read_head(file_path, sample_rows=0):
+    """En-tête et échantillon de la première feuille : ``(colonnes, lignes, échantillon)``"""
+    _, columns, data_rows, sample = read_heads(file_path, sample_rows)[0]
+    return columns, data_rows, sample
+
+
+def _xls_row_values(sheet, row_index, datemode):
+    """Valeurs d'une ligne .xls avec les dates converties en ``datetime``"""
+    values = []
+    for cell in sheet.row(row_index):
+        if cell.ctype == xlrd.XL_CELL_DATE:
+            values.append(xlrd.xldate_as_datetime(cell.value, datemode))
+        elif cell.ctype == xlrd.XL_CELL_BOOLEAN:
+            values.append(bool(cell.value))
+        elif cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK, xlrd.XL_CELL_ERROR):
+            values.append(None)
+        else:
+            values.append(cell.value)
+    return tuple(values)
+
+
+def read_header(file_path):
+    """Lit uniquement la ligne d'en-tête : ``(colonnes, nombre_de_lignes_de_données)``"""
+    columns, data_rows, _ = read_head(file_path)
+    return columns, data_rows
+
+
+def _safe_read(read_func, index, path):
+    """Isole les erreurs d'un fichier pour ne pas interrompre les autres"""
+    start = time.perf_counter()
+    try:
+        value = read_func(path)
+    except Exception as e:
+        return ReadOutcome(index, path, error=str(e), seconds=time.perf_counter() - start)
+    return ReadOutcome(index, path, value=value, seconds=time.perf_counter() - start)
+
+
+def resolve_workers(workers, file_count):
+    """Détermine le nombre de processus de lecture (0 = automatique)
+
+    ``file_count`` vaut ``None`` si le nombre de fichiers n'est pas encore connu.
+    """
+    if workers and workers > 0:
+        return workers if file_count is None else min(workers, max(file_count, 1))
+    if file_count is None:
+        return os.cpu_count() or 1
+    if file_count < AUTO_PARALLEL_MIN_FILES:
+        return 1
+    return min(os.cpu_count() or 1, file_count)
+
+
+def resolve_workers_for(workers, paths):
+    """``resolve_workers`` pour une liste ou un itérateur de chemins : ``(processus, chemins)``
+
+    En mode automatique, les ``AUTO_PARALLEL_MIN_FILES`` premiers chemins
+    d'un itérateur sont lus d'avance (puis remis en tête) : un petit lot est
+    lu sans démarrer de pool de processus.
+    """
+    if isinstance(paths, list):
+        return resolve_workers(workers, len(paths)), paths
+    if workers and workers > 0:
+        return resolve_workers(workers, None), paths
+    head = list(itertools.islice(paths, AUTO_PARALLEL_MIN_FILES))
+    if len(head) < AUTO_PARALLEL_MIN_FILES:
+        return resolve_workers(workers, len(head)), head
+    return resolve_workers(workers, None), itertools.chain(head, paths)
+
+
+def iter_read(paths, read_func, workers=1, max_in_flight=None):
+    """Lit les fichiers et produit des ``ReadOutcome`` dans l'ordre de ``paths``
+
+    Avec ``workers > 1`` les lectures sont réparties sur un pool de
+    processus. Au plus ``max_in_flight`` fichiers (par défaut deux par
+    processus) sont soumis sans avoir été consommés, ce qui borne la mémoire
+    occupée par les résultats en attente.
+    """
+    if workers <= 1:
+        for index, path in enumerate(paths):
+            yield _safe_read(read_func, index, path)
+        return
+
+    max_in_flight = max(max_in_flight or workers * 2, 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        try:
+            for index, path in enumerate(paths):
+                pending.append((index, path, pool.submit(_safe_read, read_func, index, path)))
+                if len(pending) >= max_in_flight:
+                    yield _collect(*pending.popleft())
+            while pending:
+                yield _collect(*pending.popleft())
+        finally:
+            # Consommateur arrêté avant la fin (annulation, erreur) : abandonner les lectures en attente
+            for _, _, future in pending:
+                future.cancel()
+
+
+def _collect(index, path, future):
+    """Récupère le résultat d'une tâche, même si le processus a planté"""
+    try:
+        return future.result()
+    except Exception as e:
+        return ReadOutcome(index, path, error=f"processus de lecture interrompu ({e})")
@@ -0,0 +1,198 @@
+"""Synthèse (somme, nombre, min, max, moyenne par groupe) calculée pendant la fusion.
+
+Plutôt que de relire le fichier fusionné pour un tableau croisé, chaque
+source est résumée dès sa lecture : un ``groupby`` sur ses seules lignes
+donne des agrégats partiels (nombre de lignes, nombre de valeurs, somme,
+minimum, maximum) par groupe. Ces agrégats se combinent entre eux (sommes
+des sommes, minimum des minimums...) : les partiels sont regroupés de temps
+en temps, puis une dernière fois à la fin. La moyenne est déduite de la
+somme et du nombre de valeurs numériques, jamais moyennée entre sources.
+
+Une colonne de regroupement peut être ramenée à une période
+(``Date:mois``) : les dates, même saisies en texte, sont alors remplacées
+par leur période (``2026-01``). Les mesures sont converties en nombres ;
+``count`` compte les cellules non vides, même non numériques.
+"""
+import numpy as np
+import pandas as pd
+
+from filters import as_datetimes
+
+# Agrégats disponibles et suffixe des colonnes produites
+AGGREGATIONS = {
+    'sum': 'somme',
+    'count': 'nombre',
+    'min': 'min',
+    'max': 'max',
+    'mean': 'moyenne',
+}
+# Périodes de regroupement des dates : nom → fréquence pandas
+PERIODS = {
+    'jour': 'D',
+    'semaine': 'W',
+    'mois': 'M',
+    'trimestre': 'Q',
+    'annee': 'Y',
+}
+PERIOD_ALIASES = {'day': 'jour', 'week': 'semaine', 'month': 'mois', 'quarter': 'trimestre',
+                  'year': 'annee', 'année': 'annee'}
+ROWS_COLUMN = 'Nombre_Lignes'
+ROLLUP_SHEET = 'Synthèse'
+# Agrégats partiels gardés avant de les regrouper
+MAX_PARTIALS = 16
+
+
+def parse_group(text):
+    """Colonne de regroupement ``Colonne`` ou ``Colonne:période`` : ``(colonne, période)``"""
+    column, sep, period = text.rpartition(':')
+    period = PERIOD_ALIASES.get(period.strip().lower(), period.strip().lower())
+    if sep and column.strip() and period in PERIODS:
+        return column.strip(), period
+    if not text.strip():
+        raise ValueError("Colonne de regroupement vide")
+    return text.strip(), None
+
+
+def parse_measure(text):
+    """Mesure ``Colonne`` (somme) ou ``Colonne=sum,mean`` : ``(colonne, agrégats)``"""
+    column, sep, names = text.rpartition('=')
+    if not sep:
+        column, names = text, 'sum'
+    column = column.strip()
+    functions = []
+    for name in names.split(','):
+        name = name.strip().lower()
+        function = next((key for key, label in AGGREGATIONS.items() if name in (key, label)), None)
+        if function is None or not column:
+            raise ValueError(f"Mesure invalide '{text}' (attendu: Colonne=agrégat,..., "
+                             f"agrégats: {', '.join(AGGREGATIONS)})")
+        if function not in functions:
+            functions.append(function)
+    return column, functions
+
+
+def period_labels(series, period):
+    """Période de chaque date (``2026-01`` pour un mois) ; vide si ce n'est pas une date"""
+    dates = as_datetimes(series)
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_localize(None)
+    if period == 'semaine':
+        # Semaine désignée par son lundi
+        labels = dates.dt.to_period('W').dt.start_time.dt.strftime('%Y-%m-%d')
+    else:
+        labels = dates.dt.to_period(PERIODS[period]).astype(str)
+    return labels.where(dates.notna())
+
+
+def numeric_values(series):
+    """Valeurs numériques d'une mesure (dates et texte non numérique → manquants)"""
+    if pd.api.types.is_bool_dtype(series.dtype):
+        return series.astype('float64')
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        return series
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return pd.Series(np.nan, index=series.index)
+    return pd.to_numeric(series, errors='coerce')
+
+
+class Rollup:
+    """Agrégats par groupe, alimentés source par source
+
+    ``group_by`` : textes ``Colonne`` ou ``Colonne:période`` ; ``measures`` :
+    textes ``Colonne=agrégat,...``. Sans regroupement, une seule ligne
+    résume toutes les sources. Lève ``ValueError`` pour une règle invalide.
+    """
+
+    def __init__(self, group_by=(), measures=()):
+        self.group_by = [parse_group(text) for text in group_by]
+        self.measures = {}
+        for text in measures:
+            column, functions = parse_measure(text)
+            known = self.measures.setdefault(column, [])
+            known.extend(function for function in functions if function not in known)
+        # Noms internes : pas de collision avec les colonnes des sources
+        self.keys = [f"k{i}" for i in range(len(self.group_by))] or ['total']
+        self.combine_spec = {'rows': 'sum'}
+        for i in range(len(self.measures)):
+            self.combine_spec.update({f"c{i}": 'sum', f"n{i}": 'sum', f"s{i}": 'sum',
+                                      f"lo{i}": 'min', f"hi{i}": 'max'})
+        self.partials = []
+        self.rows = 0
+
+    @property
+    def columns(self):
+        """Colonnes des sources utilisées par la synthèse"""
+        return [column for column, _ in self.group_by] + list(self.measures)
+
+    def key_names(self):
+        return [column if period is None else f"{column}_{period}" for column, period in self.group_by]
+
+    def describe(self):
+        parts = [f"par {', '.join(self.key_names())}" if self.group_by else "total général"]
+        for column, functions in self.measures.items():
+            parts.append(f"{column} ({', '.join(AGGREGATIONS[function] for function in functions)})")
+        return ' ; '.join(parts)
+
+    def add(self, df):
+        """Ajoute les agrégats partiels d'une source (ou d'un lot de lignes)"""
+        if df.empty:
+            return
+        missing = pd.Series(np.nan, index=df.index, dtype=object)
+        frame = {'rows': np.ones(len(df), dtype='int64')}
+        for key, (column, period) in zip(self.keys, self.group_by):
+            values = df[column] if column in df.columns else missing
+            frame[key] = period_labels(values, period) if period is not None else values
+        if not self.group_by:
+            frame['total'] = np.zeros(len(df), dtype='int8')
+        for i, column in enumerate(self.measures):
+            values = df[column] if column in df.columns else missing
+            numbers = numeric_values(values)
+            frame[f"c{i}"] = values.notna().to_numpy()
+            frame[f"n{i}"] = numbers.notna().to_numpy()
+            frame[f"s{i}"] = frame[f"lo{i}"] = frame[f"hi{i}"] = numbers.to_numpy()
+        frame = pd.DataFrame(frame, index=df.index)
+        partial = frame.groupby(self.keys, dropna=False, sort=False).agg(self.combine_spec).reset_index()
+        self.partials.append(partial)
+        self.rows += len(df)
+        if len(self.partials) > MAX_PARTIALS:
+            self.compact()
+
+    def compact(self):
+        """Regroupe les agrégats partiels en un seul"""
+        if len(self.partials) <= 1:
+            return
+        frame = pd.concat(self.partials, ignore_index=True)
+        self.partials = [frame.groupby(self.keys, dropna=False, sort=False)
+                         .agg(self.combine_spec).reset_index()]
+
+    def result(self):
+        """Synthèse finale : colonnes de regroupement, nombre de lignes puis une colonne par agrégat"""
+        self.compact()
+        names = self.key_names()
+        columns = names + [ROWS_COLUMN] + [f"{column}_{AGGREGATIONS[function]}"
+                                           for column, functions in self.measures.items()
+                                           for function in functions]
+        if not self.partials:
+            return pd.DataFrame(columns=columns)
+        frame = self.partials[0]
+        result = {name: frame[key] for name, key in zip(names, self.keys)}
+        result[ROWS_COLUMN] = frame['rows']
+        for i, (column, functions) in enumerate(self.measures.items()):
+            numbers = frame[f"n{i}"]
+            values = {
+                'sum': frame[f"s{i}"].where(numbers > 0),
+                'count': frame[f"c{i}"],
+                'min': frame[f"lo{i}"],
+                'max': frame[f"hi{i}"],
+                'mean': frame[f"s{i}"].where(numbers > 0) / numbers.where(numbers > 0),
+            }
+            for function in functions:
+                result[f"{column}_{AGGREGATIONS[function]}"] = values[function]
+        result = pd.DataFrame(result, columns=columns)
+        if names:
+            try:
+                result = result.sort_values(names, na_position='last', kind='stable')
+            except TypeError:
+                # Valeurs de types mélangés dans une colonne : ordre de première apparition
+                pass
+        return result.reset_index(drop=True)
@@ -0,0 +1,179 @@
+"""Mesures d'une fusion : durée, temps CPU et mémoire par étape, détail par fichier.
+
+Le rapport est sérialisable en JSON pour suivre les régressions d'une
+exécution à l'autre et repérer les fichiers pathologiques.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Intervalle d'échantillonnage de la mémoire pendant une étape (secondes)
+RSS_SAMPLE_INTERVAL = 0.05
+REPORT_VERSION = 1
+
+
+def current_rss():
+    """Mémoire résidente actuelle du processus en octets, ou None si inconnue"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm') as handle:
+            return int(handle.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss():
+    """Pic de mémoire résidente du processus depuis son démarrage, en octets"""
+    if resource is None:
+        return current_rss()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kio sous Linux, octets sous macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def cpu_seconds():
+    """Temps CPU consommé par le processus et ses processus de lecture terminés"""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+class _RssSampler:
+    """Relève la mémoire résidente en arrière-plan pour en garder le maximum"""
+
+    def __init__(self):
+        self.peak = current_rss()
+        self._stop = threading.Event()
+        self._thread = None
+        if self.peak is not None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(RSS_SAMPLE_INTERVAL):
+            rss = current_rss()
+            if rss is not None and rss > self.peak:
+                self.peak = rss
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            rss = current_rss()
+            if rss is not None and rss > self.peak:
+                self.peak = rss
+        return self.peak
+
+
+class RunReport:
+    """Collecte les mesures d'une fusion"""
+
+    def __init__(self, options=None):
+        self.started_at = datetime.now().isoformat(timespec='seconds')
+        self.options = options or {}
+        self.stages = {}
+        self.files = []
+        self.totals = {}
+        self.status = 'running'
+        self.error = None
+        self._start = time.perf_counter()
+        self._start_cpu = cpu_seconds()
+
+    @contextmanager
+    def stage(self, name):
+        """Mesure la durée, le temps CPU et le pic mémoire d'une étape"""
+        sampler = _RssSampler()
+        start = time.perf_counter()
+        start_cpu = cpu_seconds()
+        try:
+            yield
+        finally:
+            stats = self.stages.setdefault(name, {'wall_seconds': 0.0, 'cpu_seconds': 0.0,
+                                                  'peak_rss_bytes': None})
+            stats['wall_seconds'] += time.perf_counter() - start
+            stats['cpu_seconds'] += cpu_seconds() - start_cpu
+            peak = sampler.stop()
+            if peak is not None:
+                stats['peak_rss_bytes'] = max(stats['peak_rss_bytes'] or 0, peak)
+
+    def add_file(self, path, seconds, rows=0, columns=0, backend=None, error=None, status='merged',
+                 duplicates=0, rows_scanned=None):
+        """Enregistre la lecture d'un fichier"""
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = None
+        self.files.append({
+            'path': str(path),
+            'bytes': size,
+            'parse_seconds': round(seconds, 6),
+            'rows': rows,
+            # Lignes parcourues avant le filtre de lecture
+            'rows_scanned': rows if rows_scanned is None else rows_scanned,
+            'columns': columns,
+            'backend': backend,
+            'duplicates': duplicates,
+            'status': status,
+            'error': error,
+        })
+
+    def finish(self, status='success', error=None, **totals):
+        """Clôt le rapport et calcule les totaux et le débit"""
+        self.status = status
+        self.error = error
+        wall = time.perf_counter() - self._start
+        rows = totals.get('rows') or 0
+        self.totals = dict(totals,
+                           wall_seconds=wall,
+                           cpu_seconds=cpu_seconds() - self._start_cpu,
+                           peak_rss_bytes=peak_rss(),
+                           bytes_read=sum(f['bytes'] or 0 for f in self.files),
+                           rows_per_second=rows / wall if wall > 0 else None)
+
+    def slowest_files(self, count=5):
+        return sorted(self.files, key=lambda f: f['parse_seconds'], reverse=True)[:count]
+
+    def to_dict(self):
+        return {
+            'version': REPORT_VERSION,
+            'started_at': self.started_at,
+            'status': self.status,
+            'error': self.error,
+            'options': self.options,
+            'totals': self.totals,
+            'stages': self.stages,
+            'files': self.files,
+        }
+
+    def save(self, path):
+        """Écrit le rapport au format JSON"""
+        path = Path(path)
+        with open(path, 'w', encoding='utf-8') as handle:
+            json.dump(self.to_dict(), handle, indent=2, ensure_ascii=False, default=str)
+        return path
+
+    def summary_lines(self):
+        """Résumé lisible des étapes pour le journal"""
+        lines = []
+        for name, stats in self.stages.items():
+            peak = stats['peak_rss_bytes']
+            memory = f", pic {peak / 1024 / 1024:.0f} Mo" if peak else ""
+            lines.append(f"Étape {name}: {stats['wall_seconds']:.2f} s "
+                         f"(CPU {stats['cpu_seconds']:.2f} s{memory})")
+        rate = self.totals.get('rows_per_second')
+        if rate:
+            lines.append(f"Débit: {rate:,.0f} lignes/s".replace(',', ' '))
+        return lines
@@ -0,0 +1,185 @@
+"""Pré-analyse du schéma des fichiers à partir de leurs seules lignes d'en-tête.
+
+Chaque classeur est ouvert en lecture seule et seules la ligne d'en-tête et
+quelques lignes d'échantillon sont lues. On obtient ainsi, avant toute
+lecture complète, la liste finale des colonnes, la correspondance des
+colonnes de chaque fichier et une indication de type par colonne.
+"""
+import re
+import sys
+from dataclasses import dataclass, field
+from datetime import date, datetime, time
+from functools import partial
+from pathlib import Path
+
+from readers import SHEET_COLUMN, SOURCE_COLUMN, iter_read, read_heads
+
+# Lignes lues après l'en-tête pour deviner le type des colonnes
+DEFAULT_SAMPLE_ROWS = 20
+
+# Texte ressemblant à une date (2024-01-31, 31/01/2024, avec ou sans heure)
+DATE_TEXT = re.compile(r'(\d{4}-\d{2}-\d{2}|\d{1,2}[/.-]\d{1,2}[/.-]\d{4})([ T]\d{2}:\d{2}(:\d{2})?)?')
+
+# Indications de type possibles
+NUMERIC = 'numeric'
+DATETIME = 'datetime'
+TEXT = 'text'
+BOOL = 'bool'
+EMPTY = 'empty'
+MIXED = 'mixed'
+
+
+@dataclass
+class FileSchema:
+    """Schéma d'un fichier : colonnes, lignes annoncées et types devinés"""
+    path: Path
+    columns: list = field(default_factory=list)
+    data_rows: int = 0
+    dtype_hints: dict = field(default_factory=dict)
+    # Mémoire moyenne d'une ligne une fois chargée, estimée sur l'échantillon
+    row_bytes: float = 0.0
+    error: str = None
+
+
+@dataclass
+class SchemaScan:
+    """Résultat de la pré-analyse de tous les fichiers"""
+    columns: list
+    files: list
+    # Pour chaque fichier, position de chacune de ses colonnes dans ``columns``
+    column_maps: dict
+    # Type retenu pour chaque colonne de ``columns``
+    dtype_hints: dict
+    # Colonnes dont le type diffère d'un fichier à l'autre : {colonne: {type: [fichiers]}}
+    conflicts: dict
+
+    @property
+    def estimated_rows(self):
+        return sum(f.data_rows for f in self.files if f.error is None)
+
+    @property
+    def failed_files(self):
+        return [f for f in self.files if f.error is not None]
+
+
+def value_kind(value):
+    """Classe une valeur de cellule dans une des indications de type"""
+    if value is None or value == '':
+        return EMPTY
+    if isinstance(value, bool):
+        return BOOL
+    if isinstance(value, (int, float)):
+        return NUMERIC
+    if isinstance(value, (datetime, date, time)):
+        return DATETIME
+    if isinstance(value, str) and DATE_TEXT.fullmatch(value.strip()):
+        return DATETIME
+    return TEXT
+
+
+def cell_bytes(value):
+    """Mémoire approximative d'une cellule dans un DataFrame pandas"""
+    if isinstance(value, bool):
+        return 1
+    if isinstance(value, str) and not DATE_TEXT.fullmatch(value.strip()):
+        # Colonne object : pointeur + objet chaîne
+        return 8 + sys.getsizeof(value)
+    return 8
+
+
+def combine_kinds(kinds):
+    """Fusionne plusieurs indications de type en une seule"""
+    kinds = set(kinds) - {EMPTY}
+    if not kinds:
+        return EMPTY
+    if len(kinds) == 1:
+        return kinds.pop()
+    return MIXED
+
+
+def scan_file(file_path, sample_rows=DEFAULT_SAMPLE_ROWS, sheets=None):
+    """Lit l'en-tête et un échantillon d'un fichier pour en déduire le schéma
+
+    Avec plusieurs feuilles, les colonnes des feuilles contenant des données
+    sont réunies et leurs indications de type combinées.
+    """
+    columns = []
+    data_rows = 0
+    kinds = {}
+    sample_bytes = []
+    for _, sheet_columns, sheet_rows, sample in read_heads(file_path, sample_rows, sheets):
+        if sheets is not None and not sheet_rows:
+            continue
+        data_rows += sheet_rows
+        sample_bytes.extend(sum(cell_bytes(value) for value in row[:len(sheet_columns)])
+                            + 8 * max(len(sheet_columns) - len(row), 0) for row in sample)
+        for i, column in enumerate(sheet_columns):
+            if column not in kinds:
+                columns.append(column)
+                kinds[column] = set()
+            kinds[column].update(value_kind(row[i]) if i < len(row) else EMPTY for row in sample)
+
+    dtype_hints = {column: combine_kinds(kinds[column]) for column in columns}
+    row_bytes = sum(sample_bytes) / len(sample_bytes) if sample_bytes else 8.0 * len(columns)
+    return FileSchema(Path(file_path), columns, data_rows, dtype_hints, row_bytes)
+
+
+def scan_schema(paths, add_source_column=True, sample_rows=DEFAULT_SAMPLE_ROWS,
+                workers=1, on_file=None, sheets=None):
+    """Pré-analyse tous les fichiers et construit le schéma fusionné
+
+    Les fichiers sans ligne de données sont ignorés, comme lors de la
+    fusion. ``on_file`` est appelé avec chaque ``FileSchema`` obtenu.
+    """
+    scan_func = partial(scan_file, sample_rows=sample_rows, sheets=sheets)
+    files = []
+    for outcome in iter_read(paths, scan_func, workers):
+        file_schema = outcome.value
+        if outcome.error is not None:
+            file_schema = FileSchema(outcome.path, error=outcome.error)
+        files.append(file_schema)
+        if on_file is not None:
+            on_file(file_schema)
+
+    used = [f for f in files if f.error is None and f.data_rows and f.columns]
+
+    all_columns = set()
+    for file_schema in used:
+        all_columns.update(file_schema.columns)
+    if add_source_column:
+        all_columns.add(SOURCE_COLUMN)
+    if sheets is not None:
+        all_columns.add(SHEET_COLUMN)
+
+    # Trier les colonnes pour un ordre cohérent avec la fusion en mémoire
+    all_columns = sorted(all_columns)
+    positions = {column: i for i, column in enumerate(all_columns)}
+
+    column_maps = {}
+    kinds_by_column = {}
+    for file_schema in used:
+        column_maps[file_schema.path] = {column: positions[column] for column in file_schema.columns}
+        for column, kind in file_schema.dtype_hints.items():
+            if kind != EMPTY:
+                kinds_by_column.setdefault(column, {}).setdefault(kind, []).append(file_schema.path.name)
+
+    dtype_hints = {}
+    conflicts = {}
+    for column in all_columns:
+        kinds = kinds_by_column.get(column, {})
+        dtype_hints[column] = combine_kinds(kinds)
+        if len(kinds) > 1:
+            conflicts[column] = kinds
+    if add_source_column:
+        dtype_hints[SOURCE_COLUMN] = TEXT
+    if sheets is not None:
+        dtype_hints[SHEET_COLUMN] = TEXT
+
+    return SchemaScan(all_columns, files, column_maps, dtype_hints, conflicts)
+
+
+def describe_conflict(column, kinds):
+    """Message lisible pour un conflit de type"""
+    details = "; ".join(f"{kind} dans {', '.join(names[:3])}{'...' if len(names) > 3 else ''}"
+                        for kind, names in sorted(kinds.items()))
+    return f"Types différents pour la colonne '{column}': {details}"
@@ -0,0 +1,98 @@
+"""Déversement des sources lues sur disque, au format Arrow IPC.
+
+Pour les fusions plus grandes que la mémoire, chaque DataFrame source est
+écrit dans un fichier Arrow IPC d'un dossier temporaire dès sa lecture,
+puis libéré. L'écriture finale relit les sources une à une par des
+lecteurs en mémoire mappée (sans copie côté Arrow) : la mémoire utilisée
+reste celle d'une seule source, quel que soit le nombre total de lignes.
+
+Une source qu'Arrow ne sait pas représenter (colonne mêlant nombres et
+texte, par exemple) est conservée en pickle à la place.
+"""
+import importlib.util
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+
+import pandas as pd
+
+
+@dataclass
+class SpilledSource:
+    """Une source déversée sur disque"""
+    source: Path
+    path: Path
+    rows: int
+    bytes: int
+
+
+class SpillStore:
+    """Dossier temporaire de sources déversées, relues dans l'ordre d'ajout"""
+
+    def __init__(self, directory=None):
+        if importlib.util.find_spec('pyarrow') is None:
+            raise ImportError("le déversement sur disque nécessite le paquet 'pyarrow' (pip install pyarrow)")
+        if directory is not None:
+            Path(directory).mkdir(parents=True, exist_ok=True)
+        self.directory = Path(tempfile.mkdtemp(prefix='spill-', dir=directory))
+        self.entries = []
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def sources(self):
+        """Nombre de sources distinctes (une source lue par lots a plusieurs entrées)"""
+        return len({entry.source for entry in self.entries})
+
+    @property
+    def rows(self):
+        return sum(entry.rows for entry in self.entries)
+
+    @property
+    def bytes(self):
+        return sum(entry.bytes for entry in self.entries)
+
+    def add(self, source, df):
+        """Écrit un DataFrame source sur disque"""
+        import pyarrow as pa
+
+        stem = self.directory / f"{len(self.entries):06d}"
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            path = stem.with_suffix('.pkl')
+            df.to_pickle(path)
+        else:
+            path = stem.with_suffix('.arrow')
+            with pa.OSFile(str(path), 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        entry = SpilledSource(Path(source), path, len(df), os.path.getsize(path))
+        self.entries.append(entry)
+        return entry
+
+    def load(self, entry):
+        """Relit une source ; les fichiers Arrow sont lus en mémoire mappée"""
+        import pyarrow as pa
+
+        if entry.path.suffix == '.pkl':
+            return pd.read_pickle(entry.path)
+        table = pa.ipc.open_file(pa.memory_map(str(entry.path), 'r')).read_all()
+        return table.to_pandas()
+
+    def __iter__(self):
+        for entry in self.entries:
+            yield entry.source, self.load(entry)
+
+    def close(self):
+        """Supprime le dossier temporaire"""
+        self.entries = []
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
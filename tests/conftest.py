@@ -0,0 +1,60 @@
+"""Fixtures communes : petits classeurs générés dans un dossier temporaire."""
+import importlib.util
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+# Les modules sont à la racine du dépôt
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from merge_engine import MergeEngine, MergeOptions  # noqa: E402
+
+# Sorties Parquet/Feather : pyarrow est optionnel
+needs_pyarrow = pytest.mark.skipif(importlib.util.find_spec('pyarrow') is None,
+                                   reason="pyarrow n'est pas installé")
+PARQUET = pytest.param('.parquet', marks=needs_pyarrow)
+FEATHER = pytest.param('.feather', marks=needs_pyarrow)
+
+
+def sales(start, rows, city='Lille'):
+    """Ventes de test : ID, Ville, Produit, Date, Total"""
+    return pd.DataFrame({
+        'ID': range(start, start + rows),
+        'Ville': [city if i % 2 else 'Nice' for i in range(rows)],
+        'Produit': ['A' if i % 3 else 'B' for i in range(rows)],
+        'Date': pd.date_range('2026-01-15', periods=rows, freq='10D'),
+        'Total': [round(10.5 * (i + 1), 2) for i in range(rows)],
+    })
+
+
+@pytest.fixture
+def input_folder(tmp_path):
+    """Trois classeurs, dont le troisième répète les lignes du premier"""
+    folder = tmp_path / 'entree'
+    folder.mkdir()
+    sales(1, 6).to_excel(folder / 'a.xlsx', index=False)
+    sales(100, 5, city='Lyon').to_excel(folder / 'b.xlsx', index=False)
+    sales(1, 6).to_excel(folder / 'c.xlsx', index=False)
+    return folder
+
+
+def merged_sales():
+    """Lignes attendues après fusion de ``input_folder``"""
+    return pd.concat([
+        sales(1, 6).assign(Fichier_Source='a.xlsx'),
+        sales(100, 5, city='Lyon').assign(Fichier_Source='b.xlsx'),
+        sales(1, 6).assign(Fichier_Source='c.xlsx'),
+    ], ignore_index=True)
+
+
+def run_merge(input_folder, output_file, **options):
+    """Fusion complète ; renvoie le résultat et les événements émis"""
+    events = []
+    engine = MergeEngine(MergeOptions(str(input_folder), str(output_file), **options), events.append)
+    return engine.run(), events
+
+
+def warnings(events):
+    return [event.message for event in events if event.kind == 'log' and event.level == 'warning']
@@ -0,0 +1,27 @@
+import json
+
+from cache import INDEX_FILE, SourceCache
+from conftest import needs_pyarrow
+
+pytestmark = needs_pyarrow
+
+
+def test_save_sweeps_unindexed_entries(tmp_path):
+    cache = SourceCache(tmp_path)
+    orphan = tmp_path / ('a' * 40 + '.parquet')
+    partial = tmp_path / ('b' * 40 + '.1234.tmp')
+    own = tmp_path / 'export.parquet'
+    for path in (orphan, partial, own):
+        path.write_bytes(b'x')
+    cache.save()
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['export.parquet', INDEX_FILE]
+    assert cache.evicted == 2
+
+
+def test_clear_keeps_unrelated_files(tmp_path):
+    cache = SourceCache(tmp_path)
+    (tmp_path / ('c' * 40 + '.parquet')).write_bytes(b'x')
+    (tmp_path / 'export.parquet').write_bytes(b'x')
+    cache.clear()
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['export.parquet', INDEX_FILE]
+    assert json.loads((tmp_path / INDEX_FILE).read_text()) == {}
@@ -0,0 +1,79 @@
+import json
+
+import pandas as pd
+import pytest
+
+from cache import INDEX_FILE
+from checkpoint import JobCheckpoint
+from conftest import needs_pyarrow, run_merge, warnings
+from merge_engine import MergeCancelled, MergeEngine, MergeOptions
+
+
+def cancel_after(engine, files):
+    """Annule la fusion pendant le traitement du fichier numéro ``files``"""
+    seen = []
+
+    def on_event(event):
+        if event.kind == 'log' and event.message.startswith('Traitement de'):
+            seen.append(event.message)
+            if len(seen) == files:
+                engine.cancel()
+    return on_event
+
+
+@needs_pyarrow
+def test_cancelled_merge_resumes_from_checkpoint(input_folder, tmp_path):
+    options = MergeOptions(str(input_folder), str(tmp_path / 'sortie.csv'),
+                           checkpoint_dir=str(tmp_path / 'reprise'))
+    engine = MergeEngine(options)
+    engine.on_event = cancel_after(engine, 2)
+    with pytest.raises(MergeCancelled):
+        engine.run()
+    assert (tmp_path / 'reprise' / 'manifest.json').exists()
+
+    # L'index du cache est enregistré malgré l'annulation
+    assert len(json.loads((tmp_path / 'reprise' / 'sources' / INDEX_FILE).read_text())) == 2
+
+    result, events = run_merge(input_folder, tmp_path / 'sortie.csv', checkpoint_dir=str(tmp_path / 'reprise'))
+    assert result.rows == 17
+    assert any('2 fichier(s) déjà lu(s)' in event.message for event in events)
+    assert not (tmp_path / 'reprise').exists()
+
+
+def test_remove_keeps_unrelated_files(tmp_path):
+    directory = tmp_path / 'dossier'
+    directory.mkdir()
+    (directory / 'notes.txt').write_text('à garder')
+    (directory / 'classeur.xlsx').write_bytes(b'x')
+    checkpoint = JobCheckpoint(directory, {'a': 1})
+    checkpoint.sources_dir.mkdir()
+    (checkpoint.sources_dir / ('0' * 40 + '.parquet')).write_bytes(b'x')
+    (checkpoint.sources_dir / 'index.json').write_text('{}')
+    checkpoint.finish('running')
+
+    checkpoint.remove()
+    assert sorted(path.name for path in directory.iterdir()) == ['classeur.xlsx', 'notes.txt']
+
+
+def test_remove_deletes_own_directory(tmp_path):
+    checkpoint = JobCheckpoint(tmp_path / 'reprise', {'a': 1})
+    checkpoint.finish('running')
+    checkpoint.remove()
+    assert not (tmp_path / 'reprise').exists()
+
+
+def test_checkpoint_in_input_folder_survives_merge(input_folder, tmp_path):
+    (input_folder / 'notes.txt').write_text('à garder')
+    before = sorted(path.name for path in input_folder.iterdir())
+    result, _ = run_merge(input_folder, tmp_path / 'sortie.csv', checkpoint_dir=str(input_folder))
+    assert result.rows == 17
+    assert sorted(path.name for path in input_folder.iterdir()) == before
+    assert len(pd.read_csv(tmp_path / 'sortie.csv')) == 17
+
+
+def test_chunked_merge_skips_checkpoint(input_folder, tmp_path):
+    result, events = run_merge(input_folder, tmp_path / 'sortie.csv', chunk_rows=2,
+                               checkpoint_dir=str(tmp_path / 'reprise'))
+    assert result.rows == 17
+    assert any('lecture par lots' in message for message in warnings(events))
+    assert not (tmp_path / 'reprise').exists()
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import run_merge
+from dedup import RowDeduplicator, SeenHashes
+
+
+def test_filter_drops_rows_seen_in_earlier_sources():
+    dedup = RowDeduplicator()
+    first = pd.DataFrame({'ID': [1, 2, 3], 'Fichier_Source': 'a.xlsx'})
+    second = pd.DataFrame({'ID': [3, 4, 4], 'Fichier_Source': 'b.xlsx'})
+    dedup.filter(first, 'a.xlsx')
+    kept = dedup.filter(second, 'b.xlsx')
+    assert kept['ID'].tolist() == [4]
+    assert dedup.dropped_by_file == {'a.xlsx': 0, 'b.xlsx': 2}
+
+
+def test_filter_accumulates_per_source():
+    dedup = RowDeduplicator()
+    df = pd.DataFrame({'ID': [1, 2, 3]})
+    dedup.filter(df, 'a.xlsx')
+    dedup.filter(df.iloc[:2], 'b.xlsx')
+    dedup.filter(df.iloc[2:], 'b.xlsx')
+    assert dedup.dropped_by_file == {'a.xlsx': 0, 'b.xlsx': 3}
+    assert dedup.dropped == 3
+
+
+def test_key_columns_limit_the_comparison():
+    dedup = RowDeduplicator(key_columns=['ID'])
+    dedup.filter(pd.DataFrame({'ID': [1, 2], 'Total': [1.0, 2.0]}))
+    kept = dedup.filter(pd.DataFrame({'ID': [2, 3], 'Total': [9.0, 3.0]}))
+    assert kept['ID'].tolist() == [3]
+
+
+@pytest.mark.parametrize('spill', [False, True])
+def test_seen_hashes_across_many_levels(tmp_path, spill):
+    seen = SeenHashes(max_memory_bytes=64, spill_dir=str(tmp_path) if spill else None)
+    for start in range(0, 400, 10):
+        assert not seen.add(np.arange(start, start + 10, dtype=np.uint64)).any()
+    assert seen.add(np.arange(0, 400, 7, dtype=np.uint64)).all()
+    assert len(seen) == 400
+    seen.close()
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.parametrize('chunk_rows', [None, 2])
+def test_duplicates_removed_from_merge(input_folder, tmp_path, chunk_rows):
+    result, _ = run_merge(input_folder, tmp_path / 'sortie.csv', dedup=True, chunk_rows=chunk_rows)
+    assert result.duplicates_removed == 6
+    assert result.rows == 11
+    assert result.report.totals['duplicates_removed'] == 6
+
+
+def test_levels_stay_logarithmic():
+    seen = SeenHashes()
+    for start in range(0, 50000, 50):
+        seen.add(np.arange(start, start + 50, dtype=np.uint64))
+    sizes = [len(level) for level in seen.levels]
+    assert sum(sizes) == 50000
+    assert all(larger > 2 * smaller for larger, smaller in zip(sizes, sizes[1:]))
+    assert len(sizes) <= 10
+    for level in seen.levels:
+        assert (np.diff(level.astype(np.int64)) > 0).all()
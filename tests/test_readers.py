@@ -0,0 +1,60 @@
+import pandas as pd
+from openpyxl import Workbook
+
+from conftest import run_merge, sales, warnings
+from readers import AUTO_PARALLEL_MIN_FILES, iter_excel_chunks, read_excel_file, resolve_workers_for
+
+
+def test_chunks_match_the_whole_sheet(tmp_path):
+    sales(1, 7).to_excel(tmp_path / 'ventes.xlsx', index=False)
+    chunks = list(iter_excel_chunks(tmp_path / 'ventes.xlsx', chunk_rows=3))
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+    assert [chunk.attrs['rows_done'] for chunk in chunks] == [3, 6, 7]
+    whole = read_excel_file(tmp_path / 'ventes.xlsx')
+    merged = pd.concat(chunks, ignore_index=True)
+    pd.testing.assert_frame_equal(merged[whole.columns], whole, check_dtype=False)
+
+
+def wide_workbook(path):
+    """Deux colonnes sur les premières lignes, une troisième ensuite"""
+    wb = Workbook()
+    ws = wb.active
+    ws.append(['ID', 'Total'])
+    for i in range(1, 5):
+        ws.append([i, i * 10])
+    for i in range(5, 8):
+        ws.append([i, i * 10, f"note {i}"])
+    wb.save(path)
+
+
+def test_later_wider_batch_keeps_its_columns(tmp_path):
+    wide_workbook(tmp_path / 'large.xlsx')
+    chunks = list(iter_excel_chunks(tmp_path / 'large.xlsx', chunk_rows=2))
+    assert sum(len(chunk) for chunk in chunks) == 7
+    last = chunks[-1]
+    assert last.shape[1] > chunks[0].shape[1]
+    assert last.iloc[:, 2].tolist()[-1] == 'note 7'
+    assert any(chunk.attrs.get('new_columns') for chunk in chunks)
+
+
+def test_chunked_merge_warns_about_new_columns(tmp_path):
+    folder = tmp_path / 'entree'
+    folder.mkdir()
+    wide_workbook(folder / 'large.xlsx')
+    result, events = run_merge(folder, tmp_path / 'sortie.csv', chunk_rows=2)
+    assert result.rows == 7
+    assert any('large.xlsx' in message for message in warnings(events))
+
+
+def test_few_discovered_files_are_read_without_pool(monkeypatch):
+    monkeypatch.setattr('os.cpu_count', lambda: 4)
+    workers, paths = resolve_workers_for(0, iter(['a.xlsx', 'b.xlsx']))
+    assert (workers, paths) == (1, ['a.xlsx', 'b.xlsx'])
+
+    names = [f"{i}.xlsx" for i in range(AUTO_PARALLEL_MIN_FILES + 2)]
+    workers, paths = resolve_workers_for(0, iter(names))
+    assert workers == 4 and list(paths) == names
+
+    # Nombre de processus imposé : rien n'est lu d'avance
+    discovered = iter(names)
+    assert resolve_workers_for(2, discovered) == (2, discovered)
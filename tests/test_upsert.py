@@ -0,0 +1,125 @@
+from pathlib import Path
+
+import pandas as pd
+
+import upsert
+from conftest import needs_pyarrow, run_merge, sales, warnings
+from upsert import UpsertTable
+
+
+def test_later_rows_replace_earlier_ones():
+    table = UpsertTable(['ID'], rules={'Quantite': 'sum', 'Ville': 'first'})
+    table.apply(pd.DataFrame({'ID': [1, 2], 'Ville': ['Lille', 'Nice'], 'Quantite': [1, 2], 'Total': [1.0, 2.0]}))
+    assert table.apply(pd.DataFrame({'ID': [2, 3], 'Ville': ['Lyon', 'Lyon'], 'Quantite': [5, 3],
+                                     'Total': [None, 3.0]})) == (1, 1)
+    frame = table.to_frame().set_index('ID')
+    assert frame['Ville'].tolist() == ['Lille', 'Nice', 'Lyon']
+    assert frame['Quantite'].tolist() == [1, 7, 3]
+    # Une valeur vide ne remplace pas la valeur connue
+    assert frame['Total'].tolist() == [1.0, 2.0, 3.0]
+
+
+def test_new_column_takes_source_dtype():
+    table = UpsertTable(['ID'])
+    table.apply(pd.DataFrame({'ID': [1, 2], 'Total': [1.0, 2.0]}))
+    table.apply(pd.DataFrame({'ID': [2], 'Remise': [5], 'Date': pd.to_datetime(['2026-03-01'])}))
+    frame = table.to_frame()
+    assert frame['Remise'].dtype == 'float64'
+    assert pd.api.types.is_datetime64_any_dtype(frame['Date'].dtype)
+    assert frame.set_index('ID').loc[2, 'Remise'] == 5
+
+
+def test_segments_are_compacted():
+    table = UpsertTable(['ID'])
+    for start in range(0, 200, 10):
+        table.apply(pd.DataFrame({'ID': range(start, start + 10), 'Total': 1.0}))
+    table.apply(pd.DataFrame({'ID': range(0, 200, 2), 'Total': 2.0}))
+    frame = table.to_frame()
+    assert len(frame) == 200
+    assert frame['Total'].sum() == 300.0
+    # Segments de tailles décroissantes, chacun plus de deux fois plus petit que le précédent
+    sizes = [len(segment.frame) for segment in table.segments]
+    assert all(larger > 2 * smaller for larger, smaller in zip(sizes, sizes[1:]))
+
+
+def test_updated_text_column_keeps_its_dtype():
+    table = UpsertTable(['ID'])
+    table.apply(pd.DataFrame({'ID': [1, 2], 'Ville': ['Lille', 'Nice']}))
+    table.apply(pd.DataFrame({'ID': [2], 'Ville': ['Lyon']}))
+    frame = table.to_frame()
+    assert frame['Ville'].tolist() == ['Lille', 'Lyon']
+    assert frame['Ville'].dtype == pd.DataFrame({'Ville': ['Lille']})['Ville'].dtype
+
+
+def test_upsert_state_applies_only_new_files(tmp_path):
+    folder = tmp_path / 'entree'
+    folder.mkdir()
+    sales(1, 4).to_excel(folder / 'a.xlsx', index=False)
+    sales(3, 4).to_excel(folder / 'b.xlsx', index=False)
+    options = dict(upsert_keys=('ID',), upsert_state_dir=str(tmp_path / 'etat'))
+    result, _ = run_merge(folder, tmp_path / 'sortie.xlsx', **options)
+    assert result.rows == 6
+
+    sales(6, 3).to_excel(folder / 'c.xlsx', index=False)
+    result, events = run_merge(folder, tmp_path / 'sortie.xlsx', **options)
+    assert result.rows == 8
+    assert any('1 nouveau(x) fichier(s) à appliquer sur 3' in event.message for event in events)
+    assert pd.read_excel(tmp_path / 'sortie.xlsx')['ID'].tolist() == list(range(1, 9))
+
+
+@needs_pyarrow
+def test_upsert_merge_converts_new_columns(tmp_path):
+    folder = tmp_path / 'entree'
+    folder.mkdir()
+    sales(1, 4).to_excel(folder / 'a.xlsx', index=False)
+    sales(3, 4).assign(Remise=[1.5, 0, 2, 3]).to_excel(folder / 'b.xlsx', index=False)
+    output = tmp_path / 'sortie.parquet'
+    result, events = run_merge(folder, output, upsert_keys=('ID',))
+    assert result.rows == 6
+    assert not [message for message in warnings(events) if 'Conversion impossible' in message]
+    merged = pd.read_parquet(output)
+    assert merged['Remise'].dtype == 'float64'
+    assert merged['Remise'].notna().sum() == 4
+
+
+def test_unreadable_file_stays_pending(tmp_path):
+    folder = tmp_path / 'entree'
+    folder.mkdir()
+    sales(1, 4).to_excel(folder / 'a.xlsx', index=False)
+    (folder / 'b.xlsx').write_bytes(b'pas un classeur')
+    sales(20, 2).to_excel(folder / 'c.xlsx', index=False)
+    # Cumul : un fichier appliqué deux fois se verrait
+    options = dict(upsert_keys=('ID',), upsert_rules=('Total=sum',), upsert_state_dir=str(tmp_path / 'etat'))
+    result, events = run_merge(folder, tmp_path / 'sortie.xlsx', **options)
+    assert result.rows == 6
+    assert any('b.xlsx et les fichiers suivants (2)' in message for message in warnings(events))
+
+    # Le fichier redevient lisible : il est appliqué, puis c.xlsx de nouveau
+    sales(3, 4).assign(Total=100.0).to_excel(folder / 'b.xlsx', index=False)
+    result, events = run_merge(folder, tmp_path / 'sortie.xlsx', **options)
+    assert any('2 nouveau(x) fichier(s) à appliquer sur 3' in event.message for event in events)
+    merged = pd.read_excel(tmp_path / 'sortie.xlsx').set_index('ID')
+    assert len(merged) == 8
+    assert merged['Total'].tolist() == [10.5, 21.0, 131.5, 142.0, 100.0, 100.0, 10.5, 21.0]
+
+
+def test_fingerprint_error_keeps_file_pending(tmp_path, monkeypatch):
+    folder = tmp_path / 'entree'
+    folder.mkdir()
+    sales(1, 4).to_excel(folder / 'a.xlsx', index=False)
+    sales(3, 4).to_excel(folder / 'b.xlsx', index=False)
+    fingerprint = upsert.file_fingerprint
+
+    def unavailable(path, *args):
+        if Path(path).name == 'b.xlsx':
+            raise PermissionError("fichier verrouillé")
+        return fingerprint(path, *args)
+
+    monkeypatch.setattr(upsert, 'file_fingerprint', unavailable)
+    options = dict(upsert_keys=('ID',), upsert_state_dir=str(tmp_path / 'etat'))
+    result, _ = run_merge(folder, tmp_path / 'sortie.xlsx', **options)
+    assert result.rows == 6
+    monkeypatch.undo()
+    result, events = run_merge(folder, tmp_path / 'sortie.xlsx', **options)
+    assert result.rows == 6
+    assert any('1 nouveau(x) fichier(s) à appliquer sur 2' in event.message for event in events)
@@ -0,0 +1,116 @@
+import pandas as pd
+
+import watch
+from merge_engine import MergeOptions
+
+
+def make_watcher(input_folder, output, **options):
+    options = MergeOptions(str(input_folder), str(output), **options)
+    return watch.FolderWatcher(options, settle=0, rebuild_every=0, use_watchdog=False)
+
+
+def run_cycles(watcher, published=None, count=3):
+    published = {} if published is None else published
+    pending = {}
+    for _ in range(count):
+        watcher.cycle(published, pending)
+    return published
+
+
+def test_rebuild_follows_new_files(input_folder, tmp_path):
+    output = tmp_path / 'fusion.xlsx'
+    watcher = make_watcher(input_folder, output)
+    published = run_cycles(watcher)
+    assert len(pd.read_excel(output)) == 17
+    pd.read_excel(input_folder / 'b.xlsx').to_excel(input_folder / 'd.xlsx', index=False)
+    run_cycles(watcher, published)
+    assert len(pd.read_excel(output)) == 22
+
+
+def test_partitions_follow_sources(input_folder, tmp_path):
+    output = tmp_path / 'partitions'
+    watcher = make_watcher(input_folder, output, output_format='csv')
+    published = run_cycles(watcher)
+    partitions = sorted(output.glob('*.csv'))
+    assert [path.name.split('-')[0] for path in partitions] == ['a', 'b', 'c']
+    assert sum(len(pd.read_csv(path)) for path in partitions) == 17
+
+    (input_folder / 'b.xlsx').unlink()
+    run_cycles(watcher, published)
+    assert [path.name.split('-')[0] for path in sorted(output.glob('*.csv'))] == ['a', 'c']
+
+
+def test_snapshot_skips_output_and_rollup(input_folder):
+    output = input_folder / 'fusion.xlsx'
+    rollup = input_folder / 'synthese.xlsx'
+    output.write_bytes(b'')
+    rollup.write_bytes(b'')
+    watcher = make_watcher(input_folder, output, rollup_by=('Ville',), rollup_file=str(rollup))
+    assert sorted(watch.Path(path).name for path in watcher.snapshot()) == ['a.xlsx', 'b.xlsx', 'c.xlsx']
+
+
+def test_rebuild_does_not_merge_its_output(input_folder):
+    output = input_folder / 'fusion.xlsx'
+    watcher = make_watcher(input_folder, output)
+    published = run_cycles(watcher)
+    assert len(pd.read_excel(output)) == 17
+    # Nouveau dépôt : la sortie ne doit pas être relue
+    pd.read_excel(input_folder / 'b.xlsx').to_excel(input_folder / 'd.xlsx', index=False)
+    run_cycles(watcher, published)
+    merged = pd.read_excel(output)
+    assert len(merged) == 22
+    assert 'fusion.xlsx' not in set(merged['Fichier_Source'])
+
+
+def test_locked_output_is_retried(input_folder, monkeypatch):
+    watcher = make_watcher(input_folder, input_folder / 'fusion.xlsx')
+
+    def locked(engine):
+        raise PermissionError("fichier ouvert dans Excel")
+
+    monkeypatch.setattr(watch.MergeEngine, 'run', locked)
+    publisher = watcher.publisher
+    assert publisher.tick() is False
+    assert publisher.dirty
+    assert publisher.next_due() is None
+    monkeypatch.undo()
+    assert publisher.tick() is True
+
+
+def test_deferred_rebuild_latency_is_measured(input_folder, tmp_path):
+    watcher = make_watcher(input_folder, tmp_path / 'fusion.xlsx')
+    watcher.publisher.rebuild_every = 3600
+    watcher.publisher.last_build = watch.time.monotonic()
+    published, pending = {}, {}
+    watcher.cycle(published, pending)
+    watcher.cycle(published, pending)
+    assert watcher.latencies == [] and len(watcher.unpublished) == 3
+    watcher.publisher.last_build -= 3600
+    watcher.cycle(published, pending)
+    assert len(watcher.latencies) == 3
+    assert all(latency > 0 for latency in watcher.latencies)
+
+
+def test_unreadable_source_is_retried(input_folder, tmp_path, monkeypatch):
+    output = tmp_path / 'partitions'
+    watcher = make_watcher(input_folder, output, output_format='csv')
+    read = watch.read_excel_file
+
+    def locked(source, **options):
+        if watch.Path(source).name == 'b.xlsx':
+            raise PermissionError("fichier verrouillé")
+        return read(source, **options)
+
+    monkeypatch.setattr(watch, 'read_excel_file', locked)
+    published, pending = {}, {}
+    for _ in range(3):
+        watcher.cycle(published, pending)
+    assert sorted(watch.Path(path).name for path in published) == ['a.xlsx', 'c.xlsx']
+    assert [watch.Path(path).name for path in pending] == ['b.xlsx']
+    assert len(watcher.latencies) == 2
+
+    monkeypatch.undo()
+    watcher.cycle(published, pending)
+    assert not pending and len(published) == 3
+    assert [path.name.split('-')[0] for path in sorted(output.glob('*.csv'))] == ['a', 'b', 'c']
+    assert len(watcher.latencies) == 3
@@ -0,0 +1,88 @@
+import pandas as pd
+import pytest
+
+from conftest import FEATHER, PARQUET, merged_sales, run_merge
+from merge_engine import MergeError
+from parallel_xlsx import write_partitioned_excel
+from writers import open_stream_writer, write_dataframe
+
+SUFFIXES = ['.xlsx', '.csv', PARQUET, FEATHER]
+STRATEGIES = [{}, {'streaming': True}, {'spill': True}, {'chunk_rows': 2}]
+
+
+def normalized(df):
+    """Lignes triées, dates à la même précision"""
+    df = df.assign(Date=df['Date'].astype('datetime64[us]'))
+    return df.sort_values(['Fichier_Source', 'ID']).reset_index(drop=True)
+
+
+def read_output(path):
+    if path.suffix == '.csv':
+        df = pd.read_csv(path, parse_dates=['Date'])
+    elif path.suffix in ('.parquet', '.feather'):
+        df = pd.read_parquet(path) if path.suffix == '.parquet' else pd.read_feather(path)
+        # Le nom de source est gardé en catégorie
+        df = df.astype({column: str for column in df.select_dtypes('category').columns})
+    else:
+        df = pd.read_excel(path)
+    return normalized(df)
+
+
+@pytest.mark.parametrize('suffix', SUFFIXES)
+@pytest.mark.parametrize('options', STRATEGIES)
+def test_outputs_hold_every_row(input_folder, tmp_path, suffix, options):
+    if options.get('streaming') and suffix not in ('.xlsx', '.csv'):
+        pytest.skip(f"{suffix} n'est pas disponible en streaming")
+    result, _ = run_merge(input_folder, tmp_path / f'sortie{suffix}', **options)
+    assert (result.rows, result.files_merged, result.files_failed) == (17, 3, 0)
+    expected = normalized(merged_sales())
+    merged = read_output(result.output_path)
+    pd.testing.assert_frame_equal(merged[expected.columns], expected, check_dtype=False)
+
+
+@pytest.mark.parametrize('suffix', ['.xlsx', '.csv', PARQUET])
+def test_failed_merge_keeps_previous_output(tmp_path, suffix):
+    folder = tmp_path / 'entree'
+    folder.mkdir()
+    pd.DataFrame().to_excel(folder / 'vide.xlsx')
+    output = tmp_path / f'sortie{suffix}'
+    output.write_bytes(b'ancienne sortie')
+    options = {'spill': True} if suffix == '.parquet' else {'streaming': True}
+    with pytest.raises(MergeError):
+        run_merge(folder, output, **options)
+    assert output.read_bytes() == b'ancienne sortie'
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['entree', f'sortie{suffix}']
+
+
+def test_stream_writer_replaces_output_on_success(tmp_path):
+    output = tmp_path / 'sortie.csv'
+    output.write_text('ancienne sortie')
+    with open_stream_writer(output, ['A']) as writer:
+        writer.append(pd.DataFrame({'A': [1, 2]}))
+        assert output.read_text() == 'ancienne sortie'
+    assert pd.read_csv(output)['A'].tolist() == [1, 2]
+
+
+class Unwritable:
+    def __str__(self):
+        raise RuntimeError('valeur illisible')
+
+
+@pytest.mark.parametrize('suffix', SUFFIXES)
+def test_failed_write_keeps_previous_output(tmp_path, suffix):
+    output = tmp_path / f'sortie{suffix}'
+    output.write_bytes(b'ancienne sortie')
+    df = pd.DataFrame({'A': [1, 2, Unwritable()]})
+    with pytest.raises(Exception):
+        write_dataframe(df, output, csv_chunk_rows=1)
+    assert output.read_bytes() == b'ancienne sortie'
+    assert [path.name for path in tmp_path.iterdir()] == [f'sortie{suffix}']
+
+
+def test_split_workbooks_get_valid_file_names(tmp_path):
+    df = pd.DataFrame({'Ville': ['a<b>"c|d', 'Lyon. ', 'lyon', 'ventes.xlsx'], 'Total': [1, 2, 3, 4]})
+    targets = write_partitioned_excel(df, tmp_path / 'sortie.xlsx', partition_by='Ville', workers=1,
+                                      split_workbooks=True)
+    assert [path.name for path in targets] == ['sortie_a_b__c_d.xlsx', 'sortie_Lyon.xlsx',
+                                               'sortie_lyon (2).xlsx', 'sortie_ventes.xlsx']
+    assert [pd.read_excel(path)['Total'].tolist() for path in targets] == [[1], [2], [3], [4]]
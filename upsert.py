@@ -0,0 +1,286 @@
+"""Fusion par clé métier (« upsert ») : une ligne par clé, les fichiers récents l'emportant.
+
+Au lieu d'empiler les sources, chaque fichier est replié sur une table
+maître : une ligne dont la clé (``ID``, ``Commande_ID``...) existe déjà est
+mise à jour colonne par colonne, une clé inconnue ajoute une ligne. Les
+clés sont retrouvées par des index de hachage pandas (``Index.get_indexer``),
+sans trier ni regrouper toute la table : le coût d'un fichier est
+proportionnel à son nombre de lignes, pas à la taille de la table.
+
+La table est découpée en segments (comme les empreintes de ``dedup.py``) :
+les lignes nouvelles d'un fichier forment un segment, fusionné avec les
+précédents de taille comparable. Les segments vont ainsi en doublant de
+taille : une ligne n'est recopiée qu'environ log2(n) fois au total, et une
+clé est cherchée dans autant d'index au plus.
+
+Règles de mise à jour par colonne :
+
+- ``last`` (par défaut) : la valeur du fichier le plus récent, si elle n'est pas vide ;
+- ``first`` : la première valeur connue est conservée ;
+- ``sum``, ``min``, ``max`` : cumul ou extremum des valeurs.
+
+L'état de la table peut être conservé entre deux exécutions
+(``UpsertState``) : seuls les fichiers ajoutés depuis sont alors appliqués.
+"""
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from cache import file_fingerprint
+
+UPSERT_RULES = ('last', 'first', 'sum', 'min', 'max')
+UPSERT_ORDERS = ('name', 'mtime')
+# Un segment est fusionné avec le précédent tant que celui-ci compte au plus
+# SEGMENT_RATIO fois plus de lignes
+SEGMENT_RATIO = 2
+STATE_FILE = 'state.json'
+STATE_VERSION = 1
+
+
+def parse_rules(texts):
+    """Analyse des règles ``Colonne=règle`` : ``{colonne: règle}``"""
+    rules = {}
+    for text in texts:
+        column, sep, rule = text.rpartition('=')
+        column, rule = column.strip(), rule.strip().lower()
+        if not sep or not column or rule not in UPSERT_RULES:
+            raise ValueError(f"Règle invalide '{text}' (attendu: Colonne=règle, "
+                             f"règles: {', '.join(UPSERT_RULES)})")
+        rules[column] = rule
+    return rules
+
+
+def order_files(paths, order='name'):
+    """Ordre d'application des sources : le dernier fichier l'emporte"""
+    paths = list(paths)
+    if order == 'mtime':
+        return sorted(paths, key=lambda path: (os.stat(path).st_mtime_ns, str(path)))
+    return paths
+
+
+def combine(current, new, rule):
+    """Nouvelle valeur d'une colonne pour des lignes existantes"""
+    if rule == 'first':
+        return current.where(current.notna(), new)
+    if rule == 'last':
+        return new.where(new.notna(), current)
+    if rule == 'sum':
+        total = current.fillna(0) + new.fillna(0)
+        return total.where(current.notna() | new.notna())
+    stacked = pd.concat([current, new], axis=1)
+    result = stacked.min(axis=1) if rule == 'min' else stacked.max(axis=1)
+    return result.where(stacked.notna().any(axis=1))
+
+
+class Segment:
+    """Lignes de la table maître et index de hachage de leurs clés"""
+
+    def __init__(self, frame, keys):
+        self.frame = frame.reset_index(drop=True)
+        self.index = key_index(self.frame, keys)
+
+
+def key_index(df, keys):
+    """Index (haché) des clés d'un DataFrame"""
+    if len(keys) == 1:
+        return pd.Index(df[keys[0]])
+    return pd.MultiIndex.from_frame(df[keys])
+
+
+class UpsertTable:
+    """Table maître repliant les sources sur leurs colonnes clés
+
+    Une ligne dont une colonne clé est vide ne peut pas être rapprochée :
+    elle est ajoutée telle quelle (voir ``keyless``).
+    """
+
+    def __init__(self, keys, rules=None, default_rule='last'):
+        self.keys = list(keys)
+        self.rules = dict(rules or {})
+        self.default_rule = default_rule
+        self.segments = []
+        self.keyless = []
+        self.updated = 0
+        self.inserted = 0
+
+    def __len__(self):
+        return sum(len(segment.frame) for segment in self.segments) + sum(len(df) for df in self.keyless)
+
+    def missing_keys(self, df):
+        return [key for key in self.keys if key not in df.columns]
+
+    def apply(self, df):
+        """Replie une source sur la table : ``(lignes mises à jour, lignes ajoutées)``
+
+        Au sein d'un même fichier, la dernière ligne d'une clé l'emporte.
+        """
+        missing = self.missing_keys(df)
+        if missing:
+            raise KeyError(f"colonnes clés absentes: {', '.join(missing)}")
+        has_key = df[self.keys].notna().all(axis=1).to_numpy()
+        if not has_key.all():
+            self.keyless.append(df[~has_key].reset_index(drop=True))
+            df = df[has_key]
+        df = df.drop_duplicates(self.keys, keep='last').reset_index(drop=True)
+
+        new = np.ones(len(df), dtype=bool)
+        updated = 0
+        if len(df):
+            incoming = key_index(df, self.keys)
+            for segment in self.segments:
+                positions = segment.index.get_indexer(incoming)
+                found = positions >= 0
+                if found.any():
+                    self.update(segment, positions[found], df[found])
+                    new &= ~found
+                    updated += int(found.sum())
+
+        inserted = int(new.sum()) + int((~has_key).sum())
+        if new.any():
+            self.segments.append(Segment(df[new], self.keys))
+            self.compact()
+        self.updated += updated
+        self.inserted += inserted
+        return updated, inserted
+
+    def update(self, segment, positions, updates):
+        """Met à jour les lignes ``positions`` d'un segment selon les règles des colonnes"""
+        frame = segment.frame
+        for column in updates.columns:
+            if column in self.keys:
+                continue
+            new = updates[column].reset_index(drop=True)
+            if column not in frame.columns:
+                # Colonne vide du type de la source (entiers → flottants, dates → NaT)
+                frame[column] = updates[column].iloc[:0].reindex(frame.index)
+            if isinstance(frame[column].dtype, pd.StringDtype):
+                # Texte pyarrow : chaque écriture en place recopierait toute la colonne
+                frame[column] = frame[column].astype(object)
+            current = frame[column].iloc[positions].reset_index(drop=True)
+            values = combine(current, new, self.rules.get(column, self.default_rule))
+            location = frame.columns.get_loc(column)
+            try:
+                frame.iloc[positions, location] = values.to_numpy()
+            except (TypeError, ValueError):
+                # Type incompatible : entiers → flottants (valeurs manquantes), sinon colonne générique
+                numeric = (pd.api.types.is_numeric_dtype(frame[column].dtype)
+                           and pd.api.types.is_numeric_dtype(values.dtype))
+                frame[column] = frame[column].astype('float64' if numeric else object)
+                frame.iloc[positions, location] = values.to_numpy(dtype='float64' if numeric else object)
+
+    def compact(self):
+        """Fusionne le dernier segment avec les précédents de taille comparable"""
+        segments = self.segments
+        while len(segments) > 1 and len(segments[-2].frame) <= SEGMENT_RATIO * len(segments[-1].frame):
+            last = segments.pop()
+            frame = pd.concat([segments[-1].frame, last.frame], ignore_index=True, sort=False)
+            segments[-1] = Segment(frame, self.keys)
+
+    def to_frame(self):
+        """Table complète : clés d'abord, puis les autres colonnes par ordre alphabétique"""
+        frames = [segment.frame for segment in self.segments] + self.keyless
+        if not frames:
+            return pd.DataFrame(columns=self.keys)
+        # Les colonnes de texte mises à jour retrouvent leur type
+        df = pd.concat(frames, ignore_index=True, sort=False).infer_objects()
+        others = sorted(column for column in df.columns if column not in self.keys)
+        return df[self.keys + others]
+
+
+class UpsertState:
+    """Table maître et liste des fichiers appliqués, conservées entre deux exécutions
+
+    Au lancement suivant, si les fichiers déjà appliqués sont inchangés et
+    toujours en tête de l'ordre d'application, seuls les fichiers suivants
+    sont appliqués. Sinon la table est reconstruite depuis le début.
+    """
+
+    def __init__(self, directory, signature):
+        self.directory = Path(directory)
+        self.signature = signature
+        self.applied = []
+
+    @property
+    def state_path(self):
+        return self.directory / STATE_FILE
+
+    def load(self, table, files):
+        """Recharge la table et renvoie ``(fichiers restant à appliquer, motif de reconstruction)``"""
+        files = list(files)
+        try:
+            with open(self.state_path, encoding='utf-8') as handle:
+                data = json.load(handle)
+        except (OSError, ValueError):
+            return files, None
+        if data.get('version') != STATE_VERSION or data.get('signature') != self.signature:
+            return files, "paramètres différents"
+
+        applied = data.get('applied', [])
+        if len(applied) > len(files):
+            return files, "fichiers supprimés"
+        for (path, fingerprint), current in zip(applied, files):
+            if path != str(current):
+                return files, f"ordre des fichiers modifié ({Path(current).name})"
+            try:
+                if fingerprint != file_fingerprint(current):
+                    return files, f"fichier modifié ({Path(current).name})"
+            except OSError:
+                return files, f"fichier illisible ({Path(current).name})"
+
+        table_path = self.directory / data['table']
+        try:
+            frame = pd.read_pickle(table_path) if table_path.suffix == '.pkl' else pd.read_parquet(table_path)
+        except Exception:
+            return files, "table illisible"
+        has_key = frame[table.keys].notna().all(axis=1).to_numpy() if len(frame) else np.ones(0, dtype=bool)
+        if has_key.any():
+            table.segments = [Segment(frame[has_key], table.keys)]
+        if not has_key.all():
+            table.keyless = [frame[~has_key].reset_index(drop=True)]
+        self.applied = [tuple(entry) for entry in applied]
+        return files[len(applied):], None
+
+    def fingerprints(self, files):
+        """Empreintes des fichiers, relevées avant leur lecture, jusqu'au premier inaccessible"""
+        fingerprints = []
+        for path in files:
+            try:
+                fingerprints.append(file_fingerprint(path))
+            except OSError:
+                break
+        return fingerprints
+
+    def record(self, path, fingerprint):
+        """Note un fichier appliqué à la table"""
+        self.applied.append((str(path), fingerprint))
+
+    def save(self, frame):
+        """Enregistre la table (Parquet, ou pickle si Parquet est impossible) et l'état"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        table_path = self.directory / 'table.parquet'
+        try:
+            frame.to_parquet(table_path, index=False)
+        except Exception:
+            table_path = self.directory / 'table.pkl'
+            frame.to_pickle(table_path)
+        for stale in ('table.parquet', 'table.pkl'):
+            if stale != table_path.name and (self.directory / stale).exists():
+                (self.directory / stale).unlink()
+        data = {
+            'version': STATE_VERSION,
+            'signature': self.signature,
+            'table': table_path.name,
+            'rows': len(frame),
+            'applied': [list(entry) for entry in self.applied],
+        }
+        tmp_path = self.state_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as handle:
+            json.dump(data, handle, indent=1, ensure_ascii=False)
+        os.replace(tmp_path, self.state_path)
+
+    def remove(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
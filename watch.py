@@ -0,0 +1,329 @@
+"""Surveillance du dossier d'entrée et fusion incrémentale au fil des dépôts.
+
+Le dossier est observé avec ``watchdog`` (inotify, FSEvents, ReadDirectoryChangesW)
+s'il est installé, sinon par un relevé périodique ``os.scandir`` (taille +
+date de modification de chaque fichier). Un fichier n'est traité qu'une fois
+stable pendant ``settle`` secondes, pour ne pas lire un classeur en cours de
+copie. Seuls les fichiers nouveaux ou modifiés sont relus.
+
+Deux façons de publier le résultat :
+
+- sortie = dossier (Parquet ou CSV) : une partition par fichier source,
+  réécrite dès que la source change et supprimée avec elle. Le dossier se
+  lit comme un seul jeu de données (``pd.read_parquet(dossier)``) ;
+- sortie = fichier (.xlsx...) : reconstruction complète au plus toutes les
+  ``rebuild_every`` secondes, les sources inchangées étant rechargées depuis
+  le cache Parquet au lieu d'être réanalysées.
+"""
+import hashlib
+import importlib.util
+import json
+import os
+import statistics
+import threading
+import time
+from dataclasses import replace
+from pathlib import Path
+
+from discovery import DEFAULT_INCLUDE, iter_excel_files
+from filters import make_read_filter
+from merge_engine import MergeEngine, MergeError, MergeEvent, written_files
+from readers import read_excel_file
+from writers import CSV, CSV_ENCODING, PARQUET, detect_format
+
+DEFAULT_POLL_INTERVAL = 2.0
+DEFAULT_SETTLE_SECONDS = 2.0
+DEFAULT_REBUILD_SECONDS = 60.0
+# Avec watchdog, relevé de sécurité même sans notification
+WATCHDOG_POLL_INTERVAL = 30.0
+PARTITION_MANIFEST = '_partitions.json'
+
+
+def watchdog_available():
+    return importlib.util.find_spec('watchdog') is not None
+
+
+def is_partition_output(path):
+    """Une sortie sans extension (ou un dossier existant) est un dossier de partitions"""
+    path = Path(path)
+    return path.is_dir() or not path.suffix
+
+
+class PartitionPublisher:
+    """Tient à jour une partition Parquet/CSV par fichier source"""
+
+    def __init__(self, watcher, directory, output_format):
+        self.watcher = watcher
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.output_format = output_format
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self):
+        try:
+            with open(self.directory / PARTITION_MANIFEST, encoding='utf-8') as handle:
+                return json.load(handle)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self):
+        path = self.directory / PARTITION_MANIFEST
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as handle:
+            json.dump(self.manifest, handle, indent=1, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def known(self):
+        """État des sources déjà publiées : {chemin: [taille, date]}"""
+        return {path: tuple(entry['stat']) for path, entry in self.manifest.items()}
+
+    def partition_path(self, source):
+        digest = hashlib.sha1(str(source).encode('utf-8')).hexdigest()[:8]
+        return self.directory / f"{Path(source).stem}-{digest}.{self.output_format}"
+
+    def publish(self, ready, removed):
+        """Publie les sources prêtes ; renvoie celles dont la partition a été écrite"""
+        options = self.watcher.options
+        done = set()
+        for source, stat in ready.items():
+            start = time.perf_counter()
+            try:
+                df = read_excel_file(source, add_source_column=options.add_source_column,
+                                     backend=options.reader_backend, sheets=options.sheets,
+                                     row_filter=self.watcher.row_filter)
+                target = self.partition_path(source)
+                tmp_path = target.with_name(f".{target.name}.tmp")
+                if self.output_format == PARQUET:
+                    compression = None if options.parquet_compression == 'none' else options.parquet_compression
+                    df.to_parquet(tmp_path, index=False, compression=compression)
+                else:
+                    df.to_csv(tmp_path, index=False, encoding=CSV_ENCODING)
+                os.replace(tmp_path, target)
+            except Exception as e:
+                self.watcher.log(f"Erreur lors du traitement de {Path(source).name}: {e}", "error")
+                continue
+            self.manifest[source] = {'stat': list(stat), 'partition': target.name, 'rows': len(df)}
+            done.add(source)
+            self.watcher.log(f"✓ {Path(source).name}: {len(df)} lignes → {target.name} "
+                             f"({time.perf_counter() - start:.2f} s)", "success")
+        for source in removed:
+            entry = self.manifest.pop(source, None)
+            if entry is not None:
+                partition = self.directory / entry['partition']
+                if partition.exists():
+                    partition.unlink()
+                self.watcher.log(f"Source supprimée, partition retirée: {Path(source).name}", "info")
+        self._save_manifest()
+        return done
+
+    def tick(self):
+        # Les partitions sont écrites dès la publication : la sortie est à jour
+        return True
+
+
+class RebuildPublisher:
+    """Reconstruit le fichier de sortie complet, au plus toutes les ``rebuild_every`` secondes"""
+
+    def __init__(self, watcher, rebuild_every):
+        self.watcher = watcher
+        self.rebuild_every = rebuild_every
+        self.dirty = True
+        self.last_build = None
+        options = watcher.options
+        cache_dir = options.cache_dir or f"{options.output_file}.watch-cache"
+        self.options = replace(options, cache_dir=cache_dir)
+
+    def known(self):
+        return {}
+
+    def publish(self, ready, removed):
+        """Marque la sortie à reconstruire ; toutes les sources prêtes y seront relues"""
+        self.dirty = True
+        return set(ready)
+
+    def tick(self):
+        """Lance la reconstruction si elle est due ; renvoie True si elle a eu lieu"""
+        if not self.dirty:
+            return False
+        now = time.monotonic()
+        if self.last_build is not None and now - self.last_build < self.rebuild_every:
+            return False
+        self.dirty = False
+        self.last_build = now
+        try:
+            result = MergeEngine(self.options, self.watcher.forward_event).run()
+        except MergeError as e:
+            self.watcher.log(f"Reconstruction impossible: {e}", "warning")
+            return False
+        except OSError as e:
+            # Sortie verrouillée (ouverte dans Excel...) : nouvel essai au prochain relevé
+            self.dirty = True
+            self.last_build = None
+            self.watcher.log(f"Écriture de la sortie impossible, nouvel essai au prochain relevé: {e}", "warning")
+            return False
+        self.watcher.log(f"Sortie reconstruite: {result.rows} lignes, {result.files_merged} fichiers", "success")
+        return True
+
+    def next_due(self):
+        """Secondes avant la prochaine reconstruction possible, ou None"""
+        if not self.dirty or self.last_build is None:
+            return None
+        return max(self.rebuild_every - (time.monotonic() - self.last_build), 0.0)
+
+
+class FolderWatcher:
+    """Surveille le dossier d'entrée et publie les fichiers nouveaux ou modifiés
+
+    ``run()`` bloque jusqu'à ``stop()`` (appelable depuis un autre thread) ou
+    jusqu'à une interruption clavier.
+    """
+
+    def __init__(self, options, on_event=None, interval=DEFAULT_POLL_INTERVAL,
+                 settle=DEFAULT_SETTLE_SECONDS, rebuild_every=DEFAULT_REBUILD_SECONDS, use_watchdog=None):
+        self.options = options
+        self.on_event = on_event
+        self.interval = interval
+        self.settle = settle
+        self.use_watchdog = watchdog_available() if use_watchdog is None else use_watchdog
+        self.latencies = []
+        # Première vue des changements pas encore visibles dans la sortie
+        self.unpublished = []
+        self.skip_paths = written_files(options)
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        try:
+            self.row_filter = make_read_filter(options.columns, options.where)
+        except ValueError as e:
+            raise MergeError(str(e))
+
+        output = Path(options.output_file)
+        if is_partition_output(output):
+            output_format = options.output_format or (PARQUET if importlib.util.find_spec('pyarrow') else CSV)
+            if output_format not in (PARQUET, CSV):
+                raise MergeError("Un dossier de sortie ne peut contenir que des partitions parquet ou csv")
+            if output_format == PARQUET and importlib.util.find_spec('pyarrow') is None:
+                raise MergeError("Le format parquet nécessite le paquet 'pyarrow' (pip install pyarrow)")
+            self.publisher = PartitionPublisher(self, output, output_format)
+        else:
+            detect_format(output, options.output_format)
+            self.publisher = RebuildPublisher(self, rebuild_every)
+
+    def emit(self, kind, message='', level='info', progress=0.0):
+        if self.on_event is not None:
+            self.on_event(MergeEvent(kind, message, level, progress))
+
+    def log(self, message, level="info"):
+        self.emit('log', message, level)
+
+    def forward_event(self, event):
+        """Relaie les événements du moteur lors d'une reconstruction"""
+        if self.on_event is not None and event.kind == 'log':
+            self.on_event(event)
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def snapshot(self):
+        """Taille et date de modification de chaque fichier Excel du dossier"""
+        files = {}
+        paths = iter_excel_files(self.options.input_folder,
+                                 recursive=self.options.recursive,
+                                 include=self.options.include or DEFAULT_INCLUDE,
+                                 exclude=self.options.exclude,
+                                 skip_hidden=self.options.skip_hidden,
+                                 skip_paths=self.skip_paths)
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files[str(path)] = (stat.st_size, stat.st_mtime_ns)
+        return files
+
+    def _start_observer(self):
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+
+        wake = self._wake
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                wake.set()
+
+        observer = Observer()
+        observer.schedule(_Handler(), str(self.options.input_folder), recursive=self.options.recursive)
+        observer.start()
+        return observer
+
+    def run(self):
+        if not Path(self.options.input_folder).is_dir():
+            raise MergeError(f"Dossier introuvable: {self.options.input_folder}")
+
+        observer = None
+        poll_interval = self.interval
+        if self.use_watchdog:
+            observer = self._start_observer()
+            poll_interval = max(self.interval, WATCHDOG_POLL_INTERVAL)
+            self.log("Surveillance du dossier (notifications du système via watchdog)", "info")
+        else:
+            self.log(f"Surveillance du dossier (relevé toutes les {self.interval:g} s ; "
+                     f"installer watchdog pour être notifié immédiatement)", "info")
+
+        published = self.publisher.known()
+        # Première vue d'un changement et état observé : {chemin: (état, depuis)}
+        pending = {}
+        try:
+            while not self._stop.is_set():
+                self.cycle(published, pending)
+                timeout = poll_interval
+                if pending:
+                    timeout = min(timeout, self.settle)
+                due = getattr(self.publisher, 'next_due', lambda: None)()
+                if due is not None:
+                    timeout = min(timeout, due)
+                self._wake.wait(timeout)
+                self._wake.clear()
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
+            if self.latencies:
+                self.log(f"Délai médian entre dépôt et sortie à jour: {statistics.median(self.latencies):.1f} s "
+                         f"({len(self.latencies)} mise(s) à jour)", "info")
+
+    def cycle(self, published, pending):
+        """Un relevé : détecte les changements stables et les publie"""
+        now = time.monotonic()
+        current = self.snapshot()
+        ready = {}
+        for path, stat in current.items():
+            if published.get(path) == stat:
+                pending.pop(path, None)
+                continue
+            seen = pending.get(path)
+            if seen is None or seen[0] != stat:
+                # Nouveau changement : attendre que le fichier soit stable
+                pending[path] = (stat, now, seen[2] if seen else now)
+                continue
+            if now - seen[1] >= self.settle:
+                ready[path] = stat
+        removed = [path for path in published if path not in current]
+
+        if ready or removed:
+            for path in ready:
+                self.log(f"Nouveau fichier ou fichier modifié: {Path(path).name}", "info")
+            # Une source non publiée (lecture impossible...) reste en attente et sera réessayée
+            for path in self.publisher.publish(ready, removed):
+                published[path] = ready[path]
+                self.unpublished.append(pending.pop(path)[2])
+            for path in removed:
+                del published[path]
+        if self.publisher.tick():
+            self.record_latencies()
+
+    def record_latencies(self):
+        """Délai entre la première vue de chaque changement et la sortie à jour"""
+        done = time.monotonic()
+        self.latencies.extend(done - seen for seen in self.unpublished)
+        self.unpublished.clear()
@@ -0,0 +1,311 @@
+"""Écriture du fichier fusionné : .xlsx, CSV, Parquet ou Feather.
+
+Le format est déduit de l'extension du fichier de sortie, ou imposé par
+l'option ``output_format``. Les écrivains « streaming » reçoivent les
+DataFrames source un par un et les écrivent immédiatement : le DataFrame
+fusionné complet n'existe jamais en mémoire.
+"""
+import os
+from pathlib import Path
+
+import pandas as pd
+from openpyxl import Workbook
+
+DEFAULT_SHEET_NAME = 'Sheet1'
+
+XLSX = 'xlsx'
+CSV = 'csv'
+PARQUET = 'parquet'
+FEATHER = 'feather'
+OUTPUT_FORMATS = (XLSX, CSV, PARQUET, FEATHER)
+STREAMING_FORMATS = (XLSX, CSV)
+
+FORMAT_BY_EXTENSION = {
+    '.csv': CSV,
+    '.parquet': PARQUET,
+    '.pq': PARQUET,
+    '.feather': FEATHER,
+    '.arrow': FEATHER,
+    '.ipc': FEATHER,
+}
+
+PARQUET_COMPRESSIONS = ('snappy', 'zstd', 'gzip', 'brotli', 'none')
+CSV_ENCODING = 'utf-8-sig'
+DEFAULT_CSV_CHUNK_ROWS = 100_000
+
+# Limite d'une feuille Excel, ligne d'en-tête comprise
+EXCEL_MAX_ROWS = 1_048_576
+EXCEL_MAX_DATA_ROWS = EXCEL_MAX_ROWS - 1
+
+
+def detect_format(path, output_format=None):
+    """Format de sortie imposé, ou déduit de l'extension (.xlsx par défaut)"""
+    if output_format:
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Format de sortie inconnu: {output_format} "
+                             f"(formats possibles: {', '.join(OUTPUT_FORMATS)})")
+        return output_format
+    return FORMAT_BY_EXTENSION.get(Path(path).suffix.lower(), XLSX)
+
+
+def sheet_name(index):
+    """Nom de la n-ième feuille (Sheet1, Sheet2, ...)"""
+    return f"Sheet{index + 1}"
+
+
+def temporary_path(path):
+    """Fichier temporaire, dans le même dossier, d'une sortie écrite en flux"""
+    path = Path(path)
+    return path.with_name(f".{path.name}.tmp")
+
+
+def _discard(path):
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def replace_on_success(path, write):
+    """Appelle ``write(fichier temporaire)`` puis remplace ``path`` par ce fichier
+
+    En cas d'échec ou d'interruption, la sortie précédente reste intacte et
+    le fichier temporaire est supprimé.
+    """
+    tmp_path = temporary_path(path)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        _discard(tmp_path)
+        raise
+
+
+def _warn(on_warning, message):
+    if on_warning is not None:
+        on_warning(message)
+
+
+def write_dataframe(df, path, output_format=None, parquet_compression='snappy',
+                    csv_chunk_rows=DEFAULT_CSV_CHUNK_ROWS, on_warning=None, extra_sheets=()):
+    """Écrit un DataFrame complet dans le format demandé
+
+    ``extra_sheets`` : feuilles ``(nom, DataFrame)`` ajoutées après les
+    données, pour une sortie .xlsx uniquement.
+    """
+    output_format = detect_format(path, output_format)
+
+    if output_format == PARQUET:
+        compression = None if parquet_compression == 'none' else parquet_compression
+        replace_on_success(path, lambda tmp_path: df.to_parquet(tmp_path, index=False, compression=compression))
+    elif output_format == FEATHER:
+        replace_on_success(path, lambda tmp_path: df.reset_index(drop=True).to_feather(tmp_path))
+    elif output_format == CSV:
+        replace_on_success(path, lambda tmp_path: df.to_csv(tmp_path, index=False, encoding=CSV_ENCODING,
+                                                            chunksize=csv_chunk_rows))
+    else:
+        write_excel(df, path, on_warning, extra_sheets)
+
+
+def write_excel(df, path, on_warning=None, extra_sheets=()):
+    """Écrit un .xlsx, réparti sur plusieurs feuilles au-delà de la limite d'Excel
+
+    Le classeur est écrit dans un fichier temporaire (moteur openpyxl, que
+    l'extension ``.tmp`` ne permet pas de deviner) puis renommé.
+    """
+    sheets = max(-(-len(df) // EXCEL_MAX_DATA_ROWS), 1)
+    if sheets > 1:
+        _warn(on_warning, f"{len(df)} lignes dépassent la limite d'une feuille Excel "
+                          f"({EXCEL_MAX_DATA_ROWS}) : répartition sur {sheets} feuilles")
+
+    def write(tmp_path):
+        with pd.ExcelWriter(tmp_path, engine='openpyxl') as writer:
+            for i in range(sheets):
+                chunk = df.iloc[i * EXCEL_MAX_DATA_ROWS:(i + 1) * EXCEL_MAX_DATA_ROWS]
+                chunk.to_excel(writer, sheet_name=sheet_name(i), index=False)
+            for name, extra in extra_sheets:
+                extra.to_excel(writer, sheet_name=name, index=False)
+
+    replace_on_success(path, write)
+
+
+def dataframe_rows(df):
+    """Itère sur les lignes d'un DataFrame en valeurs Python (manquants → None)"""
+    values = df.astype(object).where(df.notna(), None)
+    return values.itertuples(index=False, name=None)
+
+
+class XlsxStreamWriter:
+    """Écrit un .xlsx ligne par ligne avec un classeur openpyxl ``write_only``
+
+    Une nouvelle feuille est ouverte chaque fois que la limite de lignes
+    d'Excel est atteinte. Comme pour les autres écrivains en flux, le
+    fichier de sortie n'est remplacé qu'une fois l'écriture réussie.
+    """
+
+    def __init__(self, path, columns, on_warning=None):
+        self.path = Path(path)
+        self.columns = list(columns)
+        self.on_warning = on_warning
+        self.rows = 0
+        self.workbook = Workbook(write_only=True)
+        self.sheets = 0
+        self._new_sheet()
+
+    def _new_sheet(self):
+        self.sheet = self.workbook.create_sheet(sheet_name(self.sheets))
+        self.sheet.append(self.columns)
+        self.sheet_rows = 0
+        self.sheets += 1
+
+    def append(self, df):
+        for row in dataframe_rows(df):
+            if self.sheet_rows >= EXCEL_MAX_DATA_ROWS:
+                if self.sheets == 1:
+                    _warn(self.on_warning, f"Limite d'une feuille Excel atteinte ({EXCEL_MAX_DATA_ROWS} "
+                                           f"lignes) : la suite est écrite sur des feuilles supplémentaires")
+                self._new_sheet()
+            self.sheet.append(row)
+            self.sheet_rows += 1
+        self.rows += len(df)
+
+    def add_sheet(self, name, df):
+        """Ajoute une feuille distincte après les données (synthèse...)"""
+        sheet = self.workbook.create_sheet(name)
+        sheet.append(list(df.columns))
+        for row in dataframe_rows(df):
+            sheet.append(row)
+
+    def close(self):
+        tmp_path = temporary_path(self.path)
+        try:
+            self.workbook.save(tmp_path)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            _discard(tmp_path)
+            raise
+
+    def discard(self):
+        """Referme les feuilles en cours sans rien enregistrer"""
+        for sheet in self.workbook.worksheets:
+            if not sheet.closed:
+                sheet.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+class CsvStreamWriter:
+    """Ajoute chaque DataFrame à la fin d'un fichier CSV
+
+    Les lignes sont écrites dans un fichier temporaire qui ne remplace la
+    sortie qu'à la fin d'une écriture réussie : une fusion en échec ou
+    annulée laisse intacte la sortie précédente.
+    """
+
+    def __init__(self, path, columns, encoding=CSV_ENCODING):
+        self.path = Path(path)
+        self.columns = list(columns)
+        self.rows = 0
+        self.tmp_path = temporary_path(self.path)
+        self.handle = open(self.tmp_path, 'w', newline='', encoding=encoding)
+        pd.DataFrame(columns=self.columns).to_csv(self.handle, index=False)
+
+    def append(self, df):
+        df.to_csv(self.handle, index=False, header=False)
+        self.rows += len(df)
+
+    def close(self):
+        self.handle.close()
+        os.replace(self.tmp_path, self.path)
+
+    def discard(self):
+        self.handle.close()
+        _discard(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+class ArrowStreamWriter:
+    """Écrit des DataFrames successifs dans un fichier Parquet ou Arrow IPC (Feather)
+
+    Toutes les sources doivent suivre le même schéma Arrow : ``schema``, ou
+    à défaut celui du premier DataFrame reçu.
+    """
+
+    def __init__(self, path, columns, output_format, schema=None, parquet_compression='snappy'):
+        self.path = Path(path)
+        self.columns = list(columns)
+        self.output_format = output_format
+        self.schema = schema
+        self.parquet_compression = None if parquet_compression == 'none' else parquet_compression
+        self.rows = 0
+        self.tmp_path = temporary_path(self.path)
+        self._writer = None
+
+    def _open(self):
+        import pyarrow as pa
+        if self.output_format == PARQUET:
+            import pyarrow.parquet as pq
+            return pq.ParquetWriter(str(self.tmp_path), self.schema, compression=self.parquet_compression)
+        options = pa.ipc.IpcWriteOptions(compression='lz4' if pa.Codec.is_available('lz4') else None)
+        return pa.ipc.new_file(str(self.tmp_path), self.schema, options=options)
+
+    def append(self, df):
+        import pyarrow as pa
+        table = pa.Table.from_pandas(df[self.columns], schema=self.schema, preserve_index=False)
+        if self._writer is None:
+            self.schema = table.schema
+            self._writer = self._open()
+        self._writer.write_table(table)
+        self.rows += len(df)
+
+    def close(self):
+        if self._writer is None:
+            if self.schema is None:
+                return
+            self._writer = self._open()
+        self._writer.close()
+        os.replace(self.tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+            return
+        if self._writer is not None:
+            self._writer.close()
+        _discard(self.tmp_path)
+
+
+def open_stream_writer(path, columns, output_format=None, on_warning=None, schema=None,
+                       parquet_compression='snappy'):
+    """Choisit l'écrivain en flux selon le format de sortie
+
+    Parquet et Feather ne sont possibles qu'avec un schéma Arrow connu à
+    l'avance (``schema``), comme lors d'une fusion déversée sur disque.
+    """
+    output_format = detect_format(path, output_format)
+    if output_format == CSV:
+        return CsvStreamWriter(path, columns)
+    if output_format == XLSX:
+        return XlsxStreamWriter(path, columns, on_warning)
+    if schema is not None:
+        return ArrowStreamWriter(path, columns, output_format, schema, parquet_compression)
+    raise ValueError(f"Le format {output_format} n'est pas disponible en mode streaming "
+                     f"(formats possibles: {', '.join(STREAMING_FORMATS)})")